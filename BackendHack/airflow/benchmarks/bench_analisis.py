@@ -0,0 +1,217 @@
+"""
+Benchmark: motor de análisis vectorizado (utils.analisis) vs las cinco tareas
+de análisis anteriores (analizar_por_tipo, analizar_por_ubicacion,
+analizar_tiempos_resolucion, analizar_estados, detectar_tendencias).
+
+Cada tarea anterior deserializaba su propia copia del XCom y recorría la
+lista completa; el motor deserializa una vez y hace una sola pasada.
+Se comparan las claves que producían las tareas anteriores; los percentiles
+del motor (DDSketch) se comparan contra los exactos de NumPy.
+
+Uso:
+    python airflow/benchmarks/bench_analisis.py [--tamanos 10000 100000 1000000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+import numpy as np  # noqa: E402
+
+from utils.analisis import analizar  # noqa: E402
+
+TIPOS = ['robo', 'acoso', 'emergencia_medica', 'fuga_agua', 'baño_sucio', 'internet_caido', 'luces_fundidas']
+ESTADOS = ['pendiente', 'en_atencion', 'resuelto', 'cancelado']
+URGENCIAS = ['baja', 'media', 'alta', 'critica']
+
+
+def generar_incidentes(n, semilla=42):
+    """Incidentes sintéticos con el formato de crearIncidente"""
+    rnd = random.Random(semilla)
+    ahora = datetime(2025, 11, 20)
+    incidentes = []
+    for i in range(n):
+        creacion = ahora - timedelta(minutes=rnd.randint(0, 60 * 24 * 90))
+        estado = rnd.choice(ESTADOS)
+        historial = [{'accion': 'creado', 'fecha': creacion.isoformat() + 'Z'}]
+        if estado == 'resuelto':
+            resolucion = creacion + timedelta(minutes=rnd.randint(5, 600))
+            historial.append({'accion': 'estado cambiado a resuelto', 'fecha': resolucion.isoformat() + 'Z'})
+        incidentes.append({
+            'incidenteId': f"INC_{i:07d}",
+            'tipo': rnd.choice(TIPOS),
+            'ubicacion': f"Pabellón {rnd.choice('ABCDEFGH')} - Piso {rnd.randint(1, 12)}",
+            'urgencia': rnd.choice(URGENCIAS),
+            'estado': estado,
+            'fechaCreacion': creacion.isoformat() + 'Z',
+            'historial': historial,
+        })
+    return incidentes
+
+
+# --- Implementación anterior (una tarea por métrica) ---
+
+def _fecha(valor):
+    return datetime.fromisoformat(valor.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def legacy_tipo(incidentes):
+    contador_tipos = Counter(inc.get('tipo', 'Sin clasificar') for inc in incidentes)
+    return {
+        'total': len(incidentes),
+        'por_tipo': dict(contador_tipos),
+        'tipo_mas_comun': contador_tipos.most_common(1)[0] if contador_tipos else ('N/A', 0)
+    }
+
+
+def legacy_ubicacion(incidentes):
+    ubicaciones = [inc.get('ubicacion', 'Sin ubicación') for inc in incidentes]
+    contador_ubicaciones = Counter(ubicaciones)
+    return {
+        'total_ubicaciones': len(set(ubicaciones)),
+        'zonas_criticas': [
+            {'ubicacion': ub, 'incidentes': cant}
+            for ub, cant in contador_ubicaciones.most_common(5)
+        ]
+    }
+
+
+def legacy_tiempos(incidentes):
+    tiempos = []
+    for inc in incidentes:
+        if inc.get('estado') == 'resuelto':
+            fecha_creacion = _fecha(inc['fechaCreacion'])
+            for evento in inc.get('historial', []):
+                if 'resuelto' in evento.get('accion', '').lower():
+                    tiempos.append({
+                        'incidenteId': inc['incidenteId'],
+                        'tipo': inc.get('tipo', 'N/A'),
+                        'urgencia': inc.get('urgencia', 'N/A'),
+                        'tiempo_minutos': (_fecha(evento['fecha']) - fecha_creacion).total_seconds() / 60
+                    })
+                    break
+    if tiempos:
+        promedio = sum(t['tiempo_minutos'] for t in tiempos) / len(tiempos)
+        minimo = min(t['tiempo_minutos'] for t in tiempos)
+        maximo = max(t['tiempo_minutos'] for t in tiempos)
+    else:
+        promedio = minimo = maximo = 0
+    return {
+        'total_resueltos': len(tiempos),
+        'tiempo_promedio_min': round(promedio, 2),
+        'tiempo_minimo_min': round(minimo, 2),
+        'tiempo_maximo_min': round(maximo, 2),
+        'detalles': tiempos[:10],
+        'detalles_completos': tiempos
+    }
+
+
+def legacy_estados(incidentes):
+    contador_estados = Counter(inc.get('estado', 'sin_estado') for inc in incidentes)
+    total = len(incidentes)
+    resueltos = contador_estados.get('resuelto', 0)
+    return {
+        'por_estado': dict(contador_estados),
+        'pendientes': contador_estados.get('pendiente', 0),
+        'en_atencion': contador_estados.get('en_atencion', 0),
+        'resueltos': resueltos,
+        'cancelados': contador_estados.get('cancelado', 0),
+        'tasa_resolucion': round((resueltos / total * 100) if total > 0 else 0, 2)
+    }
+
+
+def legacy_tendencias(incidentes):
+    por_dia_semana = Counter()
+    por_hora = Counter()
+    for inc in incidentes:
+        fecha = _fecha(inc['fechaCreacion'])
+        por_dia_semana[fecha.strftime('%A')] += 1
+        por_hora[fecha.hour] += 1
+    dia = por_dia_semana.most_common(1)[0] if por_dia_semana else ('N/A', 0)
+    hora = por_hora.most_common(1)[0] if por_hora else (0, 0)
+    return {
+        'dia_mas_incidentes': {'dia': dia[0], 'cantidad': dia[1]},
+        'hora_pico': {'hora': hora[0], 'cantidad': hora[1]},
+        'distribucion_hora': dict(por_hora.most_common(5))
+    }
+
+
+def fan_out_anterior(payload_recientes, payload_historico):
+    return {
+        'analisis_tipo': legacy_tipo(json.loads(payload_recientes)),
+        'analisis_ubicacion': legacy_ubicacion(json.loads(payload_recientes)),
+        'analisis_tiempos': legacy_tiempos(json.loads(payload_historico)),
+        'analisis_estados': legacy_estados(json.loads(payload_recientes)),
+        'tendencias': legacy_tendencias(json.loads(payload_historico)),
+    }
+
+
+def motor_vectorizado(payload_recientes, payload_historico):
+    return analizar(json.loads(payload_recientes), historico=json.loads(payload_historico))
+
+
+def _solo_claves(valor, referencia):
+    if isinstance(valor, dict) and isinstance(referencia, dict):
+        return {k: _solo_claves(v, referencia[k]) for k, v in valor.items() if k in referencia}
+    if isinstance(valor, list) and isinstance(referencia, list) and len(valor) == len(referencia):
+        return [_solo_claves(v, r) for v, r in zip(valor, referencia)]
+    return valor
+
+
+def normalizar(resultado, referencia=None):
+    """
+    Compara vía JSON (tuplas -> listas, claves int -> str), solo con las
+    claves que tiene `referencia` (a cualquier profundidad)
+    """
+    normalizado = json.loads(json.dumps(resultado, sort_keys=True))
+    if referencia is None:
+        return normalizado
+    return _solo_claves(normalizado, normalizar(referencia))
+
+
+def error_percentiles(anterior, motor):
+    """Máximo error relativo de p50/p90/p99 del sketch frente a los exactos"""
+    minutos = np.array([t['tiempo_minutos'] for t in anterior['analisis_tiempos']['detalles_completos']])
+    if not len(minutos):
+        return 0.0
+    exactos = np.percentile(minutos, [50, 90, 99], method='lower')
+    estimados = [motor['analisis_tiempos']['percentiles_min'][p] for p in ('p50', 'p90', 'p99')]
+    return max(abs(e - x) / x for e, x in zip(estimados, exactos) if x)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'incidentes':>12} | {'anterior (s)':>12} | {'motor (s)':>10} | {'speedup':>8} | iguales | error pXX")
+    for n in args.tamanos:
+        historico = generar_incidentes(n)
+        limite = datetime(2025, 11, 19).isoformat()
+        recientes = [inc for inc in historico if inc['fechaCreacion'] >= limite]
+        payload_recientes = json.dumps(recientes)
+        payload_historico = json.dumps(historico)
+
+        inicio = time.perf_counter()
+        anterior = fan_out_anterior(payload_recientes, payload_historico)
+        t_anterior = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        motor = motor_vectorizado(payload_recientes, payload_historico)
+        t_motor = time.perf_counter() - inicio
+
+        error = error_percentiles(anterior, motor)
+        del anterior['analisis_tiempos']['detalles_completos']
+        iguales = normalizar(anterior) == normalizar(motor, referencia=anterior)
+        print(f"{n:>12} | {t_anterior:>12.3f} | {t_motor:>10.3f} | {t_anterior / t_motor:>7.1f}x | {str(iguales):>7} | {error:>8.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+"""
+Benchmark end-to-end de los tres DAGs fuera de Airflow.
+
+Para cada escala genera datos sintéticos (datos_sinteticos.py), crea las
+tablas tal como están en serverless.yml en un DynamoDB local, las carga y
+ejecuta en orden topológico los PythonOperator de cada DAG con un `ti`
+en memoria. Los XCom pasan por la misma serialización que el backend de
+artefactos, así su costo queda incluido. Los sensores se omiten y el SMTP
+va a un servidor local de prueba (bench_smtp.py).
+
+Por tarea se registra: segundos, bytes de XCom emitidos, llamadas a
+DynamoDB (y Streams) por operación y si falló. El resultado es un JSON; con
+--comparar se contrasta contra una corrida anterior y el script termina con
+código 1 si alguna tarea empeoró más que --umbral.
+
+DynamoDB local:
+    --backend moto     en proceso (pip install "moto[dynamodb,s3]"); lento
+                       para cargar 1M items
+    --backend local    DynamoDB Local en --endpoint (docker run -p 8000:8000
+                       amazon/dynamodb-local); S3 con --endpoint-s3 o moto
+
+Uso:
+    python airflow/benchmarks/bench_dags.py [--escalas 1000 100000 1000000]
+        [--backend moto|local] [--dags reportes sla notificaciones]
+        [--repeticiones 1] [--salida bench_dags.json] [--comparar anterior.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+DAGS = os.path.join(DIRECTORIO, '..', 'dags')
+SERVERLESS_YML = os.path.join(DIRECTORIO, '..', '..', 'serverless.yml')
+sys.path.insert(0, DAGS)
+sys.path.insert(0, DIRECTORIO)
+
+from datos_sinteticos import generar_dataset  # noqa: E402
+
+MODULOS_DAG = {
+    'reportes': 'generar_reportes',
+    'sla': 'monitorear_incidentes_antiguos',
+    'notificaciones': 'enviar_notificaciones',
+}
+
+VERSION_RESULTADOS = 1
+
+
+def _configurar_entorno(args, directorio_artefactos):
+    """Variables que leen los DAGs al importarse: todo local y sin credenciales reales"""
+    os.environ.update({
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'bench',
+        'AWS_SECRET_ACCESS_KEY': 'bench',
+        'XCOM_ARTEFACTOS_URI': directorio_artefactos,
+        'S3_BUCKET_REPORTES': 'bench-reportes',
+        'SMTP_STARTTLS': 'false',
+        'SMTP_EMAIL': 'bench@utec.edu.pe',
+        'SMTP_PASSWORD': 'bench',
+        'SMTP_RATE_LIMIT_PER_SECOND': '0',
+    })
+    os.environ.pop('AWS_SESSION_TOKEN', None)
+    if args.backend == 'local':
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = args.endpoint
+        if args.endpoint_s3:
+            os.environ['AWS_ENDPOINT_URL_S3'] = args.endpoint_s3
+
+
+def definiciones_tablas(ruta=SERVERLESS_YML):
+    """Parámetros de create_table de las tablas DynamoDB de serverless.yml"""
+    import yaml
+
+    with open(ruta, encoding='utf-8') as f:
+        recursos = yaml.safe_load(f)['resources']['Resources']
+
+    tablas = []
+    for recurso in recursos.values():
+        if recurso.get('Type') != 'AWS::DynamoDB::Table':
+            continue
+        propiedades = recurso['Properties']
+        tabla = {
+            'TableName': propiedades['TableName'],
+            'BillingMode': propiedades.get('BillingMode', 'PAY_PER_REQUEST'),
+            'AttributeDefinitions': propiedades['AttributeDefinitions'],
+            'KeySchema': propiedades['KeySchema'],
+        }
+        if propiedades.get('GlobalSecondaryIndexes'):
+            tabla['GlobalSecondaryIndexes'] = propiedades['GlobalSecondaryIndexes']
+        if propiedades.get('StreamSpecification'):
+            tabla['StreamSpecification'] = {'StreamEnabled': True, **propiedades['StreamSpecification']}
+        tablas.append(tabla)
+    return tablas
+
+
+def crear_tablas(resource_dynamo):
+    """(Re)crea las tablas vacías"""
+    existentes = set(resource_dynamo.meta.client.list_tables()['TableNames'])
+    for definicion in definiciones_tablas():
+        nombre = definicion['TableName']
+        if nombre in existentes:
+            resource_dynamo.Table(nombre).delete()
+            resource_dynamo.meta.client.get_waiter('table_not_exists').wait(TableName=nombre)
+        resource_dynamo.create_table(**definicion).wait_until_exists()
+
+
+def cargar_tabla(resource_dynamo, nombre, items, workers=8):
+    """BatchWriteItem en paralelo (batch_writer reintenta los no procesados)"""
+    def cargar_bloque(bloque):
+        with resource_dynamo.Table(nombre).batch_writer() as writer:
+            for item in bloque:
+                writer.put_item(Item=item)
+
+    tamano = max(1, -(-len(items) // workers))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(cargar_bloque, [items[i:i + tamano] for i in range(0, len(items), tamano)]))
+
+
+class InstanciaTarea:
+    """`ti` mínimo: xcom_push / xcom_pull sobre un dict compartido por la corrida"""
+
+    def __init__(self, xcoms, dag_id, task_id, run_id, serializar, deserializar):
+        self.xcoms = xcoms
+        self.dag_id = dag_id
+        self.task_id = task_id
+        self.run_id = run_id
+        self._serializar = serializar
+        self._deserializar = deserializar
+        self.bytes_xcom = 0
+
+    def xcom_push(self, key, value):
+        # Misma ida y vuelta que el backend de artefactos (copia y costo)
+        data = self._serializar(value)
+        if key != 'metricas':
+            self.bytes_xcom += len(data)
+        self.xcoms[(self.task_id, key)] = self._deserializar(data)
+
+    def xcom_pull(self, task_ids=None, key='return_value', **kwargs):
+        if task_ids is not None:
+            return self.xcoms.get((task_ids, key))
+        for (_, clave), valor in reversed(list(self.xcoms.items())):
+            if clave == key:
+                return valor
+        return None
+
+
+def orden_topologico(dag):
+    """Tareas del DAG en orden de dependencias (estable según definición)"""
+    pendientes = list(dag.tasks)
+    hechas = set()
+    orden = []
+    while pendientes:
+        listas = [t for t in pendientes if t.upstream_task_ids <= hechas]
+        if not listas:
+            raise RuntimeError(f"Ciclo en {dag.dag_id}")
+        for tarea in listas:
+            orden.append(tarea)
+            hechas.add(tarea.task_id)
+            pendientes.remove(tarea)
+    return orden
+
+
+class ContadorLlamadas:
+    """Cuenta las llamadas a la API por operación (evento before-call de botocore)"""
+
+    def __init__(self):
+        self.llamadas = Counter()
+        self.lock = threading.Lock()
+
+    def registrar(self, cliente):
+        cliente.meta.events.register('before-call', self._contar)
+
+    def _contar(self, model, **kwargs):
+        with self.lock:
+            self.llamadas[model.name] += 1
+
+    def tomar(self):
+        with self.lock:
+            llamadas, self.llamadas = dict(self.llamadas), Counter()
+        return llamadas
+
+
+def ejecutar_dag(modulo, run_id, contador, serializar, deserializar):
+    """Corre los PythonOperator del DAG; devuelve una medición por tarea"""
+    xcoms = {}
+    mediciones = []
+    for tarea in orden_topologico(modulo.dag):
+        callable_ = getattr(tarea, 'python_callable', None)
+        if callable_ is None:
+            mediciones.append({'tarea': tarea.task_id, 'omitida': type(tarea).__name__})
+            continue
+
+        ti = InstanciaTarea(xcoms, modulo.dag.dag_id, tarea.task_id, run_id, serializar, deserializar)
+        contador.tomar()
+        error = None
+        inicio = time.perf_counter()
+        try:
+            resultado = callable_(ti=ti)
+            if resultado is not None:
+                ti.xcom_push('return_value', resultado)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        segundos = time.perf_counter() - inicio
+
+        mediciones.append({
+            'tarea': tarea.task_id,
+            'segundos': round(segundos, 4),
+            'ok': error is None,
+            'error': error,
+            'bytes_xcom': ti.bytes_xcom,
+            'llamadas_dynamodb': contador.tomar(),
+            # Resumen de utils.metricas (capacidad consumida, escaneados vs devueltos, fases)
+            'metricas': xcoms.get((tarea.task_id, 'metricas')),
+        })
+        if error:
+            print(f"❌ {modulo.dag.dag_id}.{tarea.task_id}: {error}")
+            break
+    return mediciones
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRECTORIO,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def comparar(actual, anterior, umbral):
+    """Imprime la variación por tarea; devuelve las que empeoraron más que `umbral` (%)"""
+    clave = lambda r: (r['escala'], r['dag'], r['tarea'], r.get('repeticion', 0))  # noqa: E731
+    previos = {clave(r): r for r in anterior['resultados'] if 'segundos' in r}
+
+    regresiones = []
+    print(f"\n{'escala':>9} | {'dag':<32} | {'tarea':<36} | {'antes (s)':>9} | {'ahora (s)':>9} | {'Δ %':>7}")
+    for r in actual['resultados']:
+        previo = previos.get(clave(r))
+        if 'segundos' not in r or previo is None:
+            continue
+        delta = (r['segundos'] - previo['segundos']) / previo['segundos'] * 100 if previo['segundos'] else 0
+        # Tareas de milisegundos: el ruido domina, no se consideran regresión
+        regresion = delta > umbral and r['segundos'] - previo['segundos'] > 0.05
+        marca = ' ⚠️' if regresion else ''
+        print(f"{r['escala']:>9} | {r['dag']:<32} | {r['tarea']:<36} | {previo['segundos']:>9.3f} | "
+              f"{r['segundos']:>9.3f} | {delta:>+6.1f}%{marca}")
+        if regresion:
+            regresiones.append(r)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--backend', choices=['moto', 'local'], default='moto')
+    parser.add_argument('--endpoint', default='http://localhost:8000', help='DynamoDB Local (--backend local)')
+    parser.add_argument('--endpoint-s3', default=None, help='S3 compatible (MinIO/LocalStack); por defecto moto')
+    parser.add_argument('--dags', nargs='+', choices=list(MODULOS_DAG), default=list(MODULOS_DAG))
+    parser.add_argument('--repeticiones', type=int, default=1, help='Corridas por escala (la 2.ª en adelante, con cachés calientes)')
+    parser.add_argument('--historial-embebido', action='store_true', help='Items con historial embebido (pre-migración)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', default='bench_dags.json')
+    parser.add_argument('--comparar', default=None, help='JSON de una corrida anterior')
+    parser.add_argument('--umbral', type=float, default=20, help='% de empeoramiento que cuenta como regresión')
+    args = parser.parse_args()
+
+    directorio_artefactos = tempfile.mkdtemp(prefix='bench_dags_')
+    _configurar_entorno(args, directorio_artefactos)
+
+    mock = None
+    if args.backend == 'moto' or not args.endpoint_s3:
+        from moto import mock_aws
+
+        mock = mock_aws()
+        mock.start()
+
+    # Los DAGs y utils leen la configuración al importarse
+    import importlib
+
+    from bench_smtp import ServidorSMTPPrueba
+    from utils.artefactos import deserializar, serializar
+    from utils.aws import (
+        get_dynamodb_client, get_dynamodb_resource, get_dynamodbstreams_client, get_s3_client, reset_clientes
+    )
+
+    servidor_smtp = ServidorSMTPPrueba().__enter__()
+    os.environ['SMTP_HOST'] = '127.0.0.1'
+    os.environ['SMTP_PORT'] = str(servidor_smtp.puerto)
+
+    modulos = {nombre: importlib.import_module(MODULOS_DAG[nombre]) for nombre in args.dags}
+    import utils.usuarios
+
+    salida = {
+        'version': VERSION_RESULTADOS,
+        'fecha': datetime.now(timezone.utc).isoformat(),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'backend': args.backend,
+        'semilla': args.semilla,
+        'resultados': [],
+    }
+
+    try:
+        reset_clientes()
+        resource_dynamo = get_dynamodb_resource()
+        contador = ContadorLlamadas()
+        contador.registrar(resource_dynamo.meta.client)
+        contador.registrar(get_dynamodb_client())
+        contador.registrar(get_dynamodbstreams_client())
+        get_s3_client().create_bucket(Bucket=os.environ['S3_BUCKET_REPORTES'])
+
+        for escala in args.escalas:
+            ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+            inicio = time.perf_counter()
+            dataset = generar_dataset(escala, ahora, semilla=args.semilla, historial_embebido=args.historial_embebido)
+            t_generar = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            crear_tablas(resource_dynamo)
+            for nombre, items in dataset.items():
+                cargar_tabla(resource_dynamo, nombre, items)
+            t_cargar = time.perf_counter() - inicio
+            conteos = {nombre: len(items) for nombre, items in dataset.items()}
+            del dataset
+            print(f"\n📦 Escala {escala}: {conteos} (generación {t_generar:.1f}s, carga {t_cargar:.1f}s)")
+
+            # Estado persistente (agenda, registro, rollup, cachés) en frío por escala
+            shutil.rmtree(directorio_artefactos, ignore_errors=True)
+            os.makedirs(directorio_artefactos)
+            utils.usuarios._memoria.clear()
+
+            for repeticion in range(args.repeticiones):
+                for nombre, modulo in modulos.items():
+                    inicio = time.perf_counter()
+                    run_id = f"bench__{escala}__{repeticion}"
+                    mediciones = ejecutar_dag(modulo, run_id, contador, serializar, deserializar)
+                    total = time.perf_counter() - inicio
+                    print(f"⏱️ {modulo.dag.dag_id} (rep. {repeticion}): {total:.3f}s")
+                    for medicion in mediciones:
+                        salida['resultados'].append({
+                            'escala': escala, 'dag': modulo.dag.dag_id, 'repeticion': repeticion, **medicion,
+                        })
+                    salida['resultados'].append({
+                        'escala': escala, 'dag': modulo.dag.dag_id, 'repeticion': repeticion,
+                        'tarea': '__total__', 'segundos': round(total, 4),
+                        'ok': all(m.get('ok', True) for m in mediciones),
+                    })
+            salida.setdefault('escalas', {})[str(escala)] = {
+                'items': conteos,
+                'generacion_s': round(t_generar, 3),
+                'carga_s': round(t_cargar, 3),
+                # Pico de memoria del proceso hasta esta escala (KB en Linux)
+                'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            }
+    finally:
+        servidor_smtp.__exit__(None, None, None)
+        if mock is not None:
+            mock.stop()
+        shutil.rmtree(directorio_artefactos, ignore_errors=True)
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(salida, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        regresiones = comparar(salida, anterior, args.umbral)
+        if regresiones:
+            print(f"\n⚠️ {len(regresiones)} tareas empeoraron más de {args.umbral}%")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
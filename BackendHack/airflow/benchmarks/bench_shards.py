@@ -0,0 +1,67 @@
+"""
+Benchmark y verificación: rollup y reportes en serie vs repartidos en
+procesos (utils.paralelo). Construye ambos con los mismos incidentes
+sintéticos, compara el reporte completo (histórico y cada ventana) y
+mide el tiempo.
+
+Uso:
+    python airflow/benchmarks/bench_shards.py [--tamanos 100000 500000] [--shards 2 4 8]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+from datos_sinteticos import generar_incidentes  # noqa: E402
+from utils.analisis import analizar, analizar_ventana  # noqa: E402
+from utils.fechas import parse_duracion  # noqa: E402
+from utils.paralelo import orden_recientes, procesar, procesar_particionado  # noqa: E402
+from utils.rollup import consultar_ventanas  # noqa: E402
+
+VENTANAS = ('1h', '24h', '7d', '30d')
+
+
+def reporte(rollup, recientes, ahora):
+    """Todo lo que calcula analizar_incidentes, serializado como en el XCom"""
+    rangos = {'historico': (None, None)}
+    rangos.update({ventana: (ahora - parse_duracion(ventana), None) for ventana in VENTANAS})
+    datos = consultar_ventanas(rollup, rangos)
+    resultado = analizar(recientes, rollup=rollup, datos_rollup=datos['historico'])
+    resultado['ventanas'] = {ventana: analizar_ventana(datos[ventana]) for ventana in VENTANAS}
+    return json.dumps(resultado, sort_keys=True, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[100_000, 500_000])
+    parser.add_argument('--shards', type=int, nargs='+', default=[2, 4, 8])
+    args = parser.parse_args()
+
+    ahora = datetime(2025, 11, 20, 12)
+    desde = ahora - timedelta(hours=24)
+    print(f"{'incidentes':>12} | {'shards':>6} | {'serie (s)':>9} | {'shards (s)':>10} | {'speedup':>7} | iguales")
+    for n in args.tamanos:
+        incidentes, _ = generar_incidentes(n, ahora)
+
+        inicio = time.perf_counter()
+        rollup, recientes, _ = procesar(incidentes, desde)
+        recientes = orden_recientes(recientes)
+        t_serie = time.perf_counter() - inicio
+        esperado = reporte(rollup, recientes, ahora)
+
+        for shards in args.shards:
+            inicio = time.perf_counter()
+            rollup_p, recientes_p, leidos = procesar_particionado(incidentes, desde, shards=shards)
+            t_shards = time.perf_counter() - inicio
+
+            iguales = leidos == n and reporte(rollup_p, recientes_p, ahora) == esperado
+            print(f"{n:>12} | {shards:>6} | {t_serie:>9.2f} | {t_shards:>10.2f} | {t_serie / t_shards:>6.1f}x | {iguales}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark: envío SMTP serial con una conexión (implementación anterior de
+enviar_emails_via_smtp) vs utils.smtp.EnviadorSMTP (pool + límite de tasa).
+
+Levanta un servidor SMTP local de prueba (sumidero tipo aiosmtpd, solo
+stdlib) que acepta todo (también AUTH), simula latencia por mensaje y puede cortar la
+conexión cada N mensajes para ejercitar las reconexiones.
+
+Uso:
+    python airflow/benchmarks/bench_smtp.py [--mensajes 10000] [--conexiones 8]
+        [--latencia-ms 5] [--tasa 0] [--corte-cada 500]
+"""
+
+import argparse
+import os
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+from utils.smtp import EnviadorSMTP, percentiles  # noqa: E402
+
+
+class _SesionSMTP(socketserver.StreamRequestHandler):
+    """Diálogo SMTP mínimo: EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def responder(self, linea):
+        self.wfile.write(f"{linea}\r\n".encode())
+
+    def handle(self):
+        servidor = self.server
+        self.responder('220 localhost SMTP de prueba')
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode(errors='replace').strip().upper()
+
+            if comando.startswith('EHLO'):
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif comando.startswith('AUTH'):
+                # Acepta cualquier credencial (AUTH PLAIN con respuesta inicial)
+                self.responder('235 Autenticado')
+            elif comando.startswith(('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.responder('250 OK')
+            elif comando == 'DATA':
+                self.responder('354 Fin con <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                with servidor.lock:
+                    servidor.recibidos += 1
+                    cortar = servidor.corte_cada and servidor.recibidos % servidor.corte_cada == 0
+                self.responder('250 Encolado')
+                if cortar:
+                    return
+            elif comando == 'QUIT':
+                self.responder('221 Adiós')
+                return
+            else:
+                self.responder('502 No implementado')
+
+
+class ServidorSMTPPrueba(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latencia_ms=0, corte_cada=0):
+        super().__init__(('127.0.0.1', 0), _SesionSMTP)
+        self.latencia = latencia_ms / 1000
+        self.corte_cada = corte_cada
+        self.recibidos = 0
+        self.lock = threading.Lock()
+
+    @property
+    def puerto(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def generar_emails(n):
+    return [
+        {
+            'destinatario': f"autoridad{i}@utec.edu.pe",
+            'asunto': '🚨 3 Incidente(s) Prioritario(s) - SEGURIDAD',
+            'contenido': '<h2>Alerta</h2>' + '<li>incidente</li>' * 20,
+        }
+        for i in range(n)
+    ]
+
+
+def construir_mensaje(email_data):
+    mensaje = MIMEMultipart('alternative')
+    mensaje['Subject'] = email_data['asunto']
+    mensaje['From'] = 'Alertas UTEC <alertas@utec.edu.pe>'
+    mensaje['To'] = email_data['destinatario']
+    mensaje.attach(MIMEText(email_data['contenido'], 'html', 'utf-8'))
+    return mensaje
+
+
+def envio_anterior(puerto, emails):
+    """Una conexión, envío serial; un corte de conexión aborta el resto del lote"""
+    inicio = time.perf_counter()
+    latencias = []
+    enviados = 0
+    try:
+        server = smtplib.SMTP('127.0.0.1', puerto)
+        for email_data in emails:
+            t0 = time.perf_counter()
+            try:
+                server.send_message(construir_mensaje(email_data))
+                enviados += 1
+                latencias.append(round((time.perf_counter() - t0) * 1000, 2))
+            except smtplib.SMTPServerDisconnected:
+                break
+        try:
+            server.quit()
+        except smtplib.SMTPServerDisconnected:
+            pass
+    except Exception as e:
+        print(f"❌ {e}")
+    duracion = time.perf_counter() - inicio
+    return {
+        'enviados': enviados,
+        'duracion_s': round(duracion, 3),
+        'por_segundo': round(enviados / duracion, 1),
+        'latencia_ms': {**percentiles(latencias), 'max': max(latencias, default=0)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mensajes', type=int, default=10_000)
+    parser.add_argument('--conexiones', type=int, default=8)
+    parser.add_argument('--latencia-ms', type=float, default=5)
+    parser.add_argument('--tasa', type=float, default=0, help='Mensajes por segundo (0 = sin límite)')
+    parser.add_argument('--corte-cada', type=int, default=500, help='El servidor corta la conexión cada N mensajes')
+    args = parser.parse_args()
+
+    emails = generar_emails(args.mensajes)
+
+    with ServidorSMTPPrueba(args.latencia_ms, args.corte_cada) as servidor:
+        anterior = envio_anterior(servidor.puerto, emails)
+
+    with ServidorSMTPPrueba(args.latencia_ms, args.corte_cada) as servidor:
+        enviador = EnviadorSMTP(
+            '127.0.0.1', servidor.puerto, starttls=False,
+            conexiones=args.conexiones, mensajes_por_segundo=args.tasa
+        )
+        pool = enviador.enviar(emails, construir_mensaje)
+
+    print(f"{'':>10} | {'enviados':>9} | {'duración (s)':>12} | {'msg/s':>8} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7}")
+    for nombre, r, enviados in (
+        ('anterior', anterior, anterior['enviados']),
+        ('pool', pool, len(pool['enviados'])),
+    ):
+        lat = r['latencia_ms']
+        print(f"{nombre:>10} | {enviados:>9} | {r['duracion_s']:>12.3f} | {r['por_segundo']:>8.1f} | "
+              f"{lat['p50']:>7} | {lat['p95']:>7} | {lat['p99']:>7}")
+    print(f"pool: {pool['conexiones']} conexiones, {pool['reconexiones']} reconexiones, "
+          f"{pool['reintentos']} reintentos, {len(pool['fallidos'])} fallidos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Generador de datos sintéticos con el formato de las Lambdas
+(crearIncidente, actualizarEstado, register, connect) para los benchmarks.
+
+- Incidentes: tipo y ubicación con sesgo tipo Zipf (pocos tipos y lugares
+  concentran la mayoría), llegada con pico en horario de clases, casi todos
+  los antiguos cerrados y los recientes mayormente abiertos.
+- IncidentesHistorial: 1 + geométrica eventos por incidente (cola larga
+  con comentarios y cambios de estado); opcionalmente embebidos en el item
+  como antes de la migración.
+- Usuarios: estudiantes y autoridades por área (áreas grandes con más).
+- WebSocketConnections/PresenciaUsuarios: fracción de usuarios online con
+  1-3 conexiones y algunos contadores huérfanos (>2 h sin actualizar).
+
+Todo es determinista para una semilla y un `ahora` dados.
+"""
+
+import random
+from datetime import timedelta
+
+TIPO_A_AREA = {
+    'robo': 'seguridad',
+    'acoso': 'seguridad',
+    'pelea': 'seguridad',
+    'acceso_no_autorizado': 'seguridad',
+    'emergencia_medica': 'enfermeria',
+    'accidente': 'enfermeria',
+    'malestar': 'enfermeria',
+    'fuga_agua': 'infraestructura',
+    'daño_estructural': 'infraestructura',
+    'inundacion': 'infraestructura',
+    'baño_sucio': 'limpieza',
+    'basura_acumulada': 'limpieza',
+    'derrame': 'limpieza',
+    'internet_caido': 'tecnologia',
+    'equipo_dañado': 'tecnologia',
+    'sistema_caido': 'tecnologia',
+    'luz_fundida': 'mantenimiento',
+    'aire_acondicionado': 'mantenimiento',
+    'puerta_dañada': 'mantenimiento',
+}
+AREAS = sorted(set(TIPO_A_AREA.values()))
+
+LUGARES_COMUNES = ['Biblioteca', 'Cafetería', 'Auditorio', 'Patio central', 'Estacionamiento', 'Gimnasio']
+UBICACIONES = LUGARES_COMUNES + [
+    f"Pabellón {pabellon}, Piso {piso}" for pabellon in 'ABCDEFGHIJK' for piso in range(1, 13)
+]
+
+# Peso relativo de llegada por hora del día (pico 10-13 h y 15-18 h)
+PESO_HORA = [1, 1, 1, 1, 1, 2, 4, 8, 12, 14, 16, 16, 15, 12, 13, 15, 15, 14, 10, 7, 5, 3, 2, 1]
+
+URGENCIAS = ['baja', 'media', 'alta', 'critica']
+PESO_URGENCIA = [35, 35, 20, 10]
+
+
+def _fecha_iso(fecha):
+    return fecha.strftime('%Y-%m-%dT%H:%M:%S.') + f"{fecha.microsecond // 1000:03d}Z"
+
+
+def pesos_zipf(n, s=1.1):
+    """Pesos 1/k^s para k = 1..n"""
+    return [1 / (k ** s) for k in range(1, n + 1)]
+
+
+def _orden_sesgado(valores, rnd, s):
+    """Valores en orden aleatorio (fijo por semilla) con sus pesos Zipf"""
+    valores = list(valores)
+    rnd.shuffle(valores)
+    return valores, pesos_zipf(len(valores), s)
+
+
+def _llegada(rnd, ahora, dias):
+    """Fecha de creación: día uniforme en la ventana, hora con pico diurno"""
+    dia = ahora - timedelta(days=rnd.randrange(dias))
+    hora = rnd.choices(range(24), weights=PESO_HORA)[0]
+    fecha = dia.replace(hour=hora, minute=rnd.randrange(60), second=rnd.randrange(60),
+                        microsecond=rnd.randrange(1000) * 1000)
+    if fecha > ahora:
+        fecha -= timedelta(days=1)
+    return fecha
+
+
+def _estado_final(rnd, edad):
+    """Estado según la antigüedad: los recientes siguen abiertos, los viejos no"""
+    if edad < timedelta(hours=4):
+        pesos = [55, 25, 18, 2]
+    elif edad < timedelta(days=2):
+        pesos = [20, 20, 55, 5]
+    else:
+        pesos = [2, 2, 88, 8]
+    return rnd.choices(['pendiente', 'en_atencion', 'resuelto', 'cancelado'], weights=pesos)[0]
+
+
+def _historial(rnd, creacion, estado, ahora, usuario):
+    """Eventos del incidente, de más antiguo a más reciente"""
+    eventos = [{'accion': 'creado', 'fecha': _fecha_iso(creacion), 'usuario': usuario}]
+    fecha = creacion
+
+    extra = 0
+    while rnd.random() < 0.65 and extra < 60:
+        extra += 1
+
+    limite = ahora if estado not in ('resuelto', 'cancelado') else creacion + timedelta(minutes=rnd.randint(10, 60 * 48))
+    limite = min(limite, ahora)
+    paso = max((limite - creacion) / (extra + 2), timedelta(seconds=1))
+
+    if estado != 'pendiente':
+        fecha += paso
+        eventos.append({'accion': 'estado cambiado a en_atencion', 'fecha': _fecha_iso(fecha), 'usuario': 'autoridad'})
+    for _ in range(extra):
+        fecha += paso
+        eventos.append({'accion': 'comentario', 'fecha': _fecha_iso(fecha), 'usuario': 'autoridad'})
+    if estado in ('resuelto', 'cancelado'):
+        eventos.append({'accion': f"estado cambiado a {estado}", 'fecha': _fecha_iso(limite), 'usuario': 'autoridad'})
+    return eventos
+
+
+def generar_incidentes(n, ahora, dias=90, semilla=42, historial_embebido=False):
+    """
+    Devuelve (incidentes, eventos): items de Incidentes y de
+    IncidentesHistorial. Con `historial_embebido` los eventos van además en
+    el atributo `historial` del item (formato anterior a la migración).
+    """
+    rnd = random.Random(semilla)
+    tipos, peso_tipos = _orden_sesgado(TIPO_A_AREA, rnd, 1.1)
+    ubicaciones, peso_ubicaciones = _orden_sesgado(UBICACIONES, rnd, 1.2)
+    # Ventana más corta que 90 días para escalas chicas: que haya datos recientes
+    dias = max(1, min(dias, n // 50 or 1))
+
+    incidentes = []
+    eventos = []
+    for i in range(n):
+        creacion = _llegada(rnd, ahora, dias)
+        estado = _estado_final(rnd, ahora - creacion)
+        tipo = rnd.choices(tipos, weights=peso_tipos)[0]
+        urgencia = rnd.choices(URGENCIAS, weights=PESO_URGENCIA)[0]
+        incidente_id = f"INC_{i:07d}"
+        historial = _historial(rnd, creacion, estado, ahora, f"estudiante{rnd.randrange(max(1, n // 10))}@utec.edu.pe")
+
+        item = {
+            'incidenteId': incidente_id,
+            'tipo': tipo,
+            'descripcion': f"Reporte sintético de {tipo.replace('_', ' ')}",
+            'ubicacion': rnd.choices(ubicaciones, weights=peso_ubicaciones)[0],
+            'urgencia': urgencia,
+            'area': TIPO_A_AREA[tipo],
+            'userId': f"USR_{rnd.randrange(max(1, n // 10)):07d}",
+            'estado': estado,
+            'fechaCreacion': historial[0]['fecha'],
+            'ultimoEvento': {'accion': historial[-1]['accion'], 'fecha': historial[-1]['fecha']},
+            'totalEventos': len(historial),
+        }
+        if len(historial) > 1:
+            item['fechaActualizacion'] = historial[-1]['fecha']
+        if estado == 'resuelto':
+            item['fechaResolucion'] = historial[-1]['fecha']
+        if estado not in ('resuelto', 'cancelado'):
+            item['colaAbierta'] = urgencia
+        if historial_embebido:
+            item['historial'] = historial
+
+        incidentes.append(item)
+        eventos.extend(
+            {'incidenteId': incidente_id, 'eventoId': f"{evento['fecha']}#m{pos:05d}", **evento}
+            for pos, evento in enumerate(historial)
+        )
+    return incidentes, eventos
+
+
+def generar_usuarios(n_estudiantes, n_autoridades, semilla=42):
+    """Items de Usuarios: autoridades repartidas por área (sesgo Zipf) y estudiantes"""
+    rnd = random.Random(semilla)
+    areas, peso_areas = _orden_sesgado(AREAS, rnd, 0.8)
+
+    usuarios = []
+    for i in range(n_autoridades):
+        # Al menos una autoridad por área
+        area = areas[i] if i < len(areas) else rnd.choices(areas, weights=peso_areas)[0]
+        usuarios.append({
+            'userId': f"AUT_{i:06d}",
+            'email': f"autoridad{i}@utec.edu.pe",
+            'nombre': f"Autoridad {i}",
+            'rol': 'autoridad',
+            'area': area,
+            'password': '$2a$10$sintetico',
+            'fechaCreacion': '2025-01-01T00:00:00.000Z',
+        })
+    for i in range(n_estudiantes):
+        usuarios.append({
+            'userId': f"USR_{i:07d}",
+            'email': f"estudiante{i}@utec.edu.pe",
+            'nombre': f"Estudiante {i}",
+            'rol': 'estudiante',
+            'password': '$2a$10$sintetico',
+            'fechaCreacion': '2025-01-01T00:00:00.000Z',
+        })
+    return usuarios
+
+
+def generar_conexiones(usuarios, ahora, fraccion_autoridades=0.3, fraccion_estudiantes=0.05, semilla=42):
+    """Devuelve (conexiones, presencia) para WebSocketConnections y PresenciaUsuarios"""
+    rnd = random.Random(semilla)
+    conexiones = []
+    presencia = []
+    for usuario in usuarios:
+        fraccion = fraccion_autoridades if usuario['rol'] == 'autoridad' else fraccion_estudiantes
+        if rnd.random() >= fraccion:
+            continue
+
+        # ~5% son contadores huérfanos de un $disconnect perdido
+        huerfano = rnd.random() < 0.05
+        ultima = ahora - (timedelta(hours=rnd.randint(3, 48)) if huerfano else timedelta(minutes=rnd.randint(0, 110)))
+        cantidad = rnd.choices([1, 2, 3], weights=[70, 22, 8])[0]
+        for _ in range(cantidad):
+            conexiones.append({
+                'connectionId': f"{rnd.getrandbits(64):016x}=",
+                'userId': usuario['userId'],
+                'connectedAt': _fecha_iso(ultima),
+            })
+        presencia.append({
+            'userId': usuario['userId'],
+            'conexiones': cantidad,
+            'ultimaConexion': _fecha_iso(ultima),
+        })
+    return conexiones, presencia
+
+
+def generar_dataset(n, ahora, semilla=42, historial_embebido=False):
+    """Todas las tablas para `n` incidentes: {nombre_tabla: items}"""
+    incidentes, eventos = generar_incidentes(n, ahora, semilla=semilla, historial_embebido=historial_embebido)
+    usuarios = generar_usuarios(max(50, n // 10), min(600, max(len(AREAS) * 2, n // 500)), semilla=semilla)
+    conexiones, presencia = generar_conexiones(usuarios, ahora, semilla=semilla)
+    return {
+        'Incidentes': incidentes,
+        'IncidentesHistorial': eventos,
+        'Usuarios': usuarios,
+        'WebSocketConnections': conexiones,
+        'PresenciaUsuarios': presencia,
+    }
@@ -0,0 +1,153 @@
+"""
+Presupuesto de parseo de los DAGs.
+
+El DAG processor re-importa cada archivo de DAG cada
+min_file_process_interval, corra o no alguna tarea: lo que se importa a
+nivel de módulo se paga en cada parseo. Este script importa cada DAG en un
+proceso nuevo (como DagBag: spec_from_file_location + exec_module) y mide,
+descontando lo que ya carga Airflow:
+
+- segundos del import del archivo (el mínimo de --repeticiones procesos)
+- módulos nuevos en sys.modules
+- si se cargó alguno de PROHIBIDOS (deben importarse dentro de las tareas,
+  ver utils/perezoso.py)
+
+Termina con código 1 si algún DAG supera el presupuesto. Sin Airflow
+instalado mide solo los imports no-airflow del archivo (los utils), que es
+la parte que controla este repo.
+
+Uso:
+    python airflow/benchmarks/presupuesto_parseo.py [--max-segundos 0.5]
+        [--max-modulos 150] [--repeticiones 3] [--dags generar_reportes ...]
+
+El mismo presupuesto corre como test (desde airflow/):
+    python -m pytest -q tests/test_presupuesto_parseo.py
+
+En un entorno con Airflow, `airflow dags report` da el tiempo total de
+parseo por archivo (incluido Airflow).
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+DAGS = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+# Presupuesto por DAG (el mismo que asserta tests/test_presupuesto_parseo.py)
+MAX_SEGUNDOS = 0.5
+MAX_MODULOS = 150
+
+PROHIBIDOS = (
+    'boto3', 'botocore', 'numpy', 'pyarrow', 'requests', 'smtplib', 'email.mime',
+    'concurrent.futures.process',
+)
+
+# Corre en el proceso hijo: argv = [ruta del DAG, directorio de DAGs]
+MEDIR = r'''
+import ast, importlib.util, json, sys, time
+
+ruta, dags = sys.argv[1], sys.argv[2]
+sys.path.insert(0, dags)
+with open(ruta) as f:
+    arbol = ast.parse(f.read(), ruta)
+
+def es_airflow(nodo):
+    nombres = [a.name for a in nodo.names] if isinstance(nodo, ast.Import) else [nodo.module or '']
+    return all(n == 'airflow' or n.startswith('airflow.') for n in nombres)
+
+imports = [n for n in arbol.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+try:
+    exec(compile(ast.Module([n for n in imports if es_airflow(n)], []), ruta, 'exec'), {})
+    modo = 'dag'
+except ImportError:
+    modo = 'utils'
+
+antes = set(sys.modules)
+inicio = time.perf_counter()
+if modo == 'dag':
+    spec = importlib.util.spec_from_file_location('presupuesto_dag', ruta)
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+else:
+    exec(compile(ast.Module([n for n in imports if not es_airflow(n)], []), ruta, 'exec'), {})
+segundos = time.perf_counter() - inicio
+
+nuevos = sorted(set(sys.modules) - antes)
+print(json.dumps({'modo': modo, 'segundos': segundos, 'modulos': nuevos}))
+'''
+
+
+def medir(ruta):
+    """Medición del import de `ruta` en un proceso nuevo; None y el error si falla"""
+    salida = subprocess.run([sys.executable, '-c', MEDIR, ruta, DAGS], capture_output=True, text=True, cwd=DAGS)
+    if salida.returncode != 0:
+        lineas = salida.stderr.strip().splitlines()
+        return None, lineas[-1] if lineas else f"código {salida.returncode}"
+    return json.loads(salida.stdout.strip().splitlines()[-1]), None
+
+
+def medir_dag(ruta, repeticiones=3):
+    """La medición más rápida de `repeticiones` procesos; None y el error si falla"""
+    mediciones = []
+    for _ in range(max(1, repeticiones)):
+        medicion, error = medir(ruta)
+        if error:
+            return None, error
+        mediciones.append(medicion)
+    return min(mediciones, key=lambda m: m['segundos']), None
+
+
+def rutas_dags():
+    return sorted(glob.glob(os.path.join(DAGS, '*.py')))
+
+
+def prohibidos(modulos):
+    return sorted(p for p in PROHIBIDOS if any(m == p or m.startswith(p + '.') for m in modulos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-segundos', type=float, default=MAX_SEGUNDOS)
+    parser.add_argument('--max-modulos', type=int, default=MAX_MODULOS)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--dags', nargs='+', default=None, help='Nombres de archivo sin .py (por defecto todos)')
+    args = parser.parse_args()
+
+    rutas = rutas_dags()
+    if args.dags:
+        rutas = [r for r in rutas if os.path.splitext(os.path.basename(r))[0] in args.dags]
+
+    excedidos = []
+    print(f"{'dag':<34} | {'modo':>5} | {'segundos':>8} | {'módulos':>7} | prohibidos")
+    for ruta in rutas:
+        nombre = os.path.splitext(os.path.basename(ruta))[0]
+        medicion, error = medir_dag(ruta, args.repeticiones)
+        if error:
+            # Lo mismo que vería el DAG processor: un import error
+            print(f"{nombre:<34} | {'error':>5} | {'-':>8} | {'-':>7} | {error}")
+            excedidos.append(f"{nombre}: falla al importar ({error})")
+            continue
+
+        cargados = prohibidos(medicion['modulos'])
+        print(f"{nombre:<34} | {medicion['modo']:>5} | {medicion['segundos']:>8.3f} | "
+              f"{len(medicion['modulos']):>7} | {', '.join(cargados) or '-'}")
+
+        if medicion['segundos'] > args.max_segundos:
+            excedidos.append(f"{nombre}: {medicion['segundos']:.3f}s > {args.max_segundos}s")
+        if len(medicion['modulos']) > args.max_modulos:
+            excedidos.append(f"{nombre}: {len(medicion['modulos'])} módulos > {args.max_modulos}")
+        if cargados:
+            excedidos.append(f"{nombre}: importa al parsear {', '.join(cargados)}")
+
+    if excedidos:
+        print("\n❌ Presupuesto de parseo excedido:")
+        for linea in excedidos:
+            print(f"  - {linea}")
+        sys.exit(1)
+    print("\n✅ Todos los DAGs dentro del presupuesto")
+
+
+if __name__ == '__main__':
+    main()
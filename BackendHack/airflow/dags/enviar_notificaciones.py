@@ -6,14 +6,19 @@ Envía notificaciones por email a usuarios offline del área responsable
 from datetime import datetime, timedelta
 from airflow import DAG
 from airflow.operators.python import PythonOperator
-from airflow.operators.email import EmailOperator
-import json
-import boto3
-import requests
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
+from utils.aws import get_dynamodb_resource, get_dynamodb_table
+from utils.cambios import leer_abiertos
+from utils.dynamo import RESULTADO_OK, ejecutar_en_paralelo
+from utils.fechas import ahora_utc, fecha_iso
+from utils.historial import DYNAMODB_TABLE_HISTORIAL, registrar_evento, resumen_evento
+from utils.metricas import guardar_resumen_corrida, instrumentar
+from utils.notificaciones import cargar_registro, guardar_registro, marcar_enviados, pendientes_de_envio, podar, version_incidente
+from utils.plantillas_email import CacheDigests, construir_mensaje
+from utils.presencia import filtrar_online
+from utils.smtp import EnviadorSMTP
+from utils.usuarios import DYNAMODB_TABLE_USUARIOS, autoridades_por_area
 
 # Configuración desde variables de entorno
 API_BASE_URL = os.getenv('API_BASE_URL', 'https://if1stu7r2g.execute-api.us-east-1.amazonaws.com/dev')
@@ -60,37 +65,34 @@ dag = DAG(
     description='Envío de notificaciones por email a usuarios offline',
     schedule_interval=timedelta(minutes=int(os.getenv('DAG_NOTIFICACIONES_INTERVAL_MINUTES', '10'))),  # Cada 10 min
     catchup=False,
+    on_success_callback=guardar_resumen_corrida,
+    on_failure_callback=guardar_resumen_corrida,
     tags=['notificaciones', 'email', 'usuarios-offline']
 )
 
+@instrumentar
 def detectar_incidentes_para_notificar(**context):
     """Detecta incidentes que requieren notificación por email"""
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    table = dynamodb.Table(DYNAMODB_TABLE)
-
-    # Buscar incidentes de alta o crítica urgencia sin resolver
-    response = table.scan(
-        FilterExpression='(urgencia = :alta OR urgencia = :critica) AND (estado = :pend OR estado = :aten)',
-        ExpressionAttributeValues={
-            ':alta': 'alta',
-            ':critica': 'critica',
-            ':pend': 'pendiente',
-            ':aten': 'en_atencion'
-        }
-    )
+    table = get_dynamodb_table(DYNAMODB_TABLE, AWS_REGION)
+
+    # Incidentes de alta o crítica urgencia sin resolver: del snapshot de
+    # cambios, o dos particiones del índice disperso de abiertos (o scan)
+    incidentes = [
+        inc for inc in leer_abiertos(table, urgencias=('alta', 'critica'))
+        if inc.get('estado') in ('pendiente', 'en_atencion')
+    ]
 
-    incidentes = response.get('Items', [])
     print(f"📧 Encontrados {len(incidentes)} incidentes de alta/crítica urgencia para notificar")
 
     context['ti'].xcom_push(key='incidentes_para_notificar', value=incidentes)
     return incidentes
 
+@instrumentar
 def obtener_usuarios_area(**context):
     """Obtiene usuarios del área responsable con rol 'autoridad'"""
     incidentes = context['ti'].xcom_pull(key='incidentes_para_notificar')
     
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    usuarios_table = dynamodb.Table('Usuarios')
+    usuarios_table = get_dynamodb_table(DYNAMODB_TABLE_USUARIOS, AWS_REGION)
     
     # Mapeo de área del incidente a área de usuario
     area_mapping = {
@@ -113,48 +115,35 @@ def obtener_usuarios_area(**context):
             por_area[area_usuario] = []
         por_area[area_usuario].append(inc)
     
-    # Obtener usuarios de cada área
+    # Autoridades de todas las áreas a la vez: AreaIndex en paralelo + caché con TTL
+    autoridades, errores = autoridades_por_area(usuarios_table, por_area.keys())
+    for area, error in errores.items():
+        print(f"❌ Error obteniendo usuarios de área {area}: {error}")
+
     usuarios_por_area = {}
-    
-    for area, incidentes_area in por_area.items():
-        try:
-            # Buscar usuarios con rol 'autoridad' en esta área
-            response = usuarios_table.scan(
-                FilterExpression='area = :area AND rol = :rol',
-                ExpressionAttributeValues={
-                    ':area': area,
-                    ':rol': 'autoridad'
-                }
-            )
-            
-            usuarios = response.get('Items', [])
-            usuarios_por_area[area] = {
-                'usuarios': usuarios,
-                'incidentes': incidentes_area
-            }
-            
-            print(f"👥 Área '{area}': {len(usuarios)} usuarios autoridad, {len(incidentes_area)} incidentes")
-            
-        except Exception as e:
-            print(f"❌ Error obteniendo usuarios de área {area}: {str(e)}")
-    
+    for area, usuarios in autoridades.items():
+        incidentes_area = por_area[area]
+        usuarios_por_area[area] = {
+            'usuarios': usuarios,
+            'incidentes': incidentes_area
+        }
+
+        print(f"👥 Área '{area}': {len(usuarios)} usuarios autoridad, {len(incidentes_area)} incidentes")
+
     context['ti'].xcom_push(key='usuarios_por_area', value=usuarios_por_area)
     return usuarios_por_area
 
+@instrumentar
 def filtrar_usuarios_offline(**context):
     """Filtra usuarios que NO están conectados por WebSocket"""
     usuarios_por_area = context['ti'].xcom_pull(key='usuarios_por_area')
     
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    connections_table = dynamodb.Table('WebSocketConnections')
-    
-    # Obtener todas las conexiones activas
+    # Presencia solo de los usuarios candidatos (BatchGetItem por userId)
+    candidatos = [u.get('userId') for data in usuarios_por_area.values() for u in data['usuarios']]
     try:
-        response = connections_table.scan()
-        conexiones_activas = response.get('Items', [])
-        usuarios_online = set([conn.get('userId') for conn in conexiones_activas if conn.get('userId')])
-        
-        print(f"🌐 {len(usuarios_online)} usuarios online actualmente")
+        usuarios_online = filtrar_online(get_dynamodb_resource(AWS_REGION), candidatos)
+
+        print(f"🌐 {len(usuarios_online)} de {len(set(candidatos))} usuarios candidatos online actualmente")
     except Exception as e:
         print(f"⚠️ Error obteniendo conexiones: {str(e)}")
         usuarios_online = set()
@@ -179,69 +168,74 @@ def filtrar_usuarios_offline(**context):
     context['ti'].xcom_push(key='usuarios_offline_por_area', value=usuarios_offline_por_area)
     return usuarios_offline_por_area
 
+def _usuario_id(usuario):
+    return usuario.get('userId') or usuario.get('email', '')
+
+@instrumentar
 def preparar_notificaciones_email(**context):
-    """Prepara contenido de emails para usuarios offline"""
+    """Prepara emails para usuarios offline, solo con incidentes nuevos o con cambios"""
     usuarios_offline_por_area = context['ti'].xcom_pull(key='usuarios_offline_por_area')
 
     if not usuarios_offline_por_area:
         print("✅ No hay usuarios offline para notificar")
         return []
 
+    registro = cargar_registro()
+    ahora = ahora_utc()
+    digests = CacheDigests(DASHBOARD_URL)
     emails_a_enviar = []
+    omitidos = 0
 
     for area, data in usuarios_offline_por_area.items():
         usuarios = data['usuarios']
-        incidentes_area = data['incidentes']
 
         for usuario in usuarios:
-            contenido = f"""
-        <h2>🚨 Alerta de Incidentes - {area.upper()}</h2>
-        <p>Hola {usuario.get('nombre', usuario.get('email', 'Usuario'))},</p>
-        <p>Se han detectado {len(incidentes_area)} incidentes de alta prioridad en tu área que requieren atención:</p>
-        <ul>
-        """
-
-            for inc in incidentes_area:
-                contenido += f"""
-            <li>
-                <strong>ID:</strong> {inc['incidenteId']}<br>
-                <strong>Tipo:</strong> {inc.get('tipo', 'N/A')}<br>
-                <strong>Ubicación:</strong> {inc.get('ubicacion', 'N/A')}<br>
-                <strong>Descripción:</strong> {inc.get('descripcion', 'N/A')}<br>
-                <strong>Estado:</strong> {inc.get('estado', 'N/A')}<br>
-                <strong>Urgencia:</strong> {inc.get('urgencia', 'N/A')}<br>
-                <strong>Fecha:</strong> {inc.get('fechaCreacion', 'N/A')}<br>
-                <hr>
-            </li>
-            """
-
-            contenido += f"""
-        </ul>
-        <p>Por favor, ingresa al sistema para gestionar estos incidentes.</p>
-        <p><a href="{DASHBOARD_URL}">🔗 Acceder al Dashboard</a></p>
-        <br>
-        <p><small>Esta es una notificación automática del Sistema de Alertas UTEC.<br>
-        Recibiste este email porque tu usuario está registrado como autoridad del área de {area}.</small></p>
-        """
+            # Ya notificados sin cambios de urgencia/estado: no se reenvían
+            incidentes_area = pendientes_de_envio(registro, _usuario_id(usuario), data['incidentes'], ahora)
+            omitidos += len(data['incidentes']) - len(incidentes_area)
+            if not incidentes_area:
+                continue
+
+            # El digest del área se renderiza una vez por conjunto de incidentes
+            digest = digests.obtener(area, incidentes_area)
 
             emails_a_enviar.append({
                 'destinatario': usuario.get('email', ''),
                 'nombre': usuario.get('nombre', usuario.get('email', 'Usuario')),
+                'userId': _usuario_id(usuario),
                 'area': area,
                 'asunto': f'🚨 {len(incidentes_area)} Incidente(s) Prioritario(s) - {area.upper()}',
-                'contenido': contenido
+                'digest': digest,
+                'incidenteIds': [inc['incidenteId'] for inc in incidentes_area],
+                'versiones': {inc['incidenteId']: version_incidente(inc) for inc in incidentes_area}
             })
 
-    print(f"📧 Preparados {len(emails_a_enviar)} emails para enviar")
+    print(f"📧 Preparados {len(emails_a_enviar)} emails para enviar con {len(digests.digests)} digests "
+          f"({omitidos} avisos omitidos por no tener cambios)")
+    # Los emails llevan solo la clave del digest: cada HTML viaja una vez por XCom
+    context['ti'].xcom_push(key='digests', value=digests.digests)
     context['ti'].xcom_push(key='emails', value=emails_a_enviar)
-    return emails_a_enviar
+    return len(emails_a_enviar)
 
+def _actualizar_registro(context, emails_enviados):
+    """Anota los envíos en el registro y descarta incidentes ya no notificables"""
+    incidentes_activos = context['ti'].xcom_pull(key='incidentes_para_notificar') or []
+
+    registro = cargar_registro()
+    ahora = ahora_utc()
+    for email_data in emails_enviados:
+        marcar_enviados(registro, email_data['userId'], email_data['versiones'], ahora)
+    podar(registro, [inc['incidenteId'] for inc in incidentes_activos])
+    guardar_registro(registro)
+
+@instrumentar
 def enviar_emails_via_smtp(**context):
-    """Envía los emails usando Gmail SMTP"""
+    """Envía los emails por SMTP con un pool de conexiones y límite de tasa"""
     emails = context['ti'].xcom_pull(key='emails')
 
     if not emails:
         print("ℹ️ No hay emails para enviar")
+        _actualizar_registro(context, [])
         return 0
 
     if not SMTP_EMAIL or not SMTP_PASSWORD:
@@ -249,93 +243,98 @@ def enviar_emails_via_smtp(**context):
         for email_data in emails:
             print(f"📧 [SIMULADO] Email a: {email_data['destinatario']}")
             print(f"   Asunto: {email_data['asunto']}")
+        # Nada se envió: ni el registro ni el historial lo anotan, así el
+        # envío real (con SMTP configurado) no los omite como ya notificados
         return len(emails)
 
-    enviados = 0
-
-    try:
-        # Conectar al servidor SMTP de Gmail
-        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
-        server.starttls()  # Habilitar encriptación TLS
-        server.login(SMTP_EMAIL, SMTP_PASSWORD)
-        
-        print(f"✅ Conectado a Gmail SMTP como {SMTP_EMAIL}")
-
-        for email_data in emails:
-            try:
-                # Crear mensaje
-                mensaje = MIMEMultipart('alternative')
-                mensaje['Subject'] = email_data['asunto']
-                mensaje['From'] = f"Alertas UTEC <{SMTP_EMAIL}>"
-                mensaje['To'] = email_data['destinatario']
-
-                # Agregar contenido HTML
-                parte_html = MIMEText(email_data['contenido'], 'html', 'utf-8')
-                mensaje.attach(parte_html)
-
-                # Enviar email
-                server.send_message(mensaje)
-                
-                print(f"✅ Email enviado a {email_data['nombre']} ({email_data['destinatario']})")
-                enviados += 1
-
-            except Exception as e:
-                print(f"❌ Error enviando email a {email_data['destinatario']}: {str(e)}")
-
-        # Cerrar conexión
-        server.quit()
-        print(f"📊 Total enviados: {enviados}/{len(emails)}")
-
-    except Exception as e:
-        print(f"❌ Error conectando a Gmail SMTP: {str(e)}")
+    digests = context['ti'].xcom_pull(key='digests') or {}
+    remitente = f"Alertas UTEC <{SMTP_EMAIL}>"
+
+    # Pool de conexiones autenticadas con límite de tasa y reintento por mensaje;
+    # el MIME de cada email se arma recién al enviarlo
+    enviador = EnviadorSMTP(SMTP_HOST, SMTP_PORT, SMTP_EMAIL, SMTP_PASSWORD)
+    resumen = enviador.enviar(emails, lambda email_data: construir_mensaje(email_data, digests, remitente))
+
+    emails_enviados = resumen.pop('enviados')
+    for fallido in resumen['fallidos']:
+        print(f"❌ Error enviando email a {fallido['item']['destinatario']}: {fallido['error']}")
+    resumen['fallidos'] = [
+        {'destinatario': f['item']['destinatario'], 'error': f['error']} for f in resumen['fallidos']
+    ]
+    enviados = len(emails_enviados)
+
+    latencia = resumen['latencia_ms']
+    print(f"📊 Total enviados: {enviados}/{len(emails)} en {resumen['duracion_s']}s "
+          f"({resumen['por_segundo']}/s, {resumen['conexiones']} conexiones, "
+          f"p50 {latencia['p50']}ms, p95 {latencia['p95']}ms, p99 {latencia['p99']}ms, "
+          f"{resumen['reintentos']} reintentos)")
+    if resumen['fallidos'] and not enviados:
         print("💡 Verifica que SMTP_EMAIL y SMTP_PASSWORD estén correctos")
-        print("💡 Asegúrate de usar una 'Contraseña de aplicación' en lugar de tu contraseña normal")
 
+    context['ti'].xcom_push(key='resumen_envio', value=resumen)
+    _actualizar_registro(context, emails_enviados)
+    context['ti'].xcom_push(key='incidentes_notificados', value=_incidentes_cubiertos(emails_enviados))
     return enviados
 
+def _incidentes_cubiertos(emails):
+    """IDs de incidentes incluidos en al menos un email enviado"""
+    return sorted({iid for email_data in emails for iid in email_data.get('incidenteIds', [])})
+
+@instrumentar
 def registrar_notificaciones(**context):
-    """Registra las notificaciones enviadas en el historial de incidentes"""
-    incidentes_para_notificar = context['ti'].xcom_pull(key='incidentes_para_notificar')
-    emails_enviados = context['ti'].xcom_pull(key='emails')
+    """Registra en el historial las notificaciones de los incidentes realmente enviados"""
+    incidentes_notificados = context['ti'].xcom_pull(key='incidentes_notificados')
 
-    if not emails_enviados:
+    if not incidentes_notificados:
         print("ℹ️ No hay notificaciones para registrar")
         return 0
 
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    table = dynamodb.Table(DYNAMODB_TABLE)
-
-    registrados = 0
+    table = get_dynamodb_table(DYNAMODB_TABLE, AWS_REGION)
+    table_historial = get_dynamodb_table(DYNAMODB_TABLE_HISTORIAL, AWS_REGION)
 
-    for inc in incidentes_para_notificar:
-        try:
-            # Obtener historial actual
-            response = table.get_item(Key={'incidenteId': inc['incidenteId']})
-            incidente_actual = response.get('Item', {})
-            historial = incidente_actual.get('historial', [])
-
-            # Agregar evento de notificación
-            historial.append({
-                'accion': 'notificacion_email_enviada',
-                'fecha': datetime.now().isoformat(),
-                'tipo': 'automatica',
-                'canal': 'email',
-                'destinatarios': 'usuarios_offline_area'
-            })
+    evento = {
+        'accion': 'notificacion_email_enviada',
+        'fecha': fecha_iso(ahora_utc()),
+        'tipo': 'automatica',
+        'canal': 'email',
+        'destinatarios': 'usuarios_offline_area'
+    }
 
-            # Actualizar en DynamoDB
-            table.update_item(
-                Key={'incidenteId': inc['incidenteId']},
-                UpdateExpression='SET historial = :h',
-                ExpressionAttributeValues={':h': historial}
-            )
+    def registrar(incidente_id):
+        # Resumen atómico sin lectura previa (la condición evita crear items
+        # borrados) y el evento completo en la tabla de historial
+        table.update_item(
+            Key={'incidenteId': incidente_id},
+            UpdateExpression='SET ultimoEvento = :ultimo ADD totalEventos :uno',
+            ConditionExpression='attribute_exists(incidenteId)',
+            ExpressionAttributeValues={':ultimo': resumen_evento(evento), ':uno': 1}
+        )
+        registrar_evento(table_historial, incidente_id, evento)
+
+    inicio = time.perf_counter()
+    resultados = ejecutar_en_paralelo(registrar, incidentes_notificados)
+    duracion = time.perf_counter() - inicio
 
+    registrados = 0
+    fallidos = []
+    for incidente_id, resultado, detalle in resultados:
+        if resultado == RESULTADO_OK:
             registrados += 1
+        else:
+            fallidos.append({'incidenteId': incidente_id, 'resultado': resultado, 'detalle': detalle})
+            print(f"❌ Error registrando notificación para {incidente_id}: {detalle or resultado}")
+
+    resumen = {
+        'registrados': registrados,
+        'fallidos': len(fallidos),
+        'duracion_s': round(duracion, 3),
+        'por_segundo': round(registrados / duracion, 1) if duracion > 0 else registrados,
+        'errores': fallidos
+    }
 
-        except Exception as e:
-            print(f"❌ Error registrando notificación para {inc.get('incidenteId', 'UNKNOWN')}: {str(e)}")
-
-    print(f"✅ Registradas {registrados} notificaciones")
+    print(f"✅ Registradas {registrados}/{len(incidentes_notificados)} notificaciones "
+          f"en {resumen['duracion_s']}s ({resumen['por_segundo']}/s)")
+    context['ti'].xcom_push(key='resumen_registro', value=resumen)
     return registrados
 
 # Definir tareas
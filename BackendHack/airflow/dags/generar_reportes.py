@@ -7,15 +7,27 @@ from datetime import datetime, timedelta
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 import json
-import boto3
-from collections import Counter
 import os
+from utils.analisis import analizar, analizar_ventana
+from utils.aws import get_dynamodb_table, get_s3_client
+from utils.dynamo import scan_paginado
+from utils.fechas import ahora_utc, parse_duracion
+from utils.incremental import actualizar_incremental
+from utils.metricas import fase, guardar_resumen_corrida, instrumentar
+from utils.paralelo import REPORTES_SHARDS, orden_recientes, procesar, recolectar_particionado
+from utils.rollup import cargar_rollup, consultar_ventanas, guardar_rollup, total_incidentes
+from utils.snapshots import guardar_snapshot
 
 # Configuración desde variables de entorno
 API_BASE_URL = os.getenv('API_BASE_URL', 'https://if1stu7r2g.execute-api.us-east-1.amazonaws.com/dev')
 DYNAMODB_TABLE = os.getenv('DYNAMODB_TABLE_INCIDENTES', 'Incidentes')
 AWS_REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
 S3_BUCKET_REPORTES = os.getenv('S3_BUCKET_REPORTES', 'alerta-utec-reportes')
+# Modo incremental: solo lee incidentes creados/actualizados desde la ejecución anterior
+# (eventos de INCIDENTES_CAMBIOS_FUENTE si está configurada; si no, marca de agua y scan filtrado)
+REPORTES_INCREMENTAL = os.getenv('REPORTES_INCREMENTAL', 'false').lower() == 'true'
+# Ventanas extra del reporte (hasta ahora, alineadas a la hora), calculadas sobre el rollup en una pasada
+REPORTES_VENTANAS = [v.strip() for v in os.getenv('REPORTES_VENTANAS', '1h,24h,7d,30d').split(',') if v.strip()]
 
 default_args = {
     'owner': 'alerta-utec',
@@ -32,211 +44,133 @@ dag = DAG(
     description='Generación de reportes estadísticos periódicos',
     schedule_interval=timedelta(hours=int(os.getenv('DAG_REPORTES_INTERVAL_HOURS', '6'))),
     catchup=False,
+    on_success_callback=guardar_resumen_corrida,
+    on_failure_callback=guardar_resumen_corrida,
     tags=['reportes', 'analytics', 'estadisticas']
 )
 
+@instrumentar
 def recolectar_datos_incidentes(**context):
-    """Recolecta todos los incidentes del período"""
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    table = dynamodb.Table(DYNAMODB_TABLE)
-
-    # Obtener todos los incidentes
-    response = table.scan()
-    incidentes = response.get('Items', [])
-
-    # Periodo de análisis (últimas 24 horas)
-    hace_24h = datetime.now() - timedelta(hours=24)
-
-    incidentes_recientes = []
-    for inc in incidentes:
-        fecha_creacion = datetime.fromisoformat(inc['fechaCreacion'].replace('Z', '+00:00'))
-        if fecha_creacion >= hace_24h:
-            incidentes_recientes.append(inc)
+    """Recolecta los incidentes del período y mantiene el rollup horario"""
+    table = get_dynamodb_table(DYNAMODB_TABLE, AWS_REGION)
+
+    if REPORTES_INCREMENTAL:
+        # Las contribuciones de los meses que cambiaron las carga actualizar_incremental
+        rollup = cargar_rollup(con_contribuciones=False)
+        incidentes_recientes, leidos = actualizar_incremental(table, rollup, horas_ventana=24)
+        incidentes_recientes = orden_recientes(incidentes_recientes)
+        total_historico = total_incidentes(rollup)
+        print(f"📊 Modo incremental: {leidos} incidentes nuevos/actualizados desde la última ejecución")
+    else:
+        # Periodo de análisis (últimas 24 horas, en UTC como fechaCreacion y el modo incremental)
+        hace_24h = ahora_utc() - timedelta(hours=24)
+
+        # Scan completo (paginado y paralelo, procesado en streaming) y rollup desde cero,
+        # en este proceso o repartido por segmentos entre REPORTES_SHARDS procesos
+        with fase('scan_y_rollup'):
+            if REPORTES_SHARDS > 1:
+                print(f"⚙️ Scan y rollup en {REPORTES_SHARDS} procesos")
+                rollup, incidentes_recientes, leidos = recolectar_particionado(DYNAMODB_TABLE, AWS_REGION, hace_24h)
+            else:
+                rollup, incidentes_recientes, leidos = procesar(scan_paginado(table), hace_24h)
+                incidentes_recientes = orden_recientes(incidentes_recientes)
+
+        with fase('guardar_rollup'):
+            guardar_rollup(rollup)
+        total_historico = leidos
 
     print(f"📊 Recolectados {len(incidentes_recientes)} incidentes de las últimas 24h")
-    print(f"📊 Total histórico: {len(incidentes)} incidentes")
+    print(f"📊 Total histórico: {total_historico} incidentes")
 
     context['ti'].xcom_push(key='incidentes_recientes', value=incidentes_recientes)
-    context['ti'].xcom_push(key='incidentes_historico', value=incidentes)
 
     return {
         'recientes': len(incidentes_recientes),
-        'historico': len(incidentes)
+        'historico': total_historico,
+        'leidos': leidos
     }
 
-def analizar_por_tipo(**context):
-    """Analiza distribución de incidentes por tipo"""
+def _cota(zona):
+    """Cota de sobreconteo de una zona si su conteo viene de un TopK desbordado"""
+    return f" (sobreconteo ≤ {zona['error']})" if zona.get('error') else ''
+
+@instrumentar
+def analizar_incidentes(**context):
+    """Calcula todas las métricas del reporte en una sola pasada vectorizada"""
     incidentes = context['ti'].xcom_pull(key='incidentes_recientes')
+    with fase('cargar_rollup'):
+        rollup = cargar_rollup(con_contribuciones=False)
 
-    tipos = [inc.get('tipo', 'Sin clasificar') for inc in incidentes]
-    contador_tipos = Counter(tipos)
+    with fase('analisis'):
+        # Histórico completo y todas las ventanas en una sola pasada por el rollup
+        ahora = ahora_utc()
+        rangos = {'historico': (None, None)}
+        rangos.update({ventana: (ahora - parse_duracion(ventana), None) for ventana in REPORTES_VENTANAS})
+        datos = consultar_ventanas(rollup, rangos)
 
-    analisis = {
-        'total': len(incidentes),
-        'por_tipo': dict(contador_tipos),
-        'tipo_mas_comun': contador_tipos.most_common(1)[0] if contador_tipos else ('N/A', 0)
-    }
+        resultados = analizar(incidentes, rollup=rollup, datos_rollup=datos['historico'])
+        ventanas = {ventana: analizar_ventana(datos[ventana]) for ventana in REPORTES_VENTANAS}
 
+    analisis_tipo = resultados['analisis_tipo']
     print("📊 ANÁLISIS POR TIPO:")
-    for tipo, cantidad in contador_tipos.most_common():
-        porcentaje = (cantidad / len(incidentes)) * 100 if incidentes else 0
+    for tipo, cantidad in sorted(analisis_tipo['por_tipo'].items(), key=lambda par: -par[1]):
+        porcentaje = (cantidad / analisis_tipo['total']) * 100 if analisis_tipo['total'] else 0
         print(f"  {tipo}: {cantidad} ({porcentaje:.1f}%)")
 
-    context['ti'].xcom_push(key='analisis_tipo', value=analisis)
-    return analisis
-
-def analizar_por_ubicacion(**context):
-    """Analiza incidentes por ubicación (zonas críticas)"""
-    incidentes = context['ti'].xcom_pull(key='incidentes_recientes')
-
-    ubicaciones = [inc.get('ubicacion', 'Sin ubicación') for inc in incidentes]
-    contador_ubicaciones = Counter(ubicaciones)
-
-    # Top 5 zonas con más incidentes
-    zonas_criticas = contador_ubicaciones.most_common(5)
-
-    analisis = {
-        'total_ubicaciones': len(set(ubicaciones)),
-        'zonas_criticas': [
-            {'ubicacion': ub, 'incidentes': cant}
-            for ub, cant in zonas_criticas
-        ]
-    }
-
     print("📍 ZONAS CRÍTICAS (Top 5):")
-    for ubicacion, cantidad in zonas_criticas:
-        print(f"  {ubicacion}: {cantidad} incidentes")
-
-    context['ti'].xcom_push(key='analisis_ubicacion', value=analisis)
-    return analisis
-
-def analizar_tiempos_resolucion(**context):
-    """Analiza tiempos promedio de resolución"""
-    incidentes = context['ti'].xcom_pull(key='incidentes_historico')
-
-    tiempos_resolucion = []
-
-    for inc in incidentes:
-        if inc.get('estado') == 'resuelto':
-            fecha_creacion = datetime.fromisoformat(inc['fechaCreacion'].replace('Z', '+00:00'))
-
-            # Buscar en historial la fecha de resolución
-            historial = inc.get('historial', [])
-            for evento in historial:
-                if 'resuelto' in evento.get('accion', '').lower():
-                    fecha_resolucion = datetime.fromisoformat(evento['fecha'].replace('Z', '+00:00'))
-                    tiempo_resolucion = (fecha_resolucion - fecha_creacion).total_seconds() / 60  # minutos
-                    tiempos_resolucion.append({
-                        'incidenteId': inc['incidenteId'],
-                        'tipo': inc.get('tipo', 'N/A'),
-                        'urgencia': inc.get('urgencia', 'N/A'),
-                        'tiempo_minutos': tiempo_resolucion
-                    })
-                    break
-
-    if tiempos_resolucion:
-        tiempo_promedio = sum(t['tiempo_minutos'] for t in tiempos_resolucion) / len(tiempos_resolucion)
-        tiempo_min = min(t['tiempo_minutos'] for t in tiempos_resolucion)
-        tiempo_max = max(t['tiempo_minutos'] for t in tiempos_resolucion)
-    else:
-        tiempo_promedio = tiempo_min = tiempo_max = 0
-
-    analisis = {
-        'total_resueltos': len(tiempos_resolucion),
-        'tiempo_promedio_min': round(tiempo_promedio, 2),
-        'tiempo_minimo_min': round(tiempo_min, 2),
-        'tiempo_maximo_min': round(tiempo_max, 2),
-        'detalles': tiempos_resolucion[:10]  # Top 10
-    }
+    for zona in resultados['analisis_ubicacion']['zonas_criticas']:
+        print(f"  {zona['ubicacion']}: {zona['incidentes']} incidentes{_cota(zona)}")
 
+    analisis_tiempos = resultados['analisis_tiempos']
     print(f"⏱️ TIEMPOS DE RESOLUCIÓN:")
-    print(f"  Promedio: {tiempo_promedio:.1f} minutos")
-    print(f"  Más rápido: {tiempo_min:.1f} minutos")
-    print(f"  Más lento: {tiempo_max:.1f} minutos")
-
-    context['ti'].xcom_push(key='analisis_tiempos', value=analisis)
-    return analisis
-
-def analizar_estados(**context):
-    """Analiza distribución de estados actuales"""
-    incidentes = context['ti'].xcom_pull(key='incidentes_recientes')
-
-    estados = [inc.get('estado', 'sin_estado') for inc in incidentes]
-    contador_estados = Counter(estados)
-
-    analisis = {
-        'por_estado': dict(contador_estados),
-        'pendientes': contador_estados.get('pendiente', 0),
-        'en_atencion': contador_estados.get('en_atencion', 0),
-        'resueltos': contador_estados.get('resuelto', 0),
-        'cancelados': contador_estados.get('cancelado', 0)
-    }
-
+    print(f"  Promedio: {analisis_tiempos['tiempo_promedio_min']:.1f} minutos")
+    print(f"  Más rápido: {analisis_tiempos['tiempo_minimo_min']:.1f} minutos")
+    print(f"  Más lento: {analisis_tiempos['tiempo_maximo_min']:.1f} minutos")
+    percentiles = analisis_tiempos.get('percentiles_min')
+    if percentiles:
+        print(f"  p50 / p90 / p99: {percentiles['p50']:.1f} / {percentiles['p90']:.1f} / {percentiles['p99']:.1f} minutos")
+        for urgencia, resumen in analisis_tiempos['por_urgencia'].items():
+            print(f"    {urgencia}: p50 {resumen['p50']:.1f}, p90 {resumen['p90']:.1f}, p99 {resumen['p99']:.1f} ({resumen['n']})")
+
+    analisis_estados = resultados['analisis_estados']
     print("📈 DISTRIBUCIÓN DE ESTADOS:")
-    for estado, cantidad in contador_estados.items():
-        porcentaje = (cantidad / len(incidentes)) * 100 if incidentes else 0
+    for estado, cantidad in analisis_estados['por_estado'].items():
+        porcentaje = (cantidad / analisis_tipo['total']) * 100 if analisis_tipo['total'] else 0
         print(f"  {estado}: {cantidad} ({porcentaje:.1f}%)")
+    print(f"✅ Tasa de resolución: {analisis_estados['tasa_resolucion']:.1f}%")
 
-    # Calcular tasa de resolución
-    total = len(incidentes)
-    resueltos = analisis['resueltos']
-    tasa_resolucion = (resueltos / total * 100) if total > 0 else 0
-    analisis['tasa_resolucion'] = round(tasa_resolucion, 2)
-
-    print(f"✅ Tasa de resolución: {tasa_resolucion:.1f}%")
-
-    context['ti'].xcom_push(key='analisis_estados', value=analisis)
-    return analisis
-
-def detectar_tendencias(**context):
-    """Detecta patrones y tendencias"""
-    incidentes_historico = context['ti'].xcom_pull(key='incidentes_historico')
-
-    # Agrupar por día de la semana y hora
-    por_dia_semana = Counter()
-    por_hora = Counter()
-
-    for inc in incidentes_historico:
-        fecha = datetime.fromisoformat(inc['fechaCreacion'].replace('Z', '+00:00'))
-        dia_semana = fecha.strftime('%A')
-        hora = fecha.hour
-
-        por_dia_semana[dia_semana] += 1
-        por_hora[hora] += 1
-
-    dia_mas_incidentes = por_dia_semana.most_common(1)[0] if por_dia_semana else ('N/A', 0)
-    hora_pico = por_hora.most_common(1)[0] if por_hora else (0, 0)
-
-    tendencias = {
-        'dia_mas_incidentes': {'dia': dia_mas_incidentes[0], 'cantidad': dia_mas_incidentes[1]},
-        'hora_pico': {'hora': hora_pico[0], 'cantidad': hora_pico[1]},
-        'distribucion_hora': dict(por_hora.most_common(5))
-    }
-
+    tendencias = resultados['tendencias']
     print(f"📊 TENDENCIAS:")
-    print(f"  Día con más incidentes: {dia_mas_incidentes[0]} ({dia_mas_incidentes[1]})")
-    print(f"  Hora pico: {hora_pico[0]}:00 ({hora_pico[1]} incidentes)")
-
-    context['ti'].xcom_push(key='tendencias', value=tendencias)
-    return tendencias
-
-def generar_reporte_completo(**context):
-    """Genera reporte completo consolidado"""
-    # Recolectar todos los análisis
-    analisis_tipo = context['ti'].xcom_pull(key='analisis_tipo')
-    analisis_ubicacion = context['ti'].xcom_pull(key='analisis_ubicacion')
-    analisis_tiempos = context['ti'].xcom_pull(key='analisis_tiempos')
-    analisis_estados = context['ti'].xcom_pull(key='analisis_estados')
-    tendencias = context['ti'].xcom_pull(key='tendencias')
-
-    reporte = {
+    print(f"  Día con más incidentes: {tendencias['dia_mas_incidentes']['dia']} ({tendencias['dia_mas_incidentes']['cantidad']})")
+    print(f"  Hora pico: {tendencias['hora_pico']['hora']}:00 ({tendencias['hora_pico']['cantidad']} incidentes)")
+
+    print("🪟 VENTANAS:")
+    for ventana, analisis_ventana in ventanas.items():
+        tiempos = analisis_ventana['analisis_tiempos']
+        p90 = (tiempos.get('percentiles_min') or {}).get('p90', 0)
+        zonas = analisis_ventana['analisis_ubicacion']['zonas_criticas']
+        zona = f"{zonas[0]['ubicacion']} ({zonas[0]['incidentes']}){_cota(zonas[0])}" if zonas else 'N/A'
+        print(f"  {ventana}: {analisis_ventana['analisis_tipo']['total']} incidentes, "
+              f"{analisis_ventana['analisis_estados']['tasa_resolucion']:.1f}% resueltos, p90 {p90:.1f} min, zona top {zona}")
+
+    # Mismas claves XCom que usaban las tareas de análisis separadas
+    for clave, valor in resultados.items():
+        context['ti'].xcom_push(key=clave, value=valor)
+    context['ti'].xcom_push(key='analisis_ventanas', value=ventanas)
+
+    return resultados
+
+def armar_reporte(periodo, analisis_tipo, analisis_ubicacion, analisis_tiempos, analisis_estados, tendencias):
+    """Reporte con resumen ejecutivo y análisis detallado (mismo esquema para cada ventana)"""
+    return {
         'fecha_generacion': datetime.now().isoformat(),
-        'periodo': 'últimas 24 horas',
+        'periodo': periodo,
         'resumen_ejecutivo': {
             'total_incidentes': analisis_tipo['total'],
             'tipo_mas_comun': analisis_tipo['tipo_mas_comun'][0],
             'zona_mas_critica': analisis_ubicacion['zonas_criticas'][0] if analisis_ubicacion['zonas_criticas'] else 'N/A',
             'tiempo_resolucion_promedio': analisis_tiempos['tiempo_promedio_min'],
+            'tiempo_resolucion_percentiles': analisis_tiempos.get('percentiles_min'),
             'tasa_resolucion': analisis_estados['tasa_resolucion']
         },
         'analisis_detallado': {
@@ -248,6 +182,32 @@ def generar_reporte_completo(**context):
         }
     }
 
+@instrumentar
+def generar_reporte_completo(**context):
+    """Genera reporte completo consolidado"""
+    # Recolectar todos los análisis
+    analisis_tipo = context['ti'].xcom_pull(key='analisis_tipo')
+    analisis_ubicacion = context['ti'].xcom_pull(key='analisis_ubicacion')
+    analisis_tiempos = context['ti'].xcom_pull(key='analisis_tiempos')
+    analisis_estados = context['ti'].xcom_pull(key='analisis_estados')
+    tendencias = context['ti'].xcom_pull(key='tendencias')
+
+    reporte = armar_reporte('últimas 24 horas', analisis_tipo, analisis_ubicacion, analisis_tiempos, analisis_estados, tendencias)
+
+    # Mismo esquema por ventana (sin I/O extra: salen del rollup ya cargado)
+    ventanas = context['ti'].xcom_pull(key='analisis_ventanas') or {}
+    reporte['ventanas'] = {
+        ventana: armar_reporte(
+            f"ventana de {ventana}",
+            analisis['analisis_tipo'],
+            analisis['analisis_ubicacion'],
+            analisis['analisis_tiempos'],
+            analisis['analisis_estados'],
+            analisis['tendencias']
+        )
+        for ventana, analisis in ventanas.items()
+    }
+
     print("\n" + "="*60)
     print("📊 REPORTE ESTADÍSTICO - ALERTA UTEC")
     print("="*60)
@@ -259,12 +219,13 @@ def generar_reporte_completo(**context):
 
     return reporte
 
+@instrumentar
 def guardar_reporte_s3(**context):
     """Guarda el reporte en S3 para histórico"""
     reporte = context['ti'].xcom_pull(key='reporte_final')
 
     try:
-        s3 = boto3.client('s3', region_name=AWS_REGION)
+        s3 = get_s3_client(AWS_REGION)
         key = f"reportes/{datetime.now().strftime('%Y-%m-%d-%H%M')}.json"
 
         s3.put_object(
@@ -280,6 +241,22 @@ def guardar_reporte_s3(**context):
         print(f"📁 Reporte guardado solo en logs")
         return False
 
+@instrumentar
+def guardar_snapshot_reporte(**context):
+    """Guarda los incidentes analizados y las métricas como snapshot columnar particionado por día"""
+    reporte = context['ti'].xcom_pull(key='reporte_final')
+    incidentes = context['ti'].xcom_pull(key='incidentes_recientes')
+
+    # Como guardar_s3: el snapshot es un derivado, su fallo no tumba la corrida
+    try:
+        uris = guardar_snapshot(reporte, incidentes)
+    except Exception as e:
+        print(f"⚠️ Error guardando el snapshot: {str(e)}")
+        return None
+    for tabla, uri in uris.items():
+        print(f"📦 Snapshot {tabla}: {uri}")
+    return uris
+
 # Definir tareas
 task_recolectar = PythonOperator(
     task_id='recolectar_datos',
@@ -287,33 +264,9 @@ task_recolectar = PythonOperator(
     dag=dag
 )
 
-task_analizar_tipo = PythonOperator(
-    task_id='analizar_tipo',
-    python_callable=analizar_por_tipo,
-    dag=dag
-)
-
-task_analizar_ubicacion = PythonOperator(
-    task_id='analizar_ubicacion',
-    python_callable=analizar_por_ubicacion,
-    dag=dag
-)
-
-task_analizar_tiempos = PythonOperator(
-    task_id='analizar_tiempos',
-    python_callable=analizar_tiempos_resolucion,
-    dag=dag
-)
-
-task_analizar_estados = PythonOperator(
-    task_id='analizar_estados',
-    python_callable=analizar_estados,
-    dag=dag
-)
-
-task_tendencias = PythonOperator(
-    task_id='detectar_tendencias',
-    python_callable=detectar_tendencias,
+task_analizar = PythonOperator(
+    task_id='analizar_incidentes',
+    python_callable=analizar_incidentes,
     dag=dag
 )
 
@@ -329,5 +282,11 @@ task_guardar = PythonOperator(
     dag=dag
 )
 
+task_snapshot = PythonOperator(
+    task_id='guardar_snapshot',
+    python_callable=guardar_snapshot_reporte,
+    dag=dag
+)
+
 # Definir flujo
-task_recolectar >> [task_analizar_tipo, task_analizar_ubicacion, task_analizar_tiempos, task_analizar_estados, task_tendencias] >> task_generar >> task_guardar
+task_recolectar >> task_analizar >> task_generar >> [task_guardar, task_snapshot]
@@ -1,15 +1,25 @@
 """
 DAG de Monitoreo de SLA
-Detecta incidentes antiguos sin atender y escala su urgencia automáticamente
+Detecta incidentes antiguos sin atender y escala su urgencia automáticamente.
+Corre de forma continua: calcula el próximo cruce de umbral (utils.sla),
+espera con un sensor diferible hasta ese instante y solo entonces lee los
+incidentes vencidos. Si hay fuente de cambios (utils.cambios), los abiertos
+salen del snapshot del stream y el DAG despierta cada CAMBIOS_INTERVALO_SECONDS
+para tomar en segundos los cambios de urgencia hechos a mano.
 """
 
 from datetime import datetime, timedelta
 from airflow import DAG
 from airflow.operators.python import PythonOperator
-import json
-import boto3
-import requests
+from airflow.sensors.date_time import DateTimeSensorAsync
 import os
+from utils.aws import get_dynamodb_resource, get_dynamodb_table
+from utils.cambios import CAMBIOS_INTERVALO, actualizar_snapshot, cambios_activos, leer_abiertos
+from utils.dynamo import RESULTADO_CONDICION, RESULTADO_ERROR, RESULTADO_OK, batch_get, ejecutar_en_paralelo
+from utils.fechas import ahora_utc, fecha_iso, parse_fecha
+from utils.historial import DYNAMODB_TABLE_HISTORIAL, put_evento, resumen_evento
+from utils.metricas import guardar_resumen_corrida, instrumentar
+from utils.sla import cargar_agenda, evaluar_escalacion, guardar_agenda
 
 # Configuración desde variables de entorno
 API_BASE_URL = os.getenv('API_BASE_URL', 'https://zictdclmxa.execute-api.us-east-1.amazonaws.com/dev')
@@ -17,10 +27,7 @@ DYNAMODB_TABLE = os.getenv('DYNAMODB_TABLE_INCIDENTES', 'Incidentes')
 AWS_REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
 THRESHOLD_TIEMPO_CRITICO = int(os.getenv('THRESHOLD_TIEMPO_CRITICO_MINUTES', '30'))
 
-# Thresholds de escalación (en minutos)
-THRESHOLD_BAJA_A_MEDIA = 240      # 4 horas
-THRESHOLD_MEDIA_A_ALTA = 120      # 2 horas
-THRESHOLD_ALTA_A_CRITICA = 60     # 1 hora
+# Thresholds de escalación: ver utils.sla
 THRESHOLD_RECORDATORIO = 30       # 30 minutos
 
 default_args = {
@@ -36,42 +43,80 @@ dag = DAG(
     'monitorear_incidentes_antiguos',
     default_args=default_args,
     description='Monitoreo de SLA y escalación automática de incidentes antiguos',
-    schedule_interval=timedelta(minutes=30),  # Cada 30 minutos
+    schedule='@continuous',  # Cada ejecución duerme hasta el próximo vencimiento
+    max_active_runs=1,
     catchup=False,
+    on_success_callback=guardar_resumen_corrida,
+    on_failure_callback=guardar_resumen_corrida,
     tags=['monitoreo', 'sla', 'escalacion']
 )
 
+def _leer_incidentes_abiertos():
+    """Incidentes NO resueltos (snapshot de cambios, AbiertosIndex o scan)"""
+    return leer_abiertos(get_dynamodb_table(DYNAMODB_TABLE, AWS_REGION))
+
+@instrumentar
+def planificar_escalaciones(**context):
+    """Sincroniza la agenda SLA si toca y calcula cuándo despertar"""
+    agenda = cargar_agenda()
+    ahora = ahora_utc()
+    # Con snapshot de cambios sincronizar es barato: se hace en cada despertar
+    intervalo = CAMBIOS_INTERVALO if cambios_activos() else None
+
+    if agenda.requiere_sincronizacion(ahora, intervalo):
+        agenda.sincronizar(_leer_incidentes_abiertos(), ahora)
+        guardar_agenda(agenda)
+        print(f"🔄 Agenda SLA sincronizada: {len(agenda)} incidentes abiertos con vencimiento")
+
+    despertar = fecha_iso(agenda.proximo_despertar(ahora, intervalo))
+    print(f"⏰ Próximo despertar: {despertar} (vencimiento más próximo: {agenda.proximo() or 'ninguno'})")
+
+    context['ti'].xcom_push(key='proximo_despertar', value=despertar)
+    return despertar
+
+@instrumentar
 def obtener_incidentes_sin_resolver(**context):
-    """Obtiene incidentes que no han sido resueltos"""
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    table = dynamodb.Table(DYNAMODB_TABLE)
-
-    # Buscar incidentes NO resueltos
-    response = table.scan(
-        FilterExpression='estado <> :resuelto AND estado <> :cancelado',
-        ExpressionAttributeValues={
-            ':resuelto': 'resuelto',
-            ':cancelado': 'cancelado'
-        }
-    )
+    """Obtiene de DynamoDB solo los incidentes cuyo vencimiento SLA ya pasó"""
+    agenda = cargar_agenda()
+    ahora = ahora_utc()
+    vencidos = agenda.extraer_vencidos(ahora)
+
+    if not vencidos:
+        # Despertar de sincronización: sin trabajo en DynamoDB
+        print("💤 Ningún incidente vencido")
+        context['ti'].xcom_push(key='incidentes_sin_resolver', value=[])
+        return 0
 
-    incidentes = response.get('Items', [])
-    print(f"📋 Encontrados {len(incidentes)} incidentes sin resolver")
+    if cambios_activos():
+        snapshot = actualizar_snapshot(get_dynamodb_table(DYNAMODB_TABLE, AWS_REGION))
+        items = [snapshot.incidentes[iid] for iid in vencidos if iid in snapshot.incidentes]
+    else:
+        items = batch_get(get_dynamodb_resource(AWS_REGION), DYNAMODB_TABLE, [{'incidenteId': iid} for iid in vencidos])
+    incidentes = [inc for inc in items if inc.get('estado') not in ('resuelto', 'cancelado')]
+
+    # Se mantiene el vencimiento de la urgencia actual: si la escalación
+    # falla, el próximo despertar lo vuelve a intentar. escalar_urgencia
+    # reprograma con la nueva urgencia solo los que logra escalar
+    for inc in incidentes:
+        agenda.programar(inc['incidenteId'], inc['fechaCreacion'], inc.get('urgencia', 'baja'))
+    guardar_agenda(agenda)
+
+    print(f"📋 {len(vencidos)} vencimientos, {len(incidentes)} incidentes sin resolver")
 
     context['ti'].xcom_push(key='incidentes_sin_resolver', value=incidentes)
     return len(incidentes)
 
+@instrumentar
 def calcular_tiempo_transcurrido(**context):
     """Calcula el tiempo transcurrido desde la creación de cada incidente"""
     incidentes = context['ti'].xcom_pull(key='incidentes_sin_resolver')
-    ahora = datetime.now()
+    ahora = ahora_utc()
 
     incidentes_con_tiempo = []
 
     for inc in incidentes:
         try:
-            fecha_creacion = datetime.fromisoformat(inc['fechaCreacion'].replace('Z', '+00:00'))
-            tiempo_transcurrido_min = (ahora - fecha_creacion.replace(tzinfo=None)).total_seconds() / 60
+            tiempo_transcurrido_min = (ahora - parse_fecha(inc['fechaCreacion'])).total_seconds() / 60
 
             inc['tiempo_transcurrido_minutos'] = round(tiempo_transcurrido_min, 2)
             incidentes_con_tiempo.append(inc)
@@ -89,6 +134,7 @@ def calcular_tiempo_transcurrido(**context):
     context['ti'].xcom_push(key='incidentes_con_tiempo', value=incidentes_con_tiempo)
     return incidentes_con_tiempo
 
+@instrumentar
 def identificar_incidentes_para_escalar(**context):
     """Identifica incidentes que deben escalarse según el tiempo transcurrido"""
     incidentes = context['ti'].xcom_pull(key='incidentes_con_tiempo')
@@ -98,26 +144,15 @@ def identificar_incidentes_para_escalar(**context):
     for inc in incidentes:
         tiempo = inc['tiempo_transcurrido_minutos']
         urgencia_actual = inc.get('urgencia', 'baja')
-        nueva_urgencia = None
-        razon = None
 
         # Lógica de escalación basada en tiempo y urgencia actual
-        if urgencia_actual == 'baja' and tiempo >= THRESHOLD_BAJA_A_MEDIA:
-            nueva_urgencia = 'media'
-            razon = f'Escalado: >4 horas sin resolver (tiempo: {tiempo:.0f} min)'
-        
-        elif urgencia_actual == 'media' and tiempo >= THRESHOLD_MEDIA_A_ALTA:
-            nueva_urgencia = 'alta'
-            razon = f'Escalado: >2 horas sin resolver (tiempo: {tiempo:.0f} min)'
-        
-        elif urgencia_actual == 'alta' and tiempo >= THRESHOLD_ALTA_A_CRITICA:
-            nueva_urgencia = 'critica'
-            razon = f'Escalado a CRÍTICO: >1 hora sin resolver (tiempo: {tiempo:.0f} min)'
+        nueva_urgencia, razon = evaluar_escalacion(urgencia_actual, tiempo)
 
         # Si debe escalarse, agregarlo a la lista
         if nueva_urgencia:
             incidentes_a_escalar.append({
                 'incidenteId': inc['incidenteId'],
+                'fechaCreacion': inc['fechaCreacion'],
                 'urgencia_actual': urgencia_actual,
                 'nueva_urgencia': nueva_urgencia,
                 'tiempo_transcurrido': tiempo,
@@ -134,6 +169,7 @@ def identificar_incidentes_para_escalar(**context):
     context['ti'].xcom_push(key='incidentes_a_escalar', value=incidentes_a_escalar)
     return incidentes_a_escalar
 
+@instrumentar
 def escalar_urgencia_en_dynamodb(**context):
     """Actualiza la urgencia de los incidentes en DynamoDB"""
     incidentes_a_escalar = context['ti'].xcom_pull(key='incidentes_a_escalar')
@@ -142,54 +178,88 @@ def escalar_urgencia_en_dynamodb(**context):
         print("✅ No hay incidentes para escalar")
         return 0
 
-    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-    table = dynamodb.Table(DYNAMODB_TABLE)
-
-    escalados = 0
+    table = get_dynamodb_table(DYNAMODB_TABLE, AWS_REGION)
+    fecha = fecha_iso(ahora_utc())
 
-    for inc in incidentes_a_escalar:
-        try:
-            # Obtener historial actual
-            response = table.get_item(Key={'incidenteId': inc['incidenteId']})
-            incidente_actual = response.get('Item', {})
-            historial = incidente_actual.get('historial', [])
-
-            # Agregar evento de escalación
-            historial.append({
-                'accion': 'escalacion_automatica',
-                'fecha': datetime.now().isoformat(),
-                'urgencia_anterior': inc['urgencia_actual'],
-                'urgencia_nueva': inc['nueva_urgencia'],
-                'razon': inc['razon'],
-                'automatico': True
-            })
+    def escalar(inc):
+        # Una sola transacción: el update del resumen, condicionado a la urgencia
+        # actual para no pisar cambios concurrentes, y el evento en la tabla de
+        # historial. Si la condición falla no queda ninguno de los dos escrito
+        condicion = 'urgencia = :urg_actual'
+        if inc['urgencia_actual'] == 'baja':
+            condicion = '(attribute_not_exists(urgencia) OR urgencia = :urg_actual)'
 
-            # Actualizar en DynamoDB
-            table.update_item(
-                Key={'incidenteId': inc['incidenteId']},
-                UpdateExpression='SET urgencia = :nueva_urg, historial = :hist',
-                ExpressionAttributeValues={
+        evento = {
+            'accion': 'escalacion_automatica',
+            'fecha': fecha,
+            'urgencia_anterior': inc['urgencia_actual'],
+            'urgencia_nueva': inc['nueva_urgencia'],
+            'razon': inc['razon'],
+            'automatico': True
+        }
+        table.meta.client.transact_write_items(TransactItems=[
+            {'Update': {
+                'TableName': DYNAMODB_TABLE,
+                'Key': {'incidenteId': inc['incidenteId']},
+                'UpdateExpression': (
+                    'SET urgencia = :nueva_urg, colaAbierta = :nueva_urg, fechaActualizacion = :fa, ultimoEvento = :ultimo '
+                    'ADD totalEventos :uno'
+                ),
+                'ConditionExpression': f"{condicion} AND estado <> :resuelto AND estado <> :cancelado",
+                'ExpressionAttributeValues': {
                     ':nueva_urg': inc['nueva_urgencia'],
-                    ':hist': historial
+                    ':urg_actual': inc['urgencia_actual'],
+                    ':resuelto': 'resuelto',
+                    ':cancelado': 'cancelado',
+                    ':fa': fecha,
+                    ':ultimo': resumen_evento(evento),
+                    ':uno': 1
                 }
-            )
+            }},
+            put_evento(DYNAMODB_TABLE_HISTORIAL, inc['incidenteId'], evento),
+        ])
 
-            print(f"✅ Escalado: {inc['incidenteId']} → {inc['nueva_urgencia']}")
-            escalados += 1
+    resultados = ejecutar_en_paralelo(escalar, incidentes_a_escalar)
 
-        except Exception as e:
-            print(f"❌ Error escalando {inc['incidenteId']}: {str(e)}")
+    incidentes_escalados = []
+    resultados_escalacion = []
+    for inc, resultado, detalle in resultados:
+        resultados_escalacion.append({
+            'incidenteId': inc['incidenteId'],
+            'resultado': resultado,
+            'detalle': detalle
+        })
 
+        if resultado == RESULTADO_OK:
+            print(f"✅ Escalado: {inc['incidenteId']} → {inc['nueva_urgencia']}")
+            incidentes_escalados.append(inc)
+        elif resultado == RESULTADO_CONDICION:
+            print(f"⏭️ Omitido {inc['incidenteId']}: cambió de urgencia o estado desde la lectura")
+        else:
+            print(f"❌ Error escalando {inc['incidenteId']}: {detalle}")
+
+    if incidentes_escalados:
+        # Reprogramar con la urgencia nueva: si el siguiente umbral ya pasó,
+        # la próxima ejecución continúa la escalación en segundos
+        agenda = cargar_agenda()
+        for inc in incidentes_escalados:
+            agenda.programar(inc['incidenteId'], inc['fechaCreacion'], inc['nueva_urgencia'])
+        guardar_agenda(agenda)
+
+    escalados = len(incidentes_escalados)
     print(f"📊 Total escalados: {escalados}/{len(incidentes_a_escalar)}")
+    context['ti'].xcom_push(key='incidentes_escalados', value=incidentes_escalados)
+    context['ti'].xcom_push(key='resultados_escalacion', value=resultados_escalacion)
     context['ti'].xcom_push(key='total_escalados', value=escalados)
     return escalados
 
+@instrumentar
 def notificar_escalaciones(**context):
     """Envía notificaciones sobre las escalaciones realizadas"""
-    incidentes_escalados = context['ti'].xcom_pull(key='incidentes_a_escalar')
+    incidentes_escalados = context['ti'].xcom_pull(key='incidentes_escalados') or []
     total_escalados = context['ti'].xcom_pull(key='total_escalados')
 
-    if total_escalados == 0:
+    if not total_escalados:
         print("ℹ️ No hay escalaciones para notificar")
         return 0
 
@@ -212,14 +282,18 @@ def notificar_escalaciones(**context):
 
     return len(por_area)
 
+@instrumentar
 def generar_reporte_escalaciones(**context):
     """Genera un reporte resumen de las escalaciones"""
-    incidentes_a_escalar = context['ti'].xcom_pull(key='incidentes_a_escalar')
+    incidentes_escalados = context['ti'].xcom_pull(key='incidentes_escalados') or []
+    resultados_escalacion = context['ti'].xcom_pull(key='resultados_escalacion') or []
     total_escalados = context['ti'].xcom_pull(key='total_escalados')
 
     reporte = {
         'fecha': datetime.now().isoformat(),
         'total_incidentes_escalados': total_escalados,
+        'total_omitidos_por_conflicto': sum(1 for r in resultados_escalacion if r['resultado'] == RESULTADO_CONDICION),
+        'total_errores': sum(1 for r in resultados_escalacion if r['resultado'] == RESULTADO_ERROR),
         'escalaciones': [],
         'por_urgencia': {
             'media': 0,
@@ -228,7 +302,7 @@ def generar_reporte_escalaciones(**context):
         }
     }
 
-    for inc in incidentes_a_escalar:
+    for inc in incidentes_escalados:
         reporte['escalaciones'].append({
             'incidenteId': inc['incidenteId'],
             'tipo': inc['tipo'],
@@ -249,12 +323,27 @@ def generar_reporte_escalaciones(**context):
     print(f"  → Media: {reporte['por_urgencia']['media']}")
     print(f"  → Alta: {reporte['por_urgencia']['alta']}")
     print(f"  → Crítica: {reporte['por_urgencia']['critica']}")
+    print(f"Omitidos por conflicto: {reporte['total_omitidos_por_conflicto']}")
+    print(f"Errores: {reporte['total_errores']}")
     print("="*60 + "\n")
 
     context['ti'].xcom_push(key='reporte_escalaciones', value=reporte)
     return reporte
 
 # Definir tareas
+task_planificar = PythonOperator(
+    task_id='planificar_escalaciones',
+    python_callable=planificar_escalaciones,
+    dag=dag
+)
+
+# Diferible: libera el worker y lo despierta el triggerer al vencer el plazo
+task_esperar = DateTimeSensorAsync(
+    task_id='esperar_vencimiento',
+    target_time="{{ ti.xcom_pull(task_ids='planificar_escalaciones', key='proximo_despertar') }}",
+    dag=dag
+)
+
 task_obtener = PythonOperator(
     task_id='obtener_incidentes_sin_resolver',
     python_callable=obtener_incidentes_sin_resolver,
@@ -292,4 +381,4 @@ task_reporte = PythonOperator(
 )
 
 # Definir flujo
-task_obtener >> task_calcular_tiempo >> task_identificar >> task_escalar >> task_notificar >> task_reporte
+task_planificar >> task_esperar >> task_obtener >> task_calcular_tiempo >> task_identificar >> task_escalar >> task_notificar >> task_reporte
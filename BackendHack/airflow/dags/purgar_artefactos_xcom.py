@@ -0,0 +1,41 @@
+"""
+DAG de mantenimiento de artefactos de XCom
+Borra los artefactos del backend de XCom (utils.xcom_backend) de más de
+XCOM_RETENCION_DIAS días, que de otro modo crecen sin límite en disco o S3
+"""
+
+from datetime import datetime, timedelta
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+import os
+from utils.xcom_backend import XCOM_RETENCION_DIAS, purgar_vencidos
+
+default_args = {
+    'owner': 'alerta-utec',
+    'depends_on_past': False,
+    'start_date': datetime(2025, 11, 15),
+    'email_on_failure': False,
+    'retries': 1,
+    'retry_delay': timedelta(minutes=10),
+}
+
+dag = DAG(
+    'purgar_artefactos_xcom',
+    default_args=default_args,
+    description='Borra los artefactos de XCom vencidos',
+    schedule_interval=os.getenv('DAG_PURGA_XCOM_SCHEDULE', '@daily'),
+    catchup=False,
+    tags=['mantenimiento', 'xcom']
+)
+
+def purgar_artefactos(**context):
+    """Borra los artefactos de XCom de más de XCOM_RETENCION_DIAS días"""
+    borrados = purgar_vencidos()
+    print(f"🧹 {borrados} artefactos de XCom de más de {XCOM_RETENCION_DIAS} días borrados")
+    return borrados
+
+task_purgar = PythonOperator(
+    task_id='purgar_artefactos',
+    python_callable=purgar_artefactos,
+    dag=dag
+)
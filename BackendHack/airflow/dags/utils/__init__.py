@@ -0,0 +1,3 @@
+"""
+Utilidades compartidas por los DAGs de Alerta UTEC
+"""
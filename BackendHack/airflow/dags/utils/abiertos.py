@@ -0,0 +1,115 @@
+"""
+Lectura de incidentes abiertos por el índice disperso AbiertosIndex
+Solo los incidentes abiertos tienen el atributo `colaAbierta` (= urgencia);
+las Lambdas lo quitan al resolver o cancelar. Consultar el índice cuesta en
+proporción a los abiertos, no al histórico. Si el índice no existe (o se
+está construyendo) se vuelve al scan con FilterExpression.
+
+Backfill de items anteriores al índice, desde airflow/dags:
+    python -m utils.abiertos --backfill
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.dynamo import codigo_error, query_paginado, scan_completo, scan_paginado
+
+ABIERTOS_INDEX = os.getenv('DYNAMODB_INDEX_ABIERTOS', 'AbiertosIndex')
+ATRIBUTO_ABIERTO = 'colaAbierta'
+
+URGENCIAS = ('baja', 'media', 'alta', 'critica')
+ESTADOS_CERRADOS = ('resuelto', 'cancelado')
+
+
+def _query_urgencia(table, urgencia):
+    return list(query_paginado(
+        table,
+        IndexName=ABIERTOS_INDEX,
+        KeyConditionExpression=f"{ATRIBUTO_ABIERTO} = :urgencia",
+        ExpressionAttributeValues={':urgencia': urgencia}
+    ))
+
+
+def _indice_no_disponible(error):
+    # Índice inexistente o en backfill: DynamoDB responde ValidationException
+    return codigo_error(error) == 'ValidationException' and 'index' in str(error).lower()
+
+
+def _scan_abiertos(table, urgencias):
+    filtro = 'estado <> :resuelto AND estado <> :cancelado'
+    valores = {':resuelto': 'resuelto', ':cancelado': 'cancelado'}
+    if tuple(urgencias) != URGENCIAS:
+        marcadores = [f":u{i}" for i in range(len(urgencias))]
+        filtro += f" AND urgencia IN ({', '.join(marcadores)})"
+        valores.update(zip(marcadores, urgencias))
+    return scan_completo(table, FilterExpression=filtro, ExpressionAttributeValues=valores)
+
+
+def incidentes_abiertos(table, urgencias=URGENCIAS):
+    """
+    Incidentes abiertos con alguna de las `urgencias`: un query por urgencia
+    (en paralelo) sobre AbiertosIndex, o scan filtrado si el índice no está.
+    """
+    urgencias = tuple(urgencias)
+    try:
+        with ThreadPoolExecutor(max_workers=len(urgencias)) as executor:
+            particiones = list(executor.map(lambda urgencia: _query_urgencia(table, urgencia), urgencias))
+    except Exception as e:
+        if not _indice_no_disponible(e):
+            raise
+        print(f"⚠️ {ABIERTOS_INDEX} no disponible ({e}); usando scan")
+        return _scan_abiertos(table, urgencias)
+
+    return [inc for particion in particiones for inc in particion]
+
+
+def backfill(table):
+    """
+    Agrega `colaAbierta` a los incidentes abiertos que no lo tienen y lo quita
+    de los cerrados. Devuelve (marcados, desmarcados).
+    """
+    marcados = desmarcados = 0
+    for inc in scan_paginado(table, ProjectionExpression='incidenteId, estado, urgencia, colaAbierta'):
+        cerrado = inc.get('estado') in ESTADOS_CERRADOS
+        clave = {'incidenteId': inc['incidenteId']}
+
+        try:
+            if cerrado and ATRIBUTO_ABIERTO in inc:
+                table.update_item(
+                    Key=clave,
+                    UpdateExpression=f"REMOVE {ATRIBUTO_ABIERTO}",
+                    ConditionExpression='estado IN (:resuelto, :cancelado)',
+                    ExpressionAttributeValues={':resuelto': 'resuelto', ':cancelado': 'cancelado'}
+                )
+                desmarcados += 1
+            elif not cerrado and inc.get(ATRIBUTO_ABIERTO) != inc.get('urgencia') and inc.get('urgencia'):
+                table.update_item(
+                    Key=clave,
+                    UpdateExpression=f"SET {ATRIBUTO_ABIERTO} = urgencia",
+                    ConditionExpression='estado <> :resuelto AND estado <> :cancelado',
+                    ExpressionAttributeValues={':resuelto': 'resuelto', ':cancelado': 'cancelado'}
+                )
+                marcados += 1
+        except Exception as e:
+            # Cambió de estado durante el backfill: ya lo dejó bien la Lambda
+            if codigo_error(e) != 'ConditionalCheckFailedException':
+                raise
+
+    return marcados, desmarcados
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from utils.aws import get_dynamodb_table
+
+    parser = argparse.ArgumentParser(description='Mantenimiento del índice disperso de incidentes abiertos')
+    parser.add_argument('--backfill', action='store_true', help='Marca/desmarca colaAbierta según el estado')
+    parser.add_argument('--tabla', default=os.getenv('DYNAMODB_TABLE_INCIDENTES', 'Incidentes'))
+    args = parser.parse_args()
+
+    if not args.backfill:
+        parser.error('Indica --backfill')
+
+    marcados, desmarcados = backfill(get_dynamodb_table(args.tabla))
+    print(f"✅ Backfill: {marcados} incidentes marcados como abiertos, {desmarcados} desmarcados")
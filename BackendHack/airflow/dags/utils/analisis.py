@@ -0,0 +1,325 @@
+"""
+Motor de análisis vectorizado para el DAG de reportes
+Carga los incidentes una sola vez en arrays columnares (NumPy, fechas como
+epoch int64) y calcula todas las métricas del reporte en una pasada,
+con el mismo esquema que las antiguas tareas analizar_* / detectar_tendencias.
+Los percentiles de resolución (p50/p90/p99, total y por tipo/urgencia)
+salen de DDSketches (utils.sketch), los mismos que persiste el rollup.
+"""
+
+import warnings
+from datetime import datetime
+
+from utils.fechas import parse_fecha
+from utils.perezoso import modulo
+from utils.sketch import DDSketch
+
+# NumPy se importa en la primera tarea que analiza, no al parsear el DAG
+np = modulo('numpy')
+
+DIAS_SEMANA = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+_EPOCH = '1970-01-01T00:00:00'
+
+
+def _epochs(fechas):
+    """Convierte fechas ISO-8601 UTC a segundos epoch (int64) de una sola vez"""
+    if not fechas:
+        return np.empty(0, dtype=np.int64)
+    try:
+        with warnings.catch_warnings():
+            # NumPy solo avisa (no falla) con offsets explícitos
+            warnings.simplefilter('error')
+            valores = np.array([f[:-1] if f.endswith('Z') else f for f in fechas], dtype='datetime64[us]')
+        return (valores.astype('datetime64[s]') - np.datetime64(_EPOCH, 's')).astype(np.int64)
+    except (ValueError, UserWarning):
+        # Fechas con offset explícito: se parsean una a una
+        return np.array(
+            [int((parse_fecha(f) - datetime(1970, 1, 1)).total_seconds()) for f in fechas],
+            dtype=np.int64
+        )
+
+
+CAMPOS_CATEGORICOS = {
+    'tipo': 'Sin clasificar',
+    'ubicacion': 'Sin ubicación',
+    'estado': 'sin_estado',
+}
+
+
+def _categorias(incidentes, campo, defecto):
+    """
+    Codifica una columna de strings como (etiquetas, códigos). Los códigos
+    se asignan por orden de primera aparición, igual que un Counter.
+    """
+    indice = {}
+    codigos = np.fromiter(
+        (indice.setdefault(inc.get(campo, defecto), len(indice)) for inc in incidentes),
+        dtype=np.int64,
+        count=len(incidentes)
+    )
+    return list(indice), codigos
+
+
+def cargar_columnas(incidentes, campos=CAMPOS_CATEGORICOS):
+    """Transforma la lista de items de DynamoDB en columnas NumPy"""
+    columnas = {'total': len(incidentes)}
+
+    for campo, defecto in campos.items():
+        columnas[campo] = _categorias(incidentes, campo, defecto)
+
+    columnas['creacion'] = _epochs([inc['fechaCreacion'] for inc in incidentes])
+
+    # Fecha de resolución (solo incidentes resueltos): `fechaResolucion` o,
+    # en items sin migrar, el primer evento 'resuelto' del historial embebido
+    fechas_resolucion = []
+    indices_resueltos = []
+    tipos_resueltos = []
+    urgencias_resueltos = []
+    detalles = []
+    for i, inc in enumerate(incidentes):
+        if inc.get('estado') != 'resuelto':
+            continue
+        fecha = inc.get('fechaResolucion') or next(
+            (evento['fecha'] for evento in inc.get('historial', [])
+             if 'resuelto' in evento.get('accion', '').lower()),
+            None
+        )
+        if fecha:
+            fechas_resolucion.append(fecha)
+            indices_resueltos.append(i)
+            tipos_resueltos.append(inc.get('tipo') or 'Sin clasificar')
+            urgencias_resueltos.append(inc.get('urgencia') or 'N/A')
+            if len(detalles) < 10:
+                detalles.append({
+                    'incidenteId': inc['incidenteId'],
+                    'tipo': inc.get('tipo', 'N/A'),
+                    'urgencia': inc.get('urgencia', 'N/A'),
+                })
+    columnas['resueltos_idx'] = np.array(indices_resueltos, dtype=np.int64)
+    columnas['resolucion'] = _epochs(fechas_resolucion)
+    columnas['tipo_resueltos'] = np.array(tipos_resueltos, dtype=object)
+    columnas['urgencia_resueltos'] = np.array(urgencias_resueltos, dtype=object)
+    columnas['detalles_resolucion'] = detalles
+
+    return columnas
+
+
+def _conteo_codigos(codigos, tamano):
+    """Conteo de códigos enteros en orden de primera aparición (como Counter)"""
+    if not len(codigos):
+        return []
+    cantidades = np.bincount(codigos, minlength=tamano)
+    presentes, primera = np.unique(codigos, return_index=True)
+    orden = presentes[np.argsort(primera, kind='stable')]
+    return [(int(i), int(cantidades[i])) for i in orden]
+
+
+def _conteos(columna):
+    """Conteo por categoría en orden de primera aparición"""
+    etiquetas, codigos = columna
+    cantidades = np.bincount(codigos, minlength=len(etiquetas))
+    return [(etiqueta, int(cantidad)) for etiqueta, cantidad in zip(etiquetas, cantidades)]
+
+
+def _mas_comunes(conteos, n=None):
+    """Equivalente a Counter.most_common (empates por primera aparición)"""
+    ordenados = sorted(conteos, key=lambda par: -par[1])
+    return ordenados if n is None else ordenados[:n]
+
+
+def _analisis_conteos(total, conteo_tipos, conteo_ubicaciones, por_estado, errores_ubicaciones=None,
+                      total_ubicaciones=None, ubicaciones_estimadas=False):
+    """
+    analisis_tipo, analisis_ubicacion y analisis_estados a partir de conteos.
+    `errores_ubicaciones` ({ubicacion: error}) es la cota de sobreconteo de
+    cada zona cuando vienen de un resumen TopK: el real está entre
+    incidentes - error e incidentes (sin él, los conteos son exactos).
+    Un TopK no tiene todas las ubicaciones: `total_ubicaciones` trae la
+    cantidad de distintas (estimada si `ubicaciones_estimadas`)
+    """
+    errores_ubicaciones = errores_ubicaciones or {}
+    mas_comun_tipo = _mas_comunes(conteo_tipos, 1)
+    analisis_tipo = {
+        'total': total,
+        'por_tipo': dict(conteo_tipos),
+        'tipo_mas_comun': mas_comun_tipo[0] if mas_comun_tipo else ('N/A', 0)
+    }
+
+    analisis_ubicacion = {
+        'total_ubicaciones': len(conteo_ubicaciones) if total_ubicaciones is None else total_ubicaciones,
+        'total_ubicaciones_estimado': ubicaciones_estimadas,
+        'zonas_criticas': [
+            {'ubicacion': ub, 'incidentes': cant, 'error': errores_ubicaciones.get(ub, 0)}
+            for ub, cant in _mas_comunes(conteo_ubicaciones, 5)
+        ],
+        'error_max_conteo': max(errores_ubicaciones.values(), default=0)
+    }
+
+    resueltos = por_estado.get('resuelto', 0)
+    analisis_estados = {
+        'por_estado': por_estado,
+        'pendientes': por_estado.get('pendiente', 0),
+        'en_atencion': por_estado.get('en_atencion', 0),
+        'resueltos': resueltos,
+        'cancelados': por_estado.get('cancelado', 0),
+        'tasa_resolucion': round((resueltos / total * 100) if total > 0 else 0, 2)
+    }
+
+    return analisis_tipo, analisis_ubicacion, analisis_estados
+
+
+def analizar_recientes(columnas):
+    """Métricas de la ventana reciente: tipo, ubicación y estados"""
+    return _analisis_conteos(
+        columnas['total'],
+        _conteos(columnas['tipo']),
+        _conteos(columnas['ubicacion']),
+        dict(_conteos(columnas['estado']))
+    )
+
+
+def _analisis_tiempos(total, suma, minimo, maximo, detalles, sketches=None):
+    promedio = suma / total if total else 0
+    analisis = {
+        'total_resueltos': total,
+        'tiempo_promedio_min': round(promedio, 2),
+        'tiempo_minimo_min': round(minimo or 0, 2),
+        'tiempo_maximo_min': round(maximo or 0, 2),
+        'detalles': detalles[:10]
+    }
+    if sketches is not None:
+        resumen = sketches['total'].resumen()
+        analisis['percentiles_min'] = {clave: resumen[clave] for clave in ('p50', 'p90', 'p99')}
+        analisis['por_tipo'] = {tipo: s.resumen() for tipo, s in sorted(sketches['por_tipo'].items())}
+        analisis['por_urgencia'] = {urg: s.resumen() for urg, s in sorted(sketches['por_urgencia'].items())}
+    return analisis
+
+
+def _sketches_por_grupo(minutos, grupos):
+    """Un DDSketch por valor de `grupos` (array alineado con `minutos`)"""
+    if not len(minutos):
+        return {}
+    etiquetas, inverso = np.unique(grupos, return_inverse=True)
+    return {
+        etiqueta: DDSketch.desde_valores(minutos[inverso == i])
+        for i, etiqueta in enumerate(etiquetas.tolist())
+    }
+
+
+def _tendencias(por_dia_semana, por_hora):
+    dia = _mas_comunes(por_dia_semana, 1)
+    hora = _mas_comunes(por_hora, 1)
+    dia_mas_incidentes = dia[0] if dia else ('N/A', 0)
+    hora_pico = hora[0] if hora else (0, 0)
+    return {
+        'dia_mas_incidentes': {'dia': dia_mas_incidentes[0], 'cantidad': dia_mas_incidentes[1]},
+        'hora_pico': {'hora': hora_pico[0], 'cantidad': hora_pico[1]},
+        'distribucion_hora': dict(_mas_comunes(por_hora, 5))
+    }
+
+
+def analizar_historico(columnas):
+    """Tiempos de resolución y tendencias calculados sobre columnas"""
+    idx = columnas['resueltos_idx']
+    minutos = (columnas['resolucion'] - columnas['creacion'][idx]) / 60.0
+
+    detalles = [
+        dict(detalle, tiempo_minutos=m)
+        for detalle, m in zip(columnas['detalles_resolucion'], minutos[:10].tolist())
+    ]
+
+    sketches = {
+        'total': DDSketch.desde_valores(minutos),
+        'por_tipo': _sketches_por_grupo(minutos, columnas['tipo_resueltos']),
+        'por_urgencia': _sketches_por_grupo(minutos, columnas['urgencia_resueltos']),
+    }
+    analisis_tiempos = _analisis_tiempos(
+        len(minutos),
+        float(minutos.sum()) if len(minutos) else 0,
+        float(minutos.min()) if len(minutos) else 0,
+        float(minutos.max()) if len(minutos) else 0,
+        detalles,
+        sketches
+    )
+
+    dias = columnas['creacion'] // 86400
+    dia_semana = (dias + 3) % 7  # 1970-01-01 fue jueves
+    horas = (columnas['creacion'] % 86400) // 3600
+
+    por_dia_semana = [(DIAS_SEMANA[d], c) for d, c in _conteo_codigos(dia_semana, 7)]
+    por_hora = _conteo_codigos(horas, 24)
+
+    return analisis_tiempos, _tendencias(por_dia_semana, por_hora)
+
+
+def analizar_historico_rollup(rollup, datos):
+    """Tiempos de resolución y tendencias a partir del rollup horario"""
+    resolucion = datos['resolucion']
+    analisis_tiempos = _analisis_tiempos(
+        resolucion['total'],
+        resolucion['suma_min'],
+        resolucion['min'],
+        resolucion['max'],
+        rollup['detalles_resolucion'],
+        resolucion.get('sketches')
+    )
+    return analisis_tiempos, _tendencias(
+        list(datos['por_dia_semana'].items()),
+        list(datos['por_hora'].items())
+    )
+
+
+def analizar_ventana(datos):
+    """
+    Todas las métricas del reporte para una ventana del rollup (resultado de
+    `consultar`/`consultar_ventanas`), con las mismas claves que `analizar`
+    """
+    analisis_tipo, analisis_ubicacion, analisis_estados = _analisis_conteos(
+        datos['total'],
+        list(datos['por_tipo'].items()),
+        list(datos['por_ubicacion'].items()),
+        dict(datos['por_estado']),
+        datos['top']['ubicacion'].errores() if 'top' in datos else None,
+        datos.get('ubicaciones_distintas'),
+        datos.get('ubicaciones_estimadas', False)
+    )
+    resolucion = datos['resolucion']
+    analisis_tiempos = _analisis_tiempos(
+        resolucion['total'],
+        resolucion['suma_min'],
+        resolucion['min'],
+        resolucion['max'],
+        [],
+        resolucion.get('sketches')
+    )
+    return {
+        'analisis_tipo': analisis_tipo,
+        'analisis_ubicacion': analisis_ubicacion,
+        'analisis_tiempos': analisis_tiempos,
+        'analisis_estados': analisis_estados,
+        'tendencias': _tendencias(list(datos['por_dia_semana'].items()), list(datos['por_hora'].items())),
+    }
+
+
+def analizar(recientes, historico=None, rollup=None, datos_rollup=None):
+    """
+    Calcula todas las métricas del reporte en una pasada.
+
+    Las métricas de la ventana salen de `recientes`; las históricas, de
+    `historico` (lista de incidentes) o, si se pasa, del rollup horario.
+    Devuelve un dict con las mismas claves XCom que usaban las tareas.
+    """
+    analisis_tipo, analisis_ubicacion, analisis_estados = analizar_recientes(cargar_columnas(recientes))
+
+    if rollup is not None:
+        analisis_tiempos, tendencias = analizar_historico_rollup(rollup, datos_rollup)
+    else:
+        analisis_tiempos, tendencias = analizar_historico(cargar_columnas(historico or [], campos={}))
+
+    return {
+        'analisis_tipo': analisis_tipo,
+        'analisis_ubicacion': analisis_ubicacion,
+        'analisis_tiempos': analisis_tiempos,
+        'analisis_estados': analisis_estados,
+        'tendencias': tendencias,
+    }
@@ -0,0 +1,175 @@
+"""
+Almacén de artefactos para los DAGs
+Serializa valores Python a msgpack comprimido (conservando Decimal y datetime)
+y los guarda en disco local o en S3, devolviendo solo una referencia
+"""
+
+import os
+import zlib
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import msgpack
+
+# Destino de los artefactos: ruta local o s3://bucket/prefijo
+ARTEFACTOS_URI = os.getenv('XCOM_ARTEFACTOS_URI', '/opt/airflow/xcom')
+
+# Tipos extendidos de msgpack
+_EXT_DECIMAL = 1
+_EXT_DATETIME = 2
+_EXT_DATE = 3
+_EXT_SET = 4
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(obj).encode('utf-8'))
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode('utf-8'))
+    if isinstance(obj, date):
+        return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode('utf-8'))
+    if isinstance(obj, (set, frozenset)):
+        return msgpack.ExtType(_EXT_SET, msgpack.packb(list(obj), default=_default, use_bin_type=True))
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def _ext_hook(codigo, data):
+    if codigo == _EXT_DECIMAL:
+        return Decimal(data.decode('utf-8'))
+    if codigo == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode('utf-8'))
+    if codigo == _EXT_DATE:
+        return date.fromisoformat(data.decode('utf-8'))
+    if codigo == _EXT_SET:
+        return set(msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False))
+    return msgpack.ExtType(codigo, data)
+
+
+def serializar(valor):
+    """Convierte un valor a bytes msgpack (sin comprimir)"""
+    return msgpack.packb(valor, default=_default, use_bin_type=True)
+
+
+def deserializar(data):
+    """Inverso de `serializar`"""
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+def _separar_s3(uri):
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def guardar_bytes(ruta_relativa, data, base_uri=None):
+    """Guarda bytes bajo `base_uri` y devuelve la URI completa"""
+    base = (base_uri or ARTEFACTOS_URI).rstrip('/')
+    uri = f"{base}/{ruta_relativa.lstrip('/')}"
+
+    if uri.startswith('s3://'):
+        from utils.aws import get_s3_client
+
+        bucket, key = _separar_s3(uri)
+        get_s3_client().put_object(Bucket=bucket, Key=key, Body=data)
+    else:
+        os.makedirs(os.path.dirname(uri), exist_ok=True)
+        temporal = f"{uri}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(data)
+        os.replace(temporal, uri)
+
+    return uri
+
+
+def leer_bytes(uri):
+    """Lee los bytes de un artefacto local o de S3"""
+    if uri.startswith('s3://'):
+        from utils.aws import get_s3_client
+
+        bucket, key = _separar_s3(uri)
+        return get_s3_client().get_object(Bucket=bucket, Key=key)['Body'].read()
+
+    with open(uri, 'rb') as f:
+        return f.read()
+
+
+def existe(uri):
+    """Indica si el artefacto existe"""
+    if uri.startswith('s3://'):
+        from utils.aws import get_s3_client
+
+        bucket, key = _separar_s3(uri)
+        try:
+            get_s3_client().head_object(Bucket=bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    return os.path.exists(uri)
+
+
+def listar(prefijo_uri):
+    """URIs de los artefactos bajo un prefijo (directorio local o s3://bucket/prefijo/)"""
+    if prefijo_uri.startswith('s3://'):
+        from utils.aws import get_s3_client
+
+        bucket, prefijo = _separar_s3(prefijo_uri)
+        paginas = get_s3_client().get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefijo)
+        return sorted(
+            f"s3://{bucket}/{objeto['Key']}"
+            for pagina in paginas
+            for objeto in pagina.get('Contents', [])
+        )
+
+    if not os.path.isdir(prefijo_uri):
+        return []
+    return sorted(
+        os.path.join(directorio, nombre)
+        for directorio, _, nombres in os.walk(prefijo_uri)
+        for nombre in nombres
+        if not nombre.endswith('.tmp')
+    )
+
+
+def borrar(uri):
+    """Borra un artefacto local o de S3 (no falla si ya no existe)"""
+    if uri.startswith('s3://'):
+        from utils.aws import get_s3_client
+
+        bucket, key = _separar_s3(uri)
+        get_s3_client().delete_object(Bucket=bucket, Key=key)
+        return
+
+    try:
+        os.remove(uri)
+    except FileNotFoundError:
+        pass
+
+
+def listar_vencidos(prefijo_uri, antes_de):
+    """URIs bajo un prefijo modificadas antes de `antes_de` (datetime UTC sin tzinfo)"""
+    if prefijo_uri.startswith('s3://'):
+        from utils.aws import get_s3_client
+
+        bucket, prefijo = _separar_s3(prefijo_uri)
+        paginas = get_s3_client().get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefijo)
+        return sorted(
+            f"s3://{bucket}/{objeto['Key']}"
+            for pagina in paginas
+            for objeto in pagina.get('Contents', [])
+            if objeto['LastModified'].astimezone(timezone.utc).replace(tzinfo=None) < antes_de
+        )
+
+    return [
+        uri for uri in listar(prefijo_uri)
+        if datetime.fromtimestamp(os.path.getmtime(uri), timezone.utc).replace(tzinfo=None) < antes_de
+    ]
+
+
+def guardar_artefacto(ruta_relativa, valor, base_uri=None):
+    """Serializa y comprime `valor`, lo guarda y devuelve su URI"""
+    return guardar_bytes(ruta_relativa, zlib.compress(serializar(valor), 6), base_uri)
+
+
+def leer_artefacto(uri):
+    """Lee y descomprime un artefacto guardado con `guardar_artefacto`"""
+    return deserializar(zlib.decompress(leer_bytes(uri)))
@@ -0,0 +1,92 @@
+"""
+Clientes AWS compartidos por los DAGs
+Una sesión boto3 por proceso y clientes cacheados con un pool de conexiones
+ajustado, para no pagar sesión, credenciales y handshakes TLS en cada tarea.
+Todos pasan por utils.metricas (latencia y capacidad consumida por tarea).
+"""
+
+import os
+import threading
+from functools import lru_cache
+
+from utils.metricas import instrumentar_cliente
+from utils.perezoso import modulo
+
+# boto3/botocore se importan recién al crear la sesión (no al parsear los DAGs)
+boto3 = modulo('boto3')
+
+AWS_REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+# Ajustes del pool de conexiones de botocore
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '32'))
+AWS_MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', '5'))
+
+
+@lru_cache(maxsize=None)
+def boto_config():
+    """Config de botocore compartida por todos los clientes"""
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        retries={'max_attempts': AWS_MAX_ATTEMPTS, 'mode': 'adaptive'},
+    )
+
+
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_session():
+    """Sesión boto3 única del proceso (resuelve credenciales una sola vez)"""
+    return boto3.session.Session()
+
+
+@lru_cache(maxsize=None)
+def _get_client(servicio, region):
+    with _lock:
+        return instrumentar_cliente(get_session().client(servicio, region_name=region, config=boto_config()))
+
+
+@lru_cache(maxsize=None)
+def _get_resource(servicio, region):
+    with _lock:
+        resource = get_session().resource(servicio, region_name=region, config=boto_config())
+        instrumentar_cliente(resource.meta.client)
+        return resource
+
+
+def get_dynamodb_resource(region=None):
+    """Resource de DynamoDB cacheado por proceso"""
+    return _get_resource('dynamodb', region or AWS_REGION)
+
+
+def get_dynamodb_table(nombre, region=None):
+    """Tabla de DynamoDB sobre el resource compartido"""
+    return get_dynamodb_resource(region).Table(nombre)
+
+
+def get_dynamodb_client(region=None):
+    """Cliente de bajo nivel de DynamoDB cacheado por proceso"""
+    return _get_client('dynamodb', region or AWS_REGION)
+
+
+def get_dynamodbstreams_client(region=None):
+    """Cliente de DynamoDB Streams cacheado por proceso"""
+    return _get_client('dynamodbstreams', region or AWS_REGION)
+
+
+def get_s3_client(region=None):
+    """Cliente de S3 cacheado por proceso"""
+    return _get_client('s3', region or AWS_REGION)
+
+
+def reset_clientes():
+    """
+    Descarta la sesión y los clientes cacheados (p. ej. tras rotar
+    credenciales, o en un proceso hijo tras fork)
+    """
+    _get_client.cache_clear()
+    _get_resource.cache_clear()
+    get_session.cache_clear()
@@ -0,0 +1,359 @@
+"""
+Consumidor de cambios de la tabla Incidentes
+Mantiene un snapshot compacto de los incidentes abiertos (urgencia, estado y
+los campos que usan los DAGs) aplicando los eventos de DynamoDB Streams, en
+lugar de releer la tabla en cada ejecución. Snapshot y posición del stream
+(checkpoint por shard) se persisten juntos en un único artefacto, así
+cualquier versión guardada es consistente; si dos procesos guardan a la vez
+gana el último y el otro vuelve a leer esos eventos (aplicarlos es idempotente).
+
+La primera vez (o si el checkpoint quedó fuera de la retención de 24 h) se
+parte de los abiertos de la tabla (utils.abiertos) y se relee el stream
+desde TRIM_HORIZON: el último evento de cada incidente deja su estado actual.
+
+Fuentes (INCIDENTES_CAMBIOS_FUENTE):
+    dynamodb         DynamoDB Streams (ARN de INCIDENTES_STREAM_ARN o LatestStreamArn)
+    /ruta/a.ndjson   archivo local de cambios, una línea JSON por evento (pruebas)
+    (vacío)          desactivado: los DAGs consultan AbiertosIndex
+
+Desde airflow/dags:
+    python -m utils.cambios --seguir       # consume cada CAMBIOS_INTERVALO_SECONDS
+    python -m utils.cambios --reconstruir  # descarta el snapshot y lo rehace
+"""
+
+import json
+import os
+import time
+from datetime import timedelta
+
+from utils.abiertos import ESTADOS_CERRADOS, URGENCIAS, incidentes_abiertos
+from utils.artefactos import ARTEFACTOS_URI, existe, guardar_artefacto, leer_artefacto
+from utils.dynamo import codigo_error
+from utils.fechas import ahora_utc, fecha_iso
+
+INCIDENTES_CAMBIOS_FUENTE = os.getenv('INCIDENTES_CAMBIOS_FUENTE', '')
+INCIDENTES_STREAM_ARN = os.getenv('INCIDENTES_STREAM_ARN', '')
+CAMBIOS_SNAPSHOT_URI = os.getenv(
+    'CAMBIOS_SNAPSHOT_URI',
+    f"{ARTEFACTOS_URI.rstrip('/')}/cambios/abiertos.msgpack.z"
+)
+CAMBIOS_INTERVALO = timedelta(seconds=int(os.getenv('CAMBIOS_INTERVALO_SECONDS', '60')))
+
+# Campos del incidente que se guardan en el snapshot (SLA + notificaciones)
+CAMPOS_SNAPSHOT = (
+    'incidenteId', 'urgencia', 'estado', 'fechaCreacion', 'fechaActualizacion',
+    'area', 'tipo', 'ubicacion', 'descripcion',
+)
+
+# Llamadas GetRecords máximas por shard en una lectura (1000 registros c/u)
+MAX_LLAMADAS_SHARD = 50
+# Páginas vacías seguidas tras las que un shard abierto se da por leído: un
+# shard puede devolver páginas vacías antes de registros posteriores, y uno
+# al día las devuelve siempre (DynamoDB Streams no informa MillisBehindLatest)
+MAX_PAGINAS_VACIAS = int(os.getenv('CAMBIOS_MAX_PAGINAS_VACIAS', '5'))
+
+VERSION_SNAPSHOT = 1
+
+# Errores de Streams que indican que el checkpoint ya no es utilizable
+_ERRORES_POSICION = ('TrimmedDataAccessException', 'ExpiredIteratorException')
+
+
+class PosicionPerdida(Exception):
+    """El checkpoint apunta a eventos que ya no están en la fuente"""
+
+
+def cambios_activos():
+    """Indica si hay una fuente de cambios configurada"""
+    return bool(INCIDENTES_CAMBIOS_FUENTE)
+
+
+class FuenteDynamoStreams:
+    """Eventos de DynamoDB Streams (StreamViewType NEW_IMAGE), shard por shard"""
+
+    def __init__(self, stream_arn=None, tabla=None):
+        self._stream_arn = stream_arn or INCIDENTES_STREAM_ARN
+        self.tabla = tabla or os.getenv('DYNAMODB_TABLE_INCIDENTES', 'Incidentes')
+
+    @property
+    def stream_arn(self):
+        if not self._stream_arn:
+            from utils.aws import get_dynamodb_client
+
+            tabla = get_dynamodb_client().describe_table(TableName=self.tabla)['Table']
+            if 'LatestStreamArn' not in tabla:
+                raise RuntimeError(f"La tabla {self.tabla} no tiene stream habilitado")
+            self._stream_arn = tabla['LatestStreamArn']
+        return self._stream_arn
+
+    @property
+    def identificador(self):
+        return f"dynamodb:{self.stream_arn}"
+
+    def _shards(self, cliente):
+        shards = []
+        kwargs = {'StreamArn': self.stream_arn}
+        while True:
+            descripcion = cliente.describe_stream(**kwargs)['StreamDescription']
+            shards.extend(descripcion.get('Shards', []))
+            ultimo = descripcion.get('LastEvaluatedShardId')
+            if not ultimo:
+                return shards
+            kwargs['ExclusiveStartShardId'] = ultimo
+
+    def _leer_shard(self, cliente, shard_id, entrada, deserializar):
+        kwargs = {'StreamArn': self.stream_arn, 'ShardId': shard_id}
+        if entrada.get('secuencia'):
+            kwargs.update(ShardIteratorType='AFTER_SEQUENCE_NUMBER', SequenceNumber=entrada['secuencia'])
+        else:
+            kwargs['ShardIteratorType'] = 'TRIM_HORIZON'
+
+        cambios = []
+        vacias = 0
+        iterador = cliente.get_shard_iterator(**kwargs)['ShardIterator']
+        for _ in range(MAX_LLAMADAS_SHARD):
+            response = cliente.get_records(ShardIterator=iterador, Limit=1000)
+            for registro in response.get('Records', []):
+                datos = registro['dynamodb']
+                imagen = datos.get('NewImage')
+                cambios.append({
+                    'evento': registro['eventName'],
+                    'incidenteId': deserializar(datos['Keys']['incidenteId']),
+                    'imagen': {k: deserializar(v) for k, v in imagen.items()} if imagen else None,
+                })
+                entrada['secuencia'] = datos['SequenceNumber']
+
+            iterador = response.get('NextShardIterator')
+            if iterador is None:
+                # Shard cerrado y leído completo: sus hijos ya se pueden leer
+                entrada['cerrado'] = True
+                break
+            if response.get('MillisBehindLatest') == 0:
+                break
+            vacias = 0 if response.get('Records') else vacias + 1
+            if vacias >= MAX_PAGINAS_VACIAS:
+                break
+        return cambios
+
+    def leer(self, posicion):
+        """
+        Lee los eventos posteriores a `posicion` ({shardId: {'secuencia',
+        'cerrado'}}). Los shards hijos se leen después de cerrar el padre
+        para respetar el orden por incidente. Devuelve (cambios, posicion).
+        """
+        from boto3.dynamodb.types import TypeDeserializer
+
+        from utils.aws import get_dynamodbstreams_client
+
+        cliente = get_dynamodbstreams_client()
+        deserializar = TypeDeserializer().deserialize
+
+        try:
+            shards = self._shards(cliente)
+            ids = {shard['ShardId'] for shard in shards}
+            # Los shards que salieron de la retención ya no hacen falta
+            posicion = {sid: dict(entrada) for sid, entrada in posicion.items() if sid in ids}
+
+            cambios = []
+            leidos = set()
+            avance = True
+            while avance:
+                avance = False
+                for shard in shards:
+                    sid, padre = shard['ShardId'], shard.get('ParentShardId')
+                    if sid in leidos or (padre in ids and not posicion.get(padre, {}).get('cerrado')):
+                        continue
+                    leidos.add(sid)
+                    avance = True
+                    entrada = posicion.setdefault(sid, {'secuencia': None, 'cerrado': False})
+                    if not entrada['cerrado']:
+                        cambios.extend(self._leer_shard(cliente, sid, entrada, deserializar))
+        except Exception as e:
+            if codigo_error(e) in _ERRORES_POSICION:
+                raise PosicionPerdida(str(e)) from e
+            raise
+
+        return cambios, posicion
+
+
+class FuenteArchivo:
+    """
+    Archivo NDJSON de cambios (sustituto local del stream para pruebas): cada
+    línea es {"evento": "INSERT|MODIFY|REMOVE", "incidenteId": ..., "imagen": {...}}.
+    La posición es el offset en bytes; una última línea incompleta se deja
+    para la próxima lectura.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    @property
+    def identificador(self):
+        return f"archivo:{os.path.abspath(self.ruta)}"
+
+    def leer(self, posicion):
+        offset = posicion.get('offset', 0)
+        if not os.path.exists(self.ruta):
+            return [], {'offset': 0}
+        if os.path.getsize(self.ruta) < offset:
+            raise PosicionPerdida(f"{self.ruta} es más corto que el checkpoint ({offset} bytes)")
+
+        cambios = []
+        with open(self.ruta, 'rb') as f:
+            f.seek(offset)
+            for linea in f:
+                if not linea.endswith(b'\n'):
+                    break
+                offset += len(linea)
+                if linea.strip():
+                    cambios.append(json.loads(linea))
+        return cambios, {'offset': offset}
+
+
+def registrar_cambio(ruta, evento, incidente):
+    """Agrega un evento al archivo de cambios local (ver FuenteArchivo)"""
+    linea = json.dumps({
+        'evento': evento,
+        'incidenteId': incidente['incidenteId'],
+        'imagen': None if evento == 'REMOVE' else incidente,
+    }, default=str, ensure_ascii=False)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.write(linea + '\n')
+
+
+def fuente_configurada():
+    """Fuente según INCIDENTES_CAMBIOS_FUENTE (None si está desactivada)"""
+    if not INCIDENTES_CAMBIOS_FUENTE:
+        return None
+    if INCIDENTES_CAMBIOS_FUENTE == 'dynamodb':
+        return FuenteDynamoStreams()
+    return FuenteArchivo(INCIDENTES_CAMBIOS_FUENTE)
+
+
+class SnapshotAbiertos:
+    """Incidentes abiertos por incidenteId (solo CAMPOS_SNAPSHOT) + checkpoint de la fuente"""
+
+    def __init__(self, fuente, incidentes=None, posicion=None, actualizado=None):
+        self.fuente = fuente
+        self.incidentes = incidentes or {}
+        self.posicion = posicion or {}
+        self.actualizado = actualizado
+
+    def __len__(self):
+        return len(self.incidentes)
+
+    def poner(self, incidente):
+        self.incidentes[incidente['incidenteId']] = {
+            campo: incidente[campo] for campo in CAMPOS_SNAPSHOT if campo in incidente
+        }
+
+    def aplicar(self, cambio):
+        """Aplica un evento: alta/actualización si sigue abierto, baja si no"""
+        imagen = cambio.get('imagen')
+        if cambio['evento'] == 'REMOVE' or not imagen or imagen.get('estado') in ESTADOS_CERRADOS:
+            self.incidentes.pop(cambio['incidenteId'], None)
+        else:
+            self.poner(imagen)
+
+    def abiertos(self, urgencias=URGENCIAS):
+        if tuple(urgencias) == URGENCIAS:
+            return list(self.incidentes.values())
+        return [inc for inc in self.incidentes.values() if inc.get('urgencia') in urgencias]
+
+
+def cargar_snapshot(uri=None):
+    """Lee el snapshot persistido (None si no existe o es de otra versión)"""
+    uri = uri or CAMBIOS_SNAPSHOT_URI
+    if not existe(uri):
+        return None
+
+    datos = leer_artefacto(uri)
+    if datos.get('version') != VERSION_SNAPSHOT:
+        print(f"⚠️ Snapshot de cambios con versión {datos.get('version')}, se reconstruye")
+        return None
+    return SnapshotAbiertos(datos['fuente'], datos['incidentes'], datos['posicion'], datos['actualizado'])
+
+
+def guardar_snapshot(snapshot, uri=None):
+    """Persiste snapshot y checkpoint en un solo artefacto"""
+    base, _, nombre = (uri or CAMBIOS_SNAPSHOT_URI).rpartition('/')
+    return guardar_artefacto(nombre, {
+        'version': VERSION_SNAPSHOT,
+        'fuente': snapshot.fuente,
+        'actualizado': snapshot.actualizado,
+        'posicion': snapshot.posicion,
+        'incidentes': snapshot.incidentes,
+    }, base_uri=base)
+
+
+def reconstruir(table, fuente):
+    """Snapshot inicial desde la tabla, con la fuente a releer desde el principio"""
+    snapshot = SnapshotAbiertos(fuente.identificador)
+    for inc in incidentes_abiertos(table):
+        snapshot.poner(inc)
+    print(f"🧱 Snapshot de abiertos reconstruido desde DynamoDB: {len(snapshot)} incidentes")
+    return snapshot
+
+
+def actualizar_snapshot(table, fuente=None, uri=None):
+    """
+    Aplica al snapshot los eventos nuevos de la fuente y lo persiste.
+    Devuelve el snapshot actualizado.
+    """
+    fuente = fuente or fuente_configurada()
+    if fuente is None:
+        raise RuntimeError('No hay fuente de cambios configurada (INCIDENTES_CAMBIOS_FUENTE)')
+
+    snapshot = cargar_snapshot(uri)
+    if snapshot is None or snapshot.fuente != fuente.identificador:
+        snapshot = reconstruir(table, fuente)
+
+    try:
+        cambios, posicion = fuente.leer(snapshot.posicion)
+    except PosicionPerdida as e:
+        print(f"⚠️ Checkpoint de cambios perdido ({e}); se reconstruye")
+        snapshot = reconstruir(table, fuente)
+        cambios, posicion = fuente.leer(snapshot.posicion)
+
+    for cambio in cambios:
+        snapshot.aplicar(cambio)
+    snapshot.posicion = posicion
+    snapshot.actualizado = fecha_iso(ahora_utc())
+    guardar_snapshot(snapshot, uri)
+
+    print(f"🔁 {len(cambios)} cambios aplicados; {len(snapshot)} incidentes abiertos en el snapshot")
+    return snapshot
+
+
+def leer_abiertos(table, urgencias=URGENCIAS):
+    """
+    Incidentes abiertos con alguna de las `urgencias`: del snapshot de
+    cambios si hay fuente configurada, si no de AbiertosIndex (o scan).
+    """
+    if cambios_activos():
+        return actualizar_snapshot(table).abiertos(urgencias)
+    return incidentes_abiertos(table, urgencias=urgencias)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from utils.aws import get_dynamodb_table
+
+    parser = argparse.ArgumentParser(description='Consumidor de cambios de la tabla Incidentes')
+    parser.add_argument('--seguir', action='store_true', help='Consume en bucle cada CAMBIOS_INTERVALO_SECONDS')
+    parser.add_argument('--reconstruir', action='store_true', help='Descarta el snapshot y lo rehace')
+    parser.add_argument('--tabla', default=os.getenv('DYNAMODB_TABLE_INCIDENTES', 'Incidentes'))
+    args = parser.parse_args()
+
+    fuente = fuente_configurada()
+    if fuente is None:
+        parser.error('Configura INCIDENTES_CAMBIOS_FUENTE (dynamodb o ruta a un archivo NDJSON)')
+    table = get_dynamodb_table(args.tabla)
+
+    if args.reconstruir:
+        guardar_snapshot(reconstruir(table, fuente))
+
+    actualizar_snapshot(table, fuente)
+    while args.seguir:
+        time.sleep(CAMBIOS_INTERVALO.total_seconds())
+        actualizar_snapshot(table, fuente)
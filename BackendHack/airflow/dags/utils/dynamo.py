@@ -0,0 +1,197 @@
+"""
+Helpers de lectura para DynamoDB
+Scan paginado y paralelo (Segment/TotalSegments) y query paginado
+compartidos por los DAGs
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Número de segmentos paralelos por defecto para los scans
+SCAN_SEGMENTOS = int(os.getenv('DYNAMODB_SCAN_SEGMENTS', '4'))
+
+_FIN_SEGMENTO = object()
+
+
+def _scan_segmento(table, segmento, total_segmentos, scan_kwargs, cola, cancelado):
+    """Recorre todas las páginas de un segmento y las deja en la cola"""
+    kwargs = dict(scan_kwargs)
+    if total_segmentos > 1:
+        kwargs['Segment'] = segmento
+        kwargs['TotalSegments'] = total_segmentos
+
+    try:
+        while not cancelado.is_set():
+            response = table.scan(**kwargs)
+            cola.put(response.get('Items', []))
+
+            ultima_clave = response.get('LastEvaluatedKey')
+            if not ultima_clave:
+                break
+            kwargs['ExclusiveStartKey'] = ultima_clave
+    except Exception as e:
+        cola.put(e)
+    finally:
+        cola.put(_FIN_SEGMENTO)
+
+
+def scan_paginado(table, segmentos=None, shard=None, **scan_kwargs):
+    """
+    Itera sobre todos los items de la tabla siguiendo LastEvaluatedKey.
+
+    Divide el scan en `segmentos` workers paralelos (Segment/TotalSegments)
+    y va entregando los items a medida que llegan las páginas, sin esperar
+    a que termine el scan completo. Acepta los mismos argumentos que
+    `table.scan()` (FilterExpression, ExpressionAttributeValues, ...).
+
+    Con `shard=(indice, shards)` recorre solo la parte `indice` de la tabla:
+    el scan se divide en `segmentos * shards` segmentos y este shard lee
+    los `segmentos` que le tocan (para repartir la tabla entre procesos).
+    """
+    por_shard = max(1, int(segmentos or SCAN_SEGMENTOS))
+    indice, shards = shard or (0, 1)
+    total_segmentos = por_shard * shards
+    cola = queue.Queue(maxsize=por_shard * 2)
+    cancelado = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=por_shard) as executor:
+        for segmento in range(indice * por_shard, (indice + 1) * por_shard):
+            executor.submit(_scan_segmento, table, segmento, total_segmentos, scan_kwargs, cola, cancelado)
+
+        pendientes = por_shard
+        error = None
+        try:
+            while pendientes:
+                pagina = cola.get()
+                if pagina is _FIN_SEGMENTO:
+                    pendientes -= 1
+                elif isinstance(pagina, Exception):
+                    error = error or pagina
+                    cancelado.set()
+                elif error is None:
+                    yield from pagina
+        finally:
+            # Si el consumidor se detiene antes, liberar a los workers bloqueados
+            cancelado.set()
+            while pendientes:
+                if cola.get() is _FIN_SEGMENTO:
+                    pendientes -= 1
+
+        if error is not None:
+            raise error
+
+
+def scan_completo(table, segmentos=None, **scan_kwargs):
+    """Devuelve en una lista todos los items del scan paginado"""
+    return list(scan_paginado(table, segmentos=segmentos, **scan_kwargs))
+
+
+def query_paginado(table, **query_kwargs):
+    """Itera sobre todos los items de un query siguiendo LastEvaluatedKey"""
+    kwargs = dict(query_kwargs)
+    while True:
+        response = table.query(**kwargs)
+        yield from response.get('Items', [])
+
+        ultima_clave = response.get('LastEvaluatedKey')
+        if not ultima_clave:
+            break
+        kwargs['ExclusiveStartKey'] = ultima_clave
+
+
+# Máximo de claves por llamada a BatchGetItem
+BATCH_GET_MAX = 100
+# Llamadas por lote antes de abandonar las UnprocessedKeys
+BATCH_GET_INTENTOS = int(os.getenv('DYNAMODB_BATCH_GET_MAX_ATTEMPTS', '8'))
+# Espera base y máxima (segundos) del backoff exponencial entre reintentos
+BATCH_GET_ESPERA_BASE = 0.05
+BATCH_GET_ESPERA_MAX = 5.0
+
+
+def _espera_backoff(intento):
+    """Backoff exponencial con jitter completo (intento 1 = primer reintento)"""
+    return random.uniform(0, min(BATCH_GET_ESPERA_MAX, BATCH_GET_ESPERA_BASE * 2 ** intento))
+
+
+def batch_get(resource, nombre_tabla, claves, intentos=None, **kwargs):
+    """
+    Lee los items de `claves` con BatchGetItem en lotes de 100, reintentando
+    las UnprocessedKeys con backoff exponencial y jitter. Acepta
+    ProjectionExpression, etc. Los items inexistentes simplemente no
+    aparecen en el resultado.
+
+    Si tras `intentos` llamadas (BATCH_GET_INTENTOS) un lote sigue con
+    claves sin procesar lanza RuntimeError, en vez de devolver un resultado
+    incompleto.
+    """
+    intentos = max(1, intentos or BATCH_GET_INTENTOS)
+    items = []
+    for inicio in range(0, len(claves), BATCH_GET_MAX):
+        pendientes = {nombre_tabla: {'Keys': claves[inicio:inicio + BATCH_GET_MAX], **kwargs}}
+        for intento in range(intentos):
+            if intento:
+                # La tabla está limitando: esperar antes de pedir el resto
+                time.sleep(_espera_backoff(intento))
+            response = resource.batch_get_item(RequestItems=pendientes)
+            items.extend(response.get('Responses', {}).get(nombre_tabla, []))
+            pendientes = response.get('UnprocessedKeys') or None
+            if not pendientes:
+                break
+        if pendientes:
+            sin_procesar = len(pendientes[nombre_tabla]['Keys'])
+            raise RuntimeError(
+                f"BatchGetItem en {nombre_tabla}: {sin_procesar} claves sin procesar tras {intentos} intentos"
+            )
+    return items
+
+
+# Workers concurrentes por defecto para escrituras
+WRITE_WORKERS = int(os.getenv('DYNAMODB_WRITE_WORKERS', '16'))
+
+RESULTADO_OK = 'ok'
+RESULTADO_CONDICION = 'condicion_fallida'
+RESULTADO_ERROR = 'error'
+
+
+def codigo_error(error):
+    """Código de error de AWS de una excepción de botocore (o None)"""
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+
+def condicion_fallida(error):
+    """True si la escritura (simple o TransactWriteItems) falló por su ConditionExpression"""
+    codigo = codigo_error(error)
+    if codigo == 'TransactionCanceledException':
+        razones = getattr(error, 'response', {}).get('CancellationReasons') or []
+        return any(razon.get('Code') == 'ConditionalCheckFailed' for razon in razones)
+    return codigo == 'ConditionalCheckFailedException'
+
+
+def _ejecutar(funcion, item):
+    try:
+        funcion(item)
+        return item, RESULTADO_OK, None
+    except Exception as e:
+        if condicion_fallida(e):
+            return item, RESULTADO_CONDICION, None
+        return item, RESULTADO_ERROR, str(e)
+
+
+def ejecutar_en_paralelo(funcion, items, workers=None):
+    """
+    Aplica `funcion` a cada item concurrentemente con un pool acotado.
+
+    Devuelve una lista de (item, resultado, detalle) en el mismo orden, con
+    resultado 'ok', 'condicion_fallida' (ConditionExpression no cumplida,
+    también dentro de una transacción) o 'error'.
+    """
+    if not items:
+        return []
+
+    workers = max(1, min(int(workers or WRITE_WORKERS), len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda item: _ejecutar(funcion, item), items))
@@ -0,0 +1,36 @@
+"""
+Helpers de fechas compartidos por los DAGs
+Las fechas de DynamoDB vienen en ISO-8601 UTC (toISOString de las Lambdas)
+"""
+
+from datetime import datetime, timedelta, timezone
+
+
+def parse_fecha(valor):
+    """Convierte un ISO-8601 (con 'Z' u offset) a datetime UTC sin tzinfo"""
+    fecha = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+def fecha_iso(fecha):
+    """Formatea un datetime UTC igual que toISOString() (comparable como string)"""
+    return fecha.strftime('%Y-%m-%dT%H:%M:%S.') + f"{fecha.microsecond // 1000:03d}Z"
+
+
+def ahora_utc():
+    """Fecha actual en UTC sin tzinfo"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+_UNIDADES_DURACION = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+def parse_duracion(valor):
+    """Convierte '90m', '24h', '7d' o '2w' a timedelta"""
+    valor = valor.strip().lower()
+    unidad = _UNIDADES_DURACION.get(valor[-1:])
+    if unidad is None or not valor[:-1].isdigit():
+        raise ValueError(f"Duración inválida: {valor!r} (usa m, h, d o w, p. ej. '24h')")
+    return timedelta(**{unidad: int(valor[:-1])})
@@ -0,0 +1,163 @@
+"""
+Historial de incidentes en tabla aparte (append-only)
+Cada evento es un item (incidenteId, eventoId) en la tabla de historial; el
+item del incidente solo guarda un resumen: ultimoEvento, totalEventos y
+fechaResolucion. Mismo formato que db/historial.js en las Lambdas.
+
+Migración de historiales embebidos, desde airflow/dags:
+    python -m utils.historial --migrar
+"""
+
+import os
+import uuid
+
+from utils.dynamo import codigo_error, scan_paginado
+
+DYNAMODB_TABLE_HISTORIAL = os.getenv('DYNAMODB_TABLE_HISTORIAL', 'IncidentesHistorial')
+
+
+def evento_id(evento, sufijo=None):
+    """Clave de orden del evento: fecha ISO + sufijo (orden cronológico)"""
+    return f"{evento['fecha']}#{sufijo or uuid.uuid4().hex[:8]}"
+
+
+def resumen_evento(evento):
+    """Resumen que se guarda en el item del incidente (ultimoEvento)"""
+    return {
+        'accion': evento.get('accion'),
+        'fecha': evento.get('fecha'),
+    }
+
+
+def item_evento(incidente_id, evento, sufijo=None):
+    """Item de la tabla de historial para un evento"""
+    return {
+        'incidenteId': incidente_id,
+        'eventoId': evento_id(evento, sufijo),
+        **evento,
+    }
+
+
+def registrar_evento(table_historial, incidente_id, evento):
+    """Agrega un evento al historial de un incidente"""
+    item = item_evento(incidente_id, evento)
+    table_historial.put_item(Item=item)
+    return item
+
+
+def put_evento(nombre_tabla_historial, incidente_id, evento):
+    """Operación Put de TransactWriteItems que agrega el evento al historial"""
+    return {'Put': {'TableName': nombre_tabla_historial, 'Item': item_evento(incidente_id, evento)}}
+
+
+def leer_pagina(table_historial, incidente_id, limite=50, cursor=None):
+    """
+    Lee una página del historial (más antiguo primero).
+    Devuelve (eventos, cursor_siguiente); el cursor es None en la última.
+    """
+    params = {
+        'KeyConditionExpression': 'incidenteId = :id',
+        'ExpressionAttributeValues': {':id': incidente_id},
+        'Limit': limite,
+    }
+    if cursor:
+        params['ExclusiveStartKey'] = cursor
+
+    response = table_historial.query(**params)
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+
+def iterar_historial(table_historial, incidente_id, tamano_pagina=100):
+    """Recorre el historial completo de un incidente paginando bajo demanda"""
+    cursor = None
+    while True:
+        eventos, cursor = leer_pagina(table_historial, incidente_id, tamano_pagina, cursor)
+        yield from eventos
+        if not cursor:
+            break
+
+
+def _fecha_resolucion(historial):
+    for evento in historial:
+        if 'resuelto' in evento.get('accion', '').lower():
+            return evento['fecha']
+    return None
+
+
+def migrar_historiales(table_incidentes, table_historial):
+    """
+    Mueve los historiales embebidos a la tabla de historial y deja en el
+    item solo el resumen. Es idempotente: los eventos migrados usan su
+    posición como sufijo, así una nueva pasada sobrescribe los mismos items.
+    La condición sobre el tamaño del historial evita borrar eventos
+    agregados durante la migración (ese incidente se reintenta luego).
+
+    Devuelve (migrados, eventos, omitidos).
+    """
+    migrados = eventos_copiados = omitidos = 0
+
+    for inc in scan_paginado(
+        table_incidentes,
+        FilterExpression='attribute_exists(historial)',
+        ProjectionExpression='incidenteId, historial, fechaResolucion'
+    ):
+        historial = inc.get('historial') or []
+
+        with table_historial.batch_writer() as batch:
+            for posicion, evento in enumerate(historial):
+                batch.put_item(Item=item_evento(inc['incidenteId'], evento, f"m{posicion:05d}"))
+
+        expresion = 'REMOVE historial'
+        valores = {':n': len(historial)}
+        if historial:
+            # Eventos posteriores al despliegue ya dejaron su resumen: no se pisa
+            expresion = (
+                'SET ultimoEvento = if_not_exists(ultimoEvento, :ultimo), '
+                'totalEventos = if_not_exists(totalEventos, :cero) + :n'
+            )
+            valores.update({':ultimo': resumen_evento(historial[-1]), ':cero': 0})
+            fecha_res = inc.get('fechaResolucion') or _fecha_resolucion(historial)
+            if fecha_res:
+                expresion += ', fechaResolucion = :fr'
+                valores[':fr'] = fecha_res
+            expresion += ' REMOVE historial'
+
+        try:
+            table_incidentes.update_item(
+                Key={'incidenteId': inc['incidenteId']},
+                UpdateExpression=expresion,
+                ConditionExpression='size(historial) = :n',
+                ExpressionAttributeValues=valores
+            )
+        except Exception as e:
+            if codigo_error(e) != 'ConditionalCheckFailedException':
+                raise
+            print(f"⏭️ {inc['incidenteId']}: historial modificado durante la migración, se reintentará")
+            omitidos += 1
+            continue
+
+        migrados += 1
+        eventos_copiados += len(historial)
+
+    return migrados, eventos_copiados, omitidos
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from utils.aws import get_dynamodb_table
+
+    parser = argparse.ArgumentParser(description='Mantenimiento del historial de incidentes')
+    parser.add_argument('--migrar', action='store_true', help='Mueve los historiales embebidos a la tabla de historial')
+    parser.add_argument('--tabla', default=os.getenv('DYNAMODB_TABLE_INCIDENTES', 'Incidentes'))
+    parser.add_argument('--tabla-historial', default=DYNAMODB_TABLE_HISTORIAL)
+    args = parser.parse_args()
+
+    if not args.migrar:
+        parser.error('Indica --migrar')
+
+    migrados, eventos, omitidos = migrar_historiales(
+        get_dynamodb_table(args.tabla),
+        get_dynamodb_table(args.tabla_historial)
+    )
+    print(f"✅ Migrados {migrados} incidentes ({eventos} eventos); omitidos {omitidos}")
@@ -0,0 +1,148 @@
+"""
+Recolección incremental para el DAG de reportes
+En cada ejecución solo se aplican al rollup horario (utils.rollup) los
+incidentes creados o modificados desde la anterior.
+
+Con fuente de cambios configurada (INCIDENTES_CAMBIOS_FUENTE, utils.cambios)
+se leen sus eventos desde un checkpoint propio: el costo es el de lo que
+cambió, no el del tamaño de la tabla. Es un segundo lector del mismo stream
+que el snapshot de abiertos, cada uno con su posición. Sin fuente se usa una
+marca de agua (high-water mark) con un scan filtrado, que igual recorre (y
+consume lectura de) toda la tabla aunque devuelva pocos items.
+
+Las contribuciones del rollup se cargan solo para los meses de creación de
+los incidentes leídos; la carga completa (primera vez o checkpoint perdido)
+las carga todas.
+"""
+
+import os
+from datetime import timedelta
+from itertools import chain
+
+from utils.artefactos import ARTEFACTOS_URI, existe, guardar_artefacto, leer_artefacto
+from utils.cambios import PosicionPerdida, fuente_configurada
+from utils.dynamo import scan_paginado
+from utils.fechas import ahora_utc, fecha_iso, parse_fecha
+from utils.rollup import aplicar_incidente, cargar_contribuciones, guardar_rollup, mes_incidente
+
+REPORTES_ESTADO_URI = os.getenv(
+    'REPORTES_ESTADO_URI',
+    f"{ARTEFACTOS_URI.rstrip('/')}/reportes/estado_incremental.msgpack.z"
+)
+
+# Margen para no perder escrituras concurrentes al cerrar la marca de agua
+MARGEN_MARCA_AGUA = timedelta(minutes=2)
+
+VERSION_ESTADO = 3
+
+
+def estado_vacio():
+    """Estado inicial (sin marca de agua: fuerza una carga completa)"""
+    return {
+        'version': VERSION_ESTADO,
+        'marca_agua': None,
+        # Identificador y checkpoint de la fuente de cambios (si hay)
+        'fuente': None,
+        'posicion': {},
+        'recientes': {},
+    }
+
+
+def cargar_estado(uri=None):
+    """Lee el estado persistido o devuelve uno vacío"""
+    uri = uri or REPORTES_ESTADO_URI
+    if not existe(uri):
+        return estado_vacio()
+
+    estado = leer_artefacto(uri)
+    if estado.get('version') != VERSION_ESTADO:
+        print(f"⚠️ Estado incremental con versión {estado.get('version')}, se reconstruye")
+        return estado_vacio()
+    return estado
+
+
+def guardar_estado(estado, uri=None):
+    """Persiste el estado incremental"""
+    base, _, nombre = (uri or REPORTES_ESTADO_URI).rpartition('/')
+    return guardar_artefacto(nombre, estado, base_uri=base)
+
+
+def _imagenes(cambios):
+    # Los incidentes no se borran: un REMOVE (sin imagen) no aporta al rollup
+    return [cambio['imagen'] for cambio in cambios if cambio.get('imagen')]
+
+
+def leer_cambios(table, estado, fuente=None):
+    """
+    (incidentes, posicion, completa): los incidentes creados o actualizados
+    desde la ejecución del `estado`, la nueva posición de la `fuente` y si
+    fue una carga completa (toda la tabla; sin estado previo, al cambiar de
+    fuente o si su checkpoint se perdió).
+    """
+    if fuente is not None:
+        if estado['marca_agua'] is not None and estado['fuente'] == fuente.identificador:
+            try:
+                cambios, posicion = fuente.leer(estado['posicion'])
+                return _imagenes(cambios), posicion, False
+            except PosicionPerdida as e:
+                print(f"⚠️ Checkpoint de cambios perdido ({e}); carga completa")
+        # La tabla y luego la fuente desde el principio: el último evento de
+        # cada incidente deja su estado actual (aplicarlo es idempotente)
+        cambios, posicion = fuente.leer({})
+        return chain(scan_paginado(table), _imagenes(cambios)), posicion, True
+
+    if estado['marca_agua'] is None:
+        return scan_paginado(table), {}, True
+
+    return scan_paginado(
+        table,
+        FilterExpression='fechaCreacion > :marca OR fechaActualizacion > :marca',
+        ExpressionAttributeValues={':marca': estado['marca_agua']}
+    ), {}, False
+
+
+def actualizar_incremental(table, rollup, horas_ventana=24, uri=None, fuente=None):
+    """
+    Aplica al rollup (cargado sin contribuciones basta) los cambios desde la
+    última ejecución y persiste rollup y estado. Si el rollup está vacío se
+    hace una carga completa. `fuente` es la de utils.cambios (por defecto la
+    configurada; sin ella, marca de agua).
+
+    Devuelve (incidentes_recientes, leidos), donde los recientes son los
+    incidentes de la ventana de `horas_ventana` horas.
+    """
+    fuente = fuente or fuente_configurada()
+    estado = cargar_estado(uri)
+    if not rollup['buckets']:
+        estado = estado_vacio()
+
+    ahora = ahora_utc()
+    limite_ventana = ahora - timedelta(hours=horas_ventana)
+
+    incidentes, posicion, completa = leer_cambios(table, estado, fuente)
+    if completa:
+        cargar_contribuciones(rollup)
+    else:
+        incidentes = list(incidentes)
+        cargar_contribuciones(rollup, {mes_incidente(inc) for inc in incidentes})
+
+    leidos = 0
+    for inc in incidentes:
+        leidos += 1
+        aplicar_incidente(rollup, inc)
+        if parse_fecha(inc['fechaCreacion']) >= limite_ventana:
+            estado['recientes'][inc['incidenteId']] = inc
+
+    estado['recientes'] = {
+        iid: inc for iid, inc in estado['recientes'].items()
+        if parse_fecha(inc['fechaCreacion']) >= limite_ventana
+    }
+    estado['marca_agua'] = fecha_iso(ahora - MARGEN_MARCA_AGUA)
+    estado['fuente'] = fuente.identificador if fuente is not None else None
+    estado['posicion'] = posicion
+
+    # Primero el rollup: si falla, la marca de agua no avanza
+    guardar_rollup(rollup)
+    guardar_estado(estado, uri)
+
+    return list(estado['recientes'].values()), leidos
@@ -0,0 +1,367 @@
+"""
+Instrumentación de las tareas de los DAGs
+Cada callable decorado con @instrumentar acumula, mientras corre:
+- tiempo total y por fase (`with fase('nombre'):`),
+- llamadas a AWS por operación con su latencia (eventos de botocore de los
+  clientes de utils.aws), capacidad consumida de DynamoDB
+  (ReturnConsumedCapacity=TOTAL, por tabla) y ScannedCount vs Count,
+- latencia de envíos SMTP y bytes movidos por XCom.
+
+Al terminar emite las métricas por airflow.stats.Stats (StatsD u
+OpenTelemetry según [metrics] de airflow.cfg), deja el resumen en el XCom
+`metricas` y lo guarda como JSON en
+METRICAS_URI/<dag_id>/<run_id>/<task_id>.json. Al terminar la corrida el
+callback `guardar_resumen_corrida` junta los de todas las tareas en
+<dag_id>/<run_id>/corrida.json.
+
+Desde airflow/dags:
+    python -m utils.metricas <dag_id> <run_id>
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from utils.artefactos import ARTEFACTOS_URI, guardar_bytes, leer_bytes
+
+METRICAS_ACTIVAS = os.getenv('METRICAS_ACTIVAS', 'true').lower() == 'true'
+METRICAS_URI = os.getenv('METRICAS_URI', f"{ARTEFACTOS_URI.rstrip('/')}/metricas")
+METRICAS_PREFIJO = 'alerta_utec'
+
+# Operaciones de DynamoDB que aceptan ReturnConsumedCapacity
+OPERACIONES_CAPACIDAD = {
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems',
+}
+OPERACIONES_LECTURA = {'GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems'}
+
+_CLAVE_INICIO = '_metricas_inicio'
+
+
+class Metricas:
+    """Acumulador de una tarea (compartido por sus hilos)"""
+
+    def __init__(self, dag_id, task_id, run_id):
+        self.dag_id = dag_id
+        self.task_id = task_id
+        self.run_id = run_id
+        self.inicio = time.perf_counter()
+        self.segundos = None
+        self.fases = {}
+        self.llamadas = {}
+        self.capacidad = {'lectura': 0.0, 'escritura': 0.0, 'por_tabla': {}}
+        self.items = {'escaneados': 0, 'devueltos': 0}
+        self.xcom_bytes = 0
+        self.lock = threading.Lock()
+
+    def sumar_fase(self, nombre, segundos):
+        with self.lock:
+            self.fases[nombre] = self.fases.get(nombre, 0.0) + segundos
+
+    def registrar_llamada(self, servicio, operacion, segundos):
+        with self.lock:
+            llamada = self.llamadas.setdefault(f"{servicio}.{operacion}", {'n': 0, 'ms_total': 0.0, 'ms_max': 0.0})
+            ms = segundos * 1000
+            llamada['n'] += 1
+            llamada['ms_total'] += ms
+            llamada['ms_max'] = max(llamada['ms_max'], ms)
+
+    def registrar_capacidad(self, operacion, consumida):
+        # TOTAL: un dict (o una lista en operaciones batch) con TableName y CapacityUnits
+        tipo = 'lectura' if operacion in OPERACIONES_LECTURA else 'escritura'
+        with self.lock:
+            for entrada in consumida if isinstance(consumida, list) else [consumida]:
+                unidades = float(entrada.get('CapacityUnits', 0))
+                self.capacidad[tipo] += unidades
+                tabla = entrada.get('TableName', '?')
+                self.capacidad['por_tabla'][tabla] = self.capacidad['por_tabla'].get(tabla, 0.0) + unidades
+
+    def registrar_items(self, escaneados, devueltos):
+        with self.lock:
+            self.items['escaneados'] += escaneados
+            self.items['devueltos'] += devueltos
+
+    def registrar_xcom(self, n_bytes):
+        with self.lock:
+            self.xcom_bytes += n_bytes
+
+    def parcial(self):
+        """Contadores que un proceso hijo devuelve para sumarlos en la tarea (ver `sumar_parcial`)"""
+        with self.lock:
+            return {
+                'llamadas': self.llamadas,
+                'capacidad': self.capacidad,
+                'items': self.items,
+            }
+
+    def sumar_parcial(self, parcial):
+        with self.lock:
+            for nombre, llamada in parcial['llamadas'].items():
+                destino = self.llamadas.setdefault(nombre, {'n': 0, 'ms_total': 0.0, 'ms_max': 0.0})
+                destino['n'] += llamada['n']
+                destino['ms_total'] += llamada['ms_total']
+                destino['ms_max'] = max(destino['ms_max'], llamada['ms_max'])
+            for tipo in ('lectura', 'escritura'):
+                self.capacidad[tipo] += parcial['capacidad'][tipo]
+            for tabla, unidades in parcial['capacidad']['por_tabla'].items():
+                self.capacidad['por_tabla'][tabla] = self.capacidad['por_tabla'].get(tabla, 0.0) + unidades
+            for clave, valor in parcial['items'].items():
+                self.items[clave] += valor
+
+    def resumen(self):
+        with self.lock:
+            escaneados = self.items['escaneados']
+            return {
+                'dag_id': self.dag_id,
+                'task_id': self.task_id,
+                'run_id': self.run_id,
+                'segundos': round(self.segundos if self.segundos is not None else time.perf_counter() - self.inicio, 4),
+                'fases': {nombre: round(s, 4) for nombre, s in self.fases.items()},
+                'llamadas': {
+                    nombre: {'n': ll['n'], 'ms_total': round(ll['ms_total'], 2), 'ms_max': round(ll['ms_max'], 2)}
+                    for nombre, ll in sorted(self.llamadas.items())
+                },
+                'dynamodb': {
+                    'rcu': round(self.capacidad['lectura'], 2),
+                    'wcu': round(self.capacidad['escritura'], 2),
+                    'por_tabla': {t: round(u, 2) for t, u in self.capacidad['por_tabla'].items()},
+                    'escaneados': escaneados,
+                    'devueltos': self.items['devueltos'],
+                    # Fracción de lo leído que sirvió (1.0 = sin filtrado desperdiciado)
+                    'eficiencia_lectura': round(self.items['devueltos'] / escaneados, 4) if escaneados else None,
+                },
+                'xcom_bytes': self.xcom_bytes,
+            }
+
+
+# Una tarea por proceso: el acumulador activo es global (no contextvar) para
+# que lo vean los hilos de los ThreadPoolExecutor de la tarea
+_actual = None
+
+
+def actual():
+    """Acumulador de la tarea en curso (None fuera de @instrumentar)"""
+    return _actual
+
+
+@contextmanager
+def fase(nombre):
+    """Mide una fase de la tarea en curso"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _actual is not None:
+            _actual.sumar_fase(nombre, time.perf_counter() - inicio)
+
+
+def observar_llamada(servicio, operacion, segundos):
+    """Registra una llamada externa que no pasa por botocore (p. ej. SMTP)"""
+    if _actual is not None:
+        _actual.registrar_llamada(servicio, operacion, segundos)
+
+
+def iniciar_parcial():
+    """
+    En un proceso hijo (fork) de la tarea: empieza un acumulador propio,
+    cuyo `parcial()` se devuelve al padre para `sumar_parcial`
+    """
+    global _actual
+    _actual = Metricas(None, None, None)
+
+
+def parcial():
+    return _actual.parcial() if _actual is not None else None
+
+
+def sumar_parcial(datos):
+    """Suma a la tarea en curso lo medido por un proceso hijo"""
+    if _actual is not None and datos:
+        _actual.sumar_parcial(datos)
+
+
+def registrar_xcom(n_bytes):
+    if _actual is not None:
+        _actual.registrar_xcom(n_bytes)
+
+
+def _antes_de_parametros(params, model, **kwargs):
+    if _actual is not None and model.name in OPERACIONES_CAPACIDAD:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _antes_de_llamada(context, **kwargs):
+    context[_CLAVE_INICIO] = time.perf_counter()
+
+
+def _despues_de_llamada(parsed, model, context, **kwargs):
+    if _actual is None:
+        return
+    inicio = context.get(_CLAVE_INICIO)
+    if inicio is not None:
+        _actual.registrar_llamada(model.service_model.service_name, model.name, time.perf_counter() - inicio)
+    if not isinstance(parsed, dict):
+        return
+    if parsed.get('ConsumedCapacity'):
+        _actual.registrar_capacidad(model.name, parsed['ConsumedCapacity'])
+    if 'Count' in parsed:
+        _actual.registrar_items(parsed.get('ScannedCount', parsed['Count']), parsed['Count'])
+
+
+def instrumentar_cliente(cliente):
+    """Engancha los eventos de botocore de un cliente (ver utils.aws)"""
+    if not METRICAS_ACTIVAS:
+        return cliente
+    eventos = cliente.meta.events
+    eventos.register('before-parameter-build.dynamodb', _antes_de_parametros)
+    eventos.register('before-call', _antes_de_llamada)
+    eventos.register('after-call', _despues_de_llamada)
+    return cliente
+
+
+def emitir_stats(resumen):
+    """Publica el resumen por el backend de métricas de Airflow (no-op si no está configurado)"""
+    try:
+        from airflow.stats import Stats
+    except ImportError:
+        return
+
+    base = f"{METRICAS_PREFIJO}.{resumen['dag_id']}.{resumen['task_id']}"
+    Stats.timing(f"{base}.duracion", resumen['segundos'] * 1000)
+    for nombre, segundos in resumen['fases'].items():
+        Stats.timing(f"{base}.fase.{nombre}", segundos * 1000)
+    for nombre, llamada in resumen['llamadas'].items():
+        Stats.incr(f"{base}.llamadas.{nombre}", llamada['n'])
+        Stats.timing(f"{base}.latencia.{nombre}", llamada['ms_total'] / llamada['n'])
+    dynamodb = resumen['dynamodb']
+    Stats.gauge(f"{base}.dynamodb.rcu", dynamodb['rcu'])
+    Stats.gauge(f"{base}.dynamodb.wcu", dynamodb['wcu'])
+    Stats.gauge(f"{base}.dynamodb.escaneados", dynamodb['escaneados'])
+    Stats.gauge(f"{base}.dynamodb.devueltos", dynamodb['devueltos'])
+    Stats.gauge(f"{base}.xcom_bytes", resumen['xcom_bytes'])
+
+
+def _ruta_resumen(dag_id, run_id, task_id=''):
+    return f"{dag_id}/{run_id.replace(':', '_').replace('+', '_')}/{task_id}"
+
+
+def guardar_resumen(resumen, base_uri=None):
+    """Guarda el resumen de una tarea como JSON y devuelve su URI"""
+    ruta = f"{_ruta_resumen(resumen['dag_id'], resumen['run_id'], resumen['task_id'])}.json"
+    return guardar_bytes(ruta, json.dumps(resumen, ensure_ascii=False).encode('utf-8'), base_uri or METRICAS_URI)
+
+
+def resumen_corrida(dag_id, run_id, task_ids, base_uri=None):
+    """Resúmenes de las tareas de una corrida (las que aún no tienen se omiten)"""
+    base = (base_uri or METRICAS_URI).rstrip('/')
+    tareas = []
+    for task_id in task_ids:
+        try:
+            tareas.append(json.loads(leer_bytes(f"{base}/{_ruta_resumen(dag_id, run_id, task_id)}.json")))
+        except Exception:
+            continue
+    return {
+        'dag_id': dag_id,
+        'run_id': run_id,
+        'segundos': round(sum(t['segundos'] for t in tareas), 4),
+        'rcu': round(sum(t['dynamodb']['rcu'] for t in tareas), 2),
+        'wcu': round(sum(t['dynamodb']['wcu'] for t in tareas), 2),
+        'xcom_bytes': sum(t['xcom_bytes'] for t in tareas),
+        'tareas': tareas,
+    }
+
+
+def guardar_resumen_corrida(context):
+    """Callback de DAG (on_success/on_failure_callback): resumen JSON de toda la corrida"""
+    dag_run = context['dag_run']
+    resumen = resumen_corrida(dag_run.dag_id, dag_run.run_id, context['dag'].task_ids)
+    uri = guardar_bytes(
+        f"{_ruta_resumen(dag_run.dag_id, dag_run.run_id)}corrida.json",
+        json.dumps(resumen, ensure_ascii=False).encode('utf-8'),
+        METRICAS_URI
+    )
+    print(f"📈 Corrida {dag_run.run_id}: {resumen['segundos']}s en tareas, "
+          f"{resumen['rcu']} RCU / {resumen['wcu']} WCU → {uri}")
+
+
+def _linea_resumen(resumen):
+    dynamodb = resumen['dynamodb']
+    linea = f"📈 Métricas {resumen['task_id']}: {resumen['segundos']:.2f}s"
+    if dynamodb['rcu'] or dynamodb['wcu']:
+        linea += f", {dynamodb['rcu']} RCU / {dynamodb['wcu']} WCU"
+    if dynamodb['escaneados']:
+        linea += f", leídos {dynamodb['escaneados']} → {dynamodb['devueltos']} devueltos"
+    if resumen['xcom_bytes']:
+        linea += f", XCom {resumen['xcom_bytes']} bytes"
+    return linea
+
+
+def _registrar_retorno(metricas, resultado):
+    from utils.xcom_backend import medir_retorno
+
+    try:
+        metricas.registrar_xcom(medir_retorno(resultado))
+    except Exception as e:
+        # Si no es serializable fallará el push de Airflow, no las métricas
+        print(f"⚠️ No se pudo medir el XCom return_value: {e}")
+
+
+def instrumentar(funcion):
+    """Decorador para los python_callable: mide la tarea y publica el resumen"""
+
+    @wraps(funcion)
+    def envoltura(**context):
+        global _actual
+        if not METRICAS_ACTIVAS:
+            return funcion(**context)
+
+        ti = context.get('ti')
+        _actual = Metricas(
+            getattr(ti, 'dag_id', None) or 'sin_dag',
+            getattr(ti, 'task_id', None) or funcion.__name__,
+            getattr(ti, 'run_id', None) or 'manual',
+        )
+        metricas = _actual
+        try:
+            resultado = funcion(**context)
+            if resultado is not None and ti is not None and getattr(context.get('task'), 'do_xcom_push', True):
+                # PythonOperator sube el valor de retorno (XCom return_value)
+                # después de la envoltura, con las métricas ya publicadas
+                _registrar_retorno(metricas, resultado)
+            return resultado
+        finally:
+            metricas.segundos = time.perf_counter() - metricas.inicio
+            _actual = None
+            resumen = metricas.resumen()
+            print(_linea_resumen(resumen))
+            # Las métricas nunca deben tumbar la tarea
+            try:
+                emitir_stats(resumen)
+                guardar_resumen(resumen)
+                if ti is not None:
+                    ti.xcom_push(key='metricas', value=resumen)
+            except Exception as e:
+                print(f"⚠️ No se pudieron publicar las métricas: {e}")
+
+    return envoltura
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Resumen de métricas de una corrida')
+    parser.add_argument('dag_id')
+    parser.add_argument('run_id')
+    parser.add_argument('--tareas', nargs='+', default=None, help='task_ids (por defecto, las del DAG)')
+    args = parser.parse_args()
+
+    task_ids = args.tareas
+    if task_ids is None:
+        import importlib
+
+        task_ids = [t.task_id for t in importlib.import_module(args.dag_id.replace('-', '_')).dag.tasks]
+
+    print(json.dumps(resumen_corrida(args.dag_id, args.run_id, task_ids), indent=2, ensure_ascii=False))
@@ -0,0 +1,101 @@
+"""
+Registro de notificaciones enviadas (ledger)
+Guarda, por (userId, incidenteId), la versión del incidente notificada
+(urgencia/estado) y la fecha del último envío. El DAG de notificaciones solo
+envía incidentes nuevos, con cambios o cuyo recordatorio ya venció.
+"""
+
+import os
+from datetime import timedelta
+
+from utils.artefactos import ARTEFACTOS_URI, existe, guardar_artefacto, leer_artefacto
+from utils.fechas import fecha_iso, parse_fecha
+
+REGISTRO_NOTIFICACIONES_URI = os.getenv(
+    'REGISTRO_NOTIFICACIONES_URI',
+    f"{ARTEFACTOS_URI.rstrip('/')}/notificaciones/registro.msgpack.z"
+)
+
+# Minutos tras los que se reenvía un incidente sin cambios (0 = nunca)
+RECORDATORIO_MINUTOS = int(os.getenv('NOTIFICACIONES_RECORDATORIO_MINUTES', '120'))
+
+VERSION_REGISTRO = 1
+
+# Posiciones de cada entrada del registro
+VERSION, FECHA_ENVIO = range(2)
+
+
+def version_incidente(inc):
+    """Versión notificable de un incidente: cambia con la urgencia o el estado"""
+    return f"{inc.get('urgencia', 'N/A')}|{inc.get('estado', 'sin_estado')}"
+
+
+def registro_vacio():
+    """Registro sin envíos"""
+    return {
+        'version': VERSION_REGISTRO,
+        'enviados': {},
+    }
+
+
+def cargar_registro(uri=None):
+    """Lee el registro persistido o devuelve uno vacío"""
+    uri = uri or REGISTRO_NOTIFICACIONES_URI
+    if not existe(uri):
+        return registro_vacio()
+
+    registro = leer_artefacto(uri)
+    if registro.get('version') != VERSION_REGISTRO:
+        print(f"⚠️ Registro de notificaciones con versión {registro.get('version')}, se reinicia")
+        return registro_vacio()
+    return registro
+
+
+def guardar_registro(registro, uri=None):
+    """Persiste el registro de notificaciones"""
+    base, _, nombre = (uri or REGISTRO_NOTIFICACIONES_URI).rpartition('/')
+    return guardar_artefacto(nombre, registro, base_uri=base)
+
+
+def pendientes_de_envio(registro, usuario_id, incidentes, ahora, recordatorio_minutos=None):
+    """
+    Incidentes que el usuario no recibió, cambiaron de versión desde el
+    último envío o cuyo recordatorio venció.
+    """
+    if recordatorio_minutos is None:
+        recordatorio_minutos = RECORDATORIO_MINUTOS
+    limite_recordatorio = ahora - timedelta(minutes=recordatorio_minutos)
+    enviados = registro['enviados'].get(usuario_id, {})
+
+    pendientes = []
+    for inc in incidentes:
+        entrada = enviados.get(inc['incidenteId'])
+        if (
+            entrada is None
+            or entrada[VERSION] != version_incidente(inc)
+            or (recordatorio_minutos > 0 and parse_fecha(entrada[FECHA_ENVIO]) <= limite_recordatorio)
+        ):
+            pendientes.append(inc)
+    return pendientes
+
+
+def marcar_enviados(registro, usuario_id, versiones, fecha):
+    """Registra el envío de {incidenteId: version} al usuario"""
+    enviados = registro['enviados'].setdefault(usuario_id, {})
+    fecha_envio = fecha_iso(fecha)
+    for incidente_id, version in versiones.items():
+        enviados[incidente_id] = [version, fecha_envio]
+
+
+def podar(registro, incidentes_activos):
+    """Elimina entradas de incidentes que ya no requieren notificación"""
+    activos = set(incidentes_activos)
+    for usuario_id in list(registro['enviados']):
+        enviados = {
+            iid: entrada for iid, entrada in registro['enviados'][usuario_id].items()
+            if iid in activos
+        }
+        if enviados:
+            registro['enviados'][usuario_id] = enviados
+        else:
+            del registro['enviados'][usuario_id]
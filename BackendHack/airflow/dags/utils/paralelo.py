@@ -0,0 +1,146 @@
+"""
+Recolección particionada en procesos para el DAG de reportes
+Construir el rollup es un bucle Python por incidente (un solo core). Con
+REPORTES_SHARDS > 1 la tabla se reparte por segmentos de scan entre
+procesos (ProcessPoolExecutor): cada shard lee su parte, arma un rollup
+parcial (buckets, sketches, TopK) y su lista de incidentes recientes, y el
+padre los mezcla en orden de shard con utils.rollup.fusionar_rollups.
+
+El resultado es el mismo que el camino serie: los rollups se mezclan con
+operaciones conmutativas, las consultas recorren en orden canónico y los
+recientes se ordenan por (fechaCreacion, incidenteId). Los TopK de los
+parciales cuentan exacto y se recortan a su capacidad una sola vez, tras
+la mezcla (en serie, tras el scan), así no dependen del reparto aunque
+haya más valores distintos que capacidad. Las sumas de minutos en coma
+flotante pueden diferir en el último bit, por debajo del redondeo de los
+reportes.
+
+Los shards necesitan que la tarea no corra en un proceso daemon: el
+LocalExecutor hace fork de cada tarea desde un LocalWorker daemon (y el hijo
+hereda el flag), así que el despliegue usa
+AIRFLOW__CORE__EXECUTE_TASKS_NEW_PYTHON_INTERPRETER=True para que cada
+tarea arranque en un intérprete nuevo. Si igual corre en un daemon, los
+shards se procesan en serie con una advertencia en el log.
+
+Comparación serie vs shards con datos sintéticos:
+    python airflow/benchmarks/bench_shards.py
+"""
+
+import logging
+import multiprocessing
+import os
+import sys
+
+from utils import metricas
+from utils.fechas import parse_fecha
+from utils.rollup import aplicar_incidente, compactar_top, fusionar_rollups, rollup_vacio
+
+REPORTES_SHARDS = int(os.getenv('REPORTES_SHARDS', '1'))
+
+log = logging.getLogger(__name__)
+
+# Lista en memoria a repartir: los hijos la heredan por fork sin serializarla
+_incidentes = None
+
+
+def orden_recientes(incidentes):
+    """Orden canónico de la lista de recientes (independiente del scan)"""
+    return sorted(incidentes, key=lambda inc: (inc['fechaCreacion'], inc['incidenteId']))
+
+
+def _procesar(incidentes, desde):
+    """Rollup parcial exacto (TopK sin recortar) y recientes (creados desde `desde`)"""
+    rollup = rollup_vacio(exacto=True)
+    recientes = []
+    leidos = 0
+    for inc in incidentes:
+        leidos += 1
+        aplicar_incidente(rollup, inc)
+        if parse_fecha(inc['fechaCreacion']) >= desde:
+            recientes.append(inc)
+    return rollup, recientes, leidos
+
+
+def procesar(incidentes, desde):
+    """Rollup y recientes (creados desde `desde`) de una secuencia de incidentes"""
+    rollup, recientes, leidos = _procesar(incidentes, desde)
+    return compactar_top(rollup), recientes, leidos
+
+
+def _inicializar_worker():
+    # Tras fork los clientes boto3 del padre no son seguros: cada shard crea los suyos
+    aws = sys.modules.get('utils.aws')
+    if aws is not None:
+        aws.reset_clientes()
+    metricas.iniciar_parcial()
+
+
+def _shard_tabla(nombre_tabla, region, indice, shards, desde):
+    from utils.aws import get_dynamodb_table
+    from utils.dynamo import scan_paginado
+
+    table = get_dynamodb_table(nombre_tabla, region)
+    return _procesar(scan_paginado(table, shard=(indice, shards)), desde)
+
+
+def _shard_lista(indice, shards, desde):
+    return _procesar(_incidentes[indice::shards], desde)
+
+
+def _en_worker(funcion, *args):
+    """Resultado del shard más las métricas medidas en el proceso hijo"""
+    return (*funcion(*args), metricas.parcial())
+
+
+def _ejecutar(trabajos, shards):
+    """
+    Corre los trabajos (funcion, *args) en un pool de `shards` procesos y
+    devuelve sus resultados en orden. Si el proceso actual no puede tener
+    hijos (worker daemon), los corre en serie en este proceso.
+    """
+    if multiprocessing.current_process().daemon:
+        log.warning(
+            "⚠️ Proceso daemon: los %d shards se procesan en serie "
+            "(falta AIRFLOW__CORE__EXECUTE_TASKS_NEW_PYTHON_INTERPRETER=True)", shards
+        )
+        # Las métricas ya quedan en el acumulador de la tarea
+        return [(*funcion(*args), None) for funcion, *args in trabajos]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    contexto = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=shards, mp_context=contexto, initializer=_inicializar_worker) as executor:
+        futuros = [executor.submit(_en_worker, funcion, *args) for funcion, *args in trabajos]
+        return [futuro.result() for futuro in futuros]
+
+
+def _combinar(resultados):
+    rollup = compactar_top(fusionar_rollups(resultado[0] for resultado in resultados))
+    recientes = orden_recientes(inc for resultado in resultados for inc in resultado[1])
+    leidos = sum(resultado[2] for resultado in resultados)
+    for resultado in resultados:
+        metricas.sumar_parcial(resultado[3])
+    return rollup, recientes, leidos
+
+
+def recolectar_particionado(nombre_tabla, region, desde, shards=None):
+    """
+    Scan completo de la tabla repartido en `shards` procesos. Devuelve
+    (rollup, recientes, leidos) igual que el camino serie.
+    """
+    shards = max(1, int(shards or REPORTES_SHARDS))
+    trabajos = [(_shard_tabla, nombre_tabla, region, indice, shards, desde) for indice in range(shards)]
+    return _combinar(_ejecutar(trabajos, shards))
+
+
+def procesar_particionado(incidentes, desde, shards=None):
+    """Como `recolectar_particionado` sobre una lista en memoria (repartida por posición)"""
+    global _incidentes
+
+    shards = max(1, int(shards or REPORTES_SHARDS))
+    _incidentes = incidentes
+    try:
+        trabajos = [(_shard_lista, indice, shards, desde) for indice in range(shards)]
+        return _combinar(_ejecutar(trabajos, shards))
+    finally:
+        _incidentes = None
@@ -0,0 +1,47 @@
+"""
+Imports diferidos para que parsear los DAGs sea barato
+El DAG processor de Airflow re-importa cada archivo de DAG cada
+min_file_process_interval; todo lo que se importa a nivel de módulo (boto3,
+numpy, smtplib...) se paga en cada parseo aunque ninguna tarea corra. Con
+`modulo(nombre)` el import real ocurre al primer acceso a un atributo, ya
+dentro de la tarea.
+
+    np = modulo('numpy')       # no importa nada todavía
+    np.array([1, 2])           # acá se importa numpy
+
+Presupuesto de parseo de los DAGs:
+    python airflow/benchmarks/presupuesto_parseo.py
+"""
+
+import importlib
+import threading
+
+
+class ModuloPerezoso:
+    """Proxy de un módulo que lo importa en el primer acceso a un atributo"""
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        # importlib.util.LazyLoader no es seguro entre hilos en Python 3.11;
+        # las tareas usan ThreadPoolExecutor, así que se carga bajo un lock
+        with self._lock:
+            if self._modulo is None:
+                self._modulo = importlib.import_module(self._nombre)
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        modulo = self._modulo if self._modulo is not None else self._cargar()
+        return getattr(modulo, atributo)
+
+    def __repr__(self):
+        estado = 'cargado' if self._modulo is not None else 'sin cargar'
+        return f"<módulo perezoso {self._nombre!r} ({estado})>"
+
+
+def modulo(nombre):
+    """Proxy perezoso del módulo `nombre`"""
+    return ModuloPerezoso(nombre)
@@ -0,0 +1,94 @@
+"""
+Plantillas del email de incidentes prioritarios
+El digest de incidentes (lista + pie) se renderiza una sola vez por área y
+conjunto de incidentes, y se reutiliza para todos los destinatarios; por
+usuario solo se completa el encabezado con el saludo. El MIME se arma al
+momento de enviar.
+"""
+
+import hashlib
+from html import escape
+from string import Template
+
+ENCABEZADO = Template("""
+        <h2>🚨 Alerta de Incidentes - $area</h2>
+        <p>Hola $nombre,</p>""")
+
+ITEM_INCIDENTE = Template("""
+            <li>
+                <strong>ID:</strong> $incidenteId<br>
+                <strong>Tipo:</strong> $tipo<br>
+                <strong>Ubicación:</strong> $ubicacion<br>
+                <strong>Descripción:</strong> $descripcion<br>
+                <strong>Estado:</strong> $estado<br>
+                <strong>Urgencia:</strong> $urgencia<br>
+                <strong>Fecha:</strong> $fechaCreacion<br>
+                <hr>
+            </li>""")
+
+DIGEST = Template("""
+        <p>Se han detectado $total incidentes de alta prioridad en tu área que requieren atención:</p>
+        <ul>$items
+        </ul>
+        <p>Por favor, ingresa al sistema para gestionar estos incidentes.</p>
+        <p><a href="$dashboard">🔗 Acceder al Dashboard</a></p>
+        <br>
+        <p><small>Esta es una notificación automática del Sistema de Alertas UTEC.<br>
+        Recibiste este email porque tu usuario está registrado como autoridad del área de $area.</small></p>
+        """)
+
+CAMPOS_INCIDENTE = ('tipo', 'ubicacion', 'descripcion', 'estado', 'urgencia', 'fechaCreacion')
+
+
+def clave_digest(area, incidentes):
+    """Identificador estable del digest de un área para un conjunto de incidentes"""
+    contenido = '\x1f'.join([area] + [inc['incidenteId'] for inc in incidentes])
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:16]
+
+
+def renderizar_digest(area, incidentes, dashboard_url):
+    """Cuerpo compartido por todos los destinatarios del área"""
+    items = ''.join(
+        ITEM_INCIDENTE.substitute(
+            incidenteId=escape(str(inc['incidenteId'])),
+            **{campo: escape(str(inc.get(campo, 'N/A'))) for campo in CAMPOS_INCIDENTE}
+        )
+        for inc in incidentes
+    )
+    return DIGEST.substitute(total=len(incidentes), items=items, dashboard=dashboard_url, area=escape(area))
+
+
+class CacheDigests:
+    """Renderiza cada digest una vez y devuelve su clave en los siguientes pedidos"""
+
+    def __init__(self, dashboard_url):
+        self.dashboard_url = dashboard_url
+        self.digests = {}
+
+    def obtener(self, area, incidentes):
+        clave = clave_digest(area, incidentes)
+        if clave not in self.digests:
+            self.digests[clave] = renderizar_digest(area, incidentes, self.dashboard_url)
+        return clave
+
+
+def construir_html(email_data, digests):
+    """HTML final de un email: encabezado del destinatario + digest compartido"""
+    encabezado = ENCABEZADO.substitute(
+        area=escape(email_data['area'].upper()),
+        nombre=escape(email_data['nombre'])
+    )
+    return encabezado + digests[email_data['digest']]
+
+
+def construir_mensaje(email_data, digests, remitente):
+    """MIME del email (se llama al momento del envío)"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    mensaje = MIMEMultipart('alternative')
+    mensaje['Subject'] = email_data['asunto']
+    mensaje['From'] = remitente
+    mensaje['To'] = email_data['destinatario']
+    mensaje.attach(MIMEText(construir_html(email_data, digests), 'html', 'utf-8'))
+    return mensaje
@@ -0,0 +1,39 @@
+"""
+Presencia de usuarios en el WebSocket
+connect.js / disconnect.js mantienen la tabla PresenciaUsuarios
+(userId → conexiones activas, ultimaConexion). El DAG consulta solo los
+usuarios candidatos con BatchGetItem, sin escanear WebSocketConnections.
+"""
+
+import os
+from datetime import timedelta
+
+from utils.dynamo import batch_get
+from utils.fechas import ahora_utc, parse_fecha
+
+DYNAMODB_TABLE_PRESENCIA = os.getenv('DYNAMODB_TABLE_PRESENCIA', 'PresenciaUsuarios')
+
+# API Gateway cierra toda conexión WebSocket a las 2 horas: un contador que
+# no se actualiza desde entonces es un $disconnect perdido, no un usuario online
+DURACION_MAX_CONEXION = timedelta(hours=2)
+
+
+def filtrar_online(resource, user_ids, ahora=None):
+    """Subconjunto de `user_ids` con al menos una conexión WebSocket vigente"""
+    user_ids = sorted({uid for uid in user_ids if uid})
+    if not user_ids:
+        return set()
+
+    limite = (ahora or ahora_utc()) - DURACION_MAX_CONEXION
+    items = batch_get(
+        resource,
+        DYNAMODB_TABLE_PRESENCIA,
+        [{'userId': uid} for uid in user_ids],
+        ProjectionExpression='userId, conexiones, ultimaConexion'
+    )
+    return {
+        item['userId'] for item in items
+        if item.get('conexiones', 0) > 0
+        and item.get('ultimaConexion')
+        and parse_fecha(item['ultimaConexion']) > limite
+    }
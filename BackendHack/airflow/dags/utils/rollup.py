@@ -0,0 +1,577 @@
+"""
+Rollup horario de incidentes
+Buckets por (hora, tipo, area, urgencia, estado) con conteos y sumas de
+tiempos de resolución. Los reportes se calculan mezclando buckets
+en lugar de recorrer todos los incidentes.
+
+Los buckets y las contribuciones por incidente (necesarias para mover un
+incidente de bucket cuando cambia su estado o urgencia) se guardan en
+artefactos separados, así las tareas de reporte solo cargan los buckets.
+Las contribuciones se parten por mes de creación (contribuciones/AAAA-MM):
+una actualización incremental carga y reescribe solo los meses de los
+incidentes que cambiaron (ver `cargar_contribuciones`), no todo el histórico.
+
+Los tiempos de resolución se resumen además en DDSketches (utils.sketch)
+por (hora, tipo, urgencia): memoria acotada sin importar el volumen, se
+mezclan entre horas para obtener p50/p90/p99 de cualquier ventana y admiten
+quitar un incidente que cambia de bucket.
+
+Ubicación (texto libre, cardinalidad sin límite) no es dimensión de los
+buckets: los valores más frecuentes de ubicación, tipo y área se llevan en
+resúmenes TopK (Space-Saving) horarios de capacidad fija, que se mezclan
+para las "zonas críticas" de cualquier horizonte. La cantidad de ubicaciones
+distintas se lleva aparte en un HyperLogLog horario: el TopK solo la conoce
+mientras no desaloja.
+
+Sketches, TopK y HyperLogLog tienen la misma granularidad que los buckets: una ventana
+mezcla exactamente las horas que cuenta en `total`.
+
+Al construir un rollup desde cero (o por shards) los TopK cuentan exacto y
+se recortan una sola vez al final con `compactar_top`: el resultado depende
+solo de los conteos, no del orden del scan ni de cómo se repartió.
+
+Reconstrucción completa (recuperación), desde airflow/dags:
+    python -m utils.rollup --reconstruir
+"""
+
+import os
+from collections import Counter
+from datetime import datetime
+
+from utils.artefactos import ARTEFACTOS_URI, borrar, existe, guardar_artefacto, leer_artefacto, listar
+from utils.fechas import parse_fecha
+from utils.sketch import CAPACIDAD_TOP, DDSketch, HyperLogLog, TopK, mezclar_top
+
+REPORTES_ROLLUP_URI = os.getenv(
+    'REPORTES_ROLLUP_URI',
+    f"{ARTEFACTOS_URI.rstrip('/')}/reportes/rollup"
+)
+
+DIMENSIONES = ('tipo', 'area', 'urgencia', 'estado')
+# Campos con resumen TopK horario (ubicacion solo se cuenta ahí)
+DIMENSIONES_TOP = ('tipo', 'ubicacion', 'area')
+REPORTES_TOP_K = int(os.getenv('REPORTES_TOP_K', str(CAPACIDAD_TOP)))
+VALORES_DEFECTO = {
+    'tipo': 'Sin clasificar',
+    'ubicacion': 'Sin ubicación',
+    'area': 'general',
+    'urgencia': 'N/A',
+    'estado': 'sin_estado',
+}
+SEPARADOR = '\x1f'
+FORMATO_HORA = '%Y-%m-%dT%H'
+# Prefijo de FORMATO_HORA con el mes: partición de las contribuciones
+LARGO_MES = len('AAAA-MM')
+EXTENSION = '.msgpack.z'
+
+VERSION_ROLLUP = 6
+MAX_DETALLES_RESOLUCION = 10
+
+# Posiciones dentro de cada bucket
+CANTIDAD, RESUELTOS, SUMA_MIN, MIN_MIN, MAX_MIN = range(5)
+
+
+def rollup_vacio(exacto=False):
+    """
+    Rollup sin datos. Con `exacto` los TopK horarios no desalojan valores
+    hasta `compactar_top` (construcción completa); si no, tienen capacidad
+    REPORTES_TOP_K (actualización incremental).
+
+    'meses_cargados' son los meses cuyas contribuciones están en memoria
+    (None: todas, p. ej. un rollup construido desde cero) y
+    'meses_modificados' los que `guardar_rollup` debe reescribir.
+    """
+    return {
+        'version': VERSION_ROLLUP,
+        'capacidad_top': None if exacto else REPORTES_TOP_K,
+        'buckets': {},
+        'contribuciones': {},
+        'meses_cargados': None,
+        'meses_modificados': set(),
+        'sketches': {},
+        'top': {},
+        'ubicaciones': {},
+        'detalles_resolucion': [],
+    }
+
+
+def _uris(uri):
+    """URI de los buckets y prefijo de las particiones de contribuciones"""
+    base = (uri or REPORTES_ROLLUP_URI).rstrip('/')
+    return f"{base}/buckets{EXTENSION}", f"{base}/contribuciones"
+
+
+def mes_incidente(inc):
+    """Mes de creación ('AAAA-MM'): partición de la contribución del incidente"""
+    return parse_fecha(inc['fechaCreacion']).strftime(FORMATO_HORA)[:LARGO_MES]
+
+
+def fecha_resolucion(inc):
+    """
+    Fecha de resolución del incidente (o None). Usa `fechaResolucion` y, en
+    items aún no migrados al historial externo, el primer evento 'resuelto'.
+    """
+    if inc.get('fechaResolucion'):
+        return parse_fecha(inc['fechaResolucion'])
+    for evento in inc.get('historial', []):
+        if 'resuelto' in evento.get('accion', '').lower():
+            return parse_fecha(evento['fecha'])
+    return None
+
+
+def contribucion(inc):
+    """[hora, dimensiones, minutos_resolucion, ubicacion] con que un incidente aporta al rollup"""
+    fecha_creacion = parse_fecha(inc['fechaCreacion'])
+    dimensiones = SEPARADOR.join(str(inc.get(d) or VALORES_DEFECTO[d]) for d in DIMENSIONES)
+
+    minutos = None
+    if inc.get('estado') == 'resuelto':
+        fecha_res = fecha_resolucion(inc)
+        if fecha_res:
+            minutos = (fecha_res - fecha_creacion).total_seconds() / 60
+
+    ubicacion = str(inc.get('ubicacion') or VALORES_DEFECTO['ubicacion'])
+    return [fecha_creacion.strftime(FORMATO_HORA), dimensiones, minutos, ubicacion]
+
+
+def _valores_top(contrib):
+    """{campo: valor} de los campos con resumen TopK de una contribución"""
+    valores = dict(zip(DIMENSIONES, contrib[1].split(SEPARADOR)))
+    valores['ubicacion'] = contrib[3]
+    return {campo: valores[campo] for campo in DIMENSIONES_TOP}
+
+
+def _actualizar_top(rollup, anterior, nueva):
+    """Mueve en los TopK de la hora los campos que cambiaron entre contribuciones"""
+    # La hora es la de creación: no cambia entre contribuciones de un incidente
+    resumenes = rollup['top'].setdefault(nueva[0], {})
+    valores_anteriores = _valores_top(anterior) if anterior is not None else {}
+    for campo, valor in _valores_top(nueva).items():
+        anterior_valor = valores_anteriores.get(campo)
+        if anterior_valor == valor:
+            continue
+        resumen = resumenes.get(campo)
+        if resumen is None:
+            resumen = resumenes[campo] = TopK(rollup['capacidad_top'])
+        if anterior_valor is not None:
+            resumen.quitar(anterior_valor)
+        resumen.agregar(valor)
+
+
+def _actualizar_ubicaciones(rollup, anterior, nueva):
+    """Mueve el incidente en el HyperLogLog de ubicaciones de su hora"""
+    if anterior is not None and anterior[3] == nueva[3]:
+        return
+    distintas = rollup['ubicaciones'].get(nueva[0])
+    if distintas is None:
+        distintas = rollup['ubicaciones'][nueva[0]] = HyperLogLog()
+    if anterior is not None:
+        distintas.quitar(anterior[3])
+    distintas.agregar(nueva[3])
+
+
+def _clave_sketch(dimensiones):
+    valores = dimensiones.split(SEPARADOR)
+    return f"{valores[DIMENSIONES.index('tipo')]}{SEPARADOR}{valores[DIMENSIONES.index('urgencia')]}"
+
+
+def _sumar_sketch(rollup, hora, dimensiones, minutos, signo):
+    sketches_hora = rollup['sketches'].setdefault(hora, {})
+    clave = _clave_sketch(dimensiones)
+    sketch = sketches_hora.get(clave)
+    if sketch is None:
+        sketch = sketches_hora[clave] = DDSketch()
+
+    if signo > 0:
+        sketch.agregar(minutos)
+    else:
+        sketch.quitar(minutos)
+        if not sketch.n:
+            del sketches_hora[clave]
+            if not sketches_hora:
+                del rollup['sketches'][hora]
+
+
+def _sumar(rollup, contrib, signo):
+    hora, dimensiones, minutos = contrib[:3]
+    buckets_hora = rollup['buckets'].setdefault(hora, {})
+    bucket = buckets_hora.setdefault(dimensiones, [0, 0, 0.0, None, None])
+
+    bucket[CANTIDAD] += signo
+    if minutos is not None:
+        bucket[RESUELTOS] += signo
+        bucket[SUMA_MIN] += signo * minutos
+        if signo > 0:
+            bucket[MIN_MIN] = minutos if bucket[MIN_MIN] is None else min(bucket[MIN_MIN], minutos)
+            bucket[MAX_MIN] = minutos if bucket[MAX_MIN] is None else max(bucket[MAX_MIN], minutos)
+        elif bucket[RESUELTOS] == 0:
+            # min/max no se pueden descontar; se reinician al vaciarse el bucket
+            bucket[SUMA_MIN] = 0.0
+            bucket[MIN_MIN] = bucket[MAX_MIN] = None
+        _sumar_sketch(rollup, hora, dimensiones, minutos, signo)
+
+    if bucket[CANTIDAD] <= 0:
+        del buckets_hora[dimensiones]
+        if not buckets_hora:
+            del rollup['buckets'][hora]
+
+
+def aplicar_incidente(rollup, inc):
+    """Agrega o actualiza la contribución de un incidente (idempotente)"""
+    incidente_id = inc['incidenteId']
+    nueva = contribucion(inc)
+    anterior = rollup['contribuciones'].get(incidente_id)
+
+    if anterior == nueva:
+        return
+    if anterior is not None:
+        _sumar(rollup, anterior, -1)
+
+    _sumar(rollup, nueva, 1)
+    _actualizar_top(rollup, anterior, nueva)
+    _actualizar_ubicaciones(rollup, anterior, nueva)
+    rollup['contribuciones'][incidente_id] = nueva
+    rollup['meses_modificados'].add(nueva[0][:LARGO_MES])
+
+    if nueva[2] is not None and (anterior is None or anterior[2] is None):
+        rollup['detalles_resolucion'] = _muestra_detalles(rollup['detalles_resolucion'], [{
+            'incidenteId': incidente_id,
+            'tipo': inc.get('tipo', 'N/A'),
+            'urgencia': inc.get('urgencia', 'N/A'),
+            'tiempo_minutos': nueva[2]
+        }])
+
+
+def _muestra_detalles(detalles, nuevos):
+    """
+    Muestra de resoluciones de ejemplo: las de menor incidenteId (IDs
+    aleatorios), así no depende del orden en que llegan los incidentes
+    """
+    if len(detalles) >= MAX_DETALLES_RESOLUCION and all(
+        d['incidenteId'] >= detalles[-1]['incidenteId'] for d in nuevos
+    ):
+        return detalles
+    return sorted(detalles + nuevos, key=lambda d: d['incidenteId'])[:MAX_DETALLES_RESOLUCION]
+
+
+def construir_rollup(incidentes):
+    """Construye un rollup desde cero a partir de una secuencia de incidentes"""
+    rollup = rollup_vacio(exacto=True)
+    for inc in incidentes:
+        aplicar_incidente(rollup, inc)
+    return compactar_top(rollup)
+
+
+def compactar_top(rollup, capacidad=None):
+    """
+    Recorta los TopK horarios a `capacidad` (REPORTES_TOP_K por defecto).
+    Sobre un rollup `exacto` el resultado no depende del orden de los
+    incidentes; el rollup queda listo para persistir y actualizar.
+    """
+    capacidad = capacidad or REPORTES_TOP_K
+    for resumenes in rollup['top'].values():
+        for resumen in resumenes.values():
+            resumen.recortar(capacidad)
+    rollup['capacidad_top'] = capacidad
+    return rollup
+
+
+def fusionar_rollups(parciales):
+    """
+    Mezcla rollups construidos sobre particiones disjuntas de los incidentes
+    (p. ej. shards de un scan). Con parciales `exacto` el resultado también
+    lo es: tras `compactar_top` da los mismos reportes que construirlo en
+    serie, sin importar el orden de los parciales.
+    """
+    rollup = rollup_vacio()
+    for parcial in parciales:
+        if parcial['capacidad_top'] is None:
+            rollup['capacidad_top'] = None
+        for hora, buckets_hora in parcial['buckets'].items():
+            destino_hora = rollup['buckets'].setdefault(hora, {})
+            for dimensiones, bucket in buckets_hora.items():
+                destino = destino_hora.get(dimensiones)
+                if destino is None:
+                    destino_hora[dimensiones] = list(bucket)
+                    continue
+                destino[CANTIDAD] += bucket[CANTIDAD]
+                destino[RESUELTOS] += bucket[RESUELTOS]
+                destino[SUMA_MIN] += bucket[SUMA_MIN]
+                for posicion, elegir in ((MIN_MIN, min), (MAX_MIN, max)):
+                    valores = [v for v in (destino[posicion], bucket[posicion]) if v is not None]
+                    destino[posicion] = elegir(valores) if valores else None
+
+        for hora, sketches_hora in parcial['sketches'].items():
+            destino_hora = rollup['sketches'].setdefault(hora, {})
+            for clave, sketch in sketches_hora.items():
+                destino_hora.setdefault(clave, DDSketch(sketch.alfa)).mezclar(sketch)
+
+        for hora, resumenes in parcial['top'].items():
+            destino_hora = rollup['top'].setdefault(hora, {})
+            for campo, resumen in resumenes.items():
+                destino_hora.setdefault(campo, TopK(resumen.capacidad)).mezclar(resumen)
+
+        for hora, distintas in parcial['ubicaciones'].items():
+            rollup['ubicaciones'].setdefault(hora, HyperLogLog(distintas.precision)).mezclar(distintas)
+
+        rollup['contribuciones'].update(parcial['contribuciones'])
+        rollup['detalles_resolucion'] = _muestra_detalles(rollup['detalles_resolucion'], parcial['detalles_resolucion'])
+    return rollup
+
+
+def cargar_rollup(uri=None, con_contribuciones=True):
+    """
+    Lee el rollup persistido (o uno vacío si no existe). Sin
+    `con_contribuciones` no carga ninguna: las tareas de reporte no las
+    usan y la actualización incremental carga solo los meses que necesita.
+    """
+    uri_buckets, _ = _uris(uri)
+    if not existe(uri_buckets):
+        return rollup_vacio()
+
+    datos = leer_artefacto(uri_buckets)
+    if datos.get('version') != VERSION_ROLLUP:
+        print(f"⚠️ Rollup con versión {datos.get('version')}, debe reconstruirse")
+        return rollup_vacio()
+
+    rollup = rollup_vacio()
+    rollup['buckets'] = datos['buckets']
+    rollup['sketches'] = {
+        hora: {clave: DDSketch.desde_lista(sketch) for clave, sketch in sketches_hora.items()}
+        for hora, sketches_hora in datos['sketches'].items()
+    }
+    rollup['top'] = {
+        hora: {campo: TopK.desde_lista(resumen) for campo, resumen in resumenes.items()}
+        for hora, resumenes in datos['top'].items()
+    }
+    rollup['ubicaciones'] = {hora: HyperLogLog.desde_lista(distintas) for hora, distintas in datos['ubicaciones'].items()}
+    rollup['detalles_resolucion'] = datos['detalles_resolucion']
+    rollup['meses_cargados'] = set()
+    if con_contribuciones:
+        cargar_contribuciones(rollup, uri=uri)
+    return rollup
+
+
+def _particiones(prefijo):
+    """{mes: uri} de las particiones de contribuciones persistidas"""
+    particiones = {}
+    for ruta in listar(f"{prefijo}/"):
+        nombre = ruta.rpartition('/')[2]
+        if nombre.endswith(EXTENSION):
+            particiones[nombre[:-len(EXTENSION)]] = ruta
+    return particiones
+
+
+def cargar_contribuciones(rollup, meses=None, uri=None):
+    """
+    Agrega al rollup las contribuciones persistidas de los `meses`
+    ('AAAA-MM', ver `mes_incidente`) que aún no tiene; sin `meses`, todas.
+    Antes de aplicar un incidente su mes debe estar cargado: si no, se
+    contaría dos veces y al guardar se perdería el resto de la partición.
+    """
+    if rollup['meses_cargados'] is None:
+        return rollup
+    _, prefijo = _uris(uri)
+    if meses is None:
+        particiones = _particiones(prefijo)
+    else:
+        particiones = {mes: f"{prefijo}/{mes}{EXTENSION}" for mes in meses}
+
+    for mes, ruta in sorted(particiones.items()):
+        if mes in rollup['meses_cargados']:
+            continue
+        if meses is None or existe(ruta):
+            rollup['contribuciones'].update(leer_artefacto(ruta))
+        rollup['meses_cargados'].add(mes)
+    if meses is None:
+        rollup['meses_cargados'] = None
+    return rollup
+
+
+def _guardar_contribuciones(rollup, prefijo):
+    """Reescribe las particiones de los meses modificados (todas si el rollup está completo)"""
+    completo = rollup['meses_cargados'] is None
+    por_mes = {} if completo else {mes: {} for mes in rollup['meses_modificados']}
+    for incidente_id, contrib in rollup['contribuciones'].items():
+        mes = contrib[0][:LARGO_MES]
+        if completo:
+            por_mes.setdefault(mes, {})[incidente_id] = contrib
+        elif mes in por_mes:
+            por_mes[mes][incidente_id] = contrib
+
+    for mes, contribuciones in sorted(por_mes.items()):
+        guardar_artefacto(f"{mes}{EXTENSION}", contribuciones, base_uri=prefijo)
+    if completo:
+        # Meses que ya no tienen incidentes (p. ej. de un rollup anterior)
+        for mes, ruta in _particiones(prefijo).items():
+            if mes not in por_mes:
+                borrar(ruta)
+    rollup['meses_modificados'] = set()
+
+
+def total_incidentes(rollup):
+    """Incidentes contados en el rollup (sin cargar las contribuciones)"""
+    return sum(bucket[CANTIDAD] for buckets_hora in rollup['buckets'].values() for bucket in buckets_hora.values())
+
+
+def guardar_rollup(rollup, uri=None):
+    """Persiste las contribuciones (ver `_guardar_contribuciones`) y los buckets"""
+    uri_buckets, prefijo = _uris(uri)
+    _guardar_contribuciones(rollup, prefijo)
+    base, _, nombre = uri_buckets.rpartition('/')
+    guardar_artefacto(nombre, {
+        'version': VERSION_ROLLUP,
+        'buckets': rollup['buckets'],
+        'sketches': {
+            hora: {clave: sketch.a_lista() for clave, sketch in sketches_hora.items()}
+            for hora, sketches_hora in rollup['sketches'].items()
+        },
+        'top': {
+            hora: {campo: resumen.a_lista() for campo, resumen in resumenes.items()}
+            for hora, resumenes in rollup['top'].items()
+        },
+        'ubicaciones': {hora: distintas.a_lista() for hora, distintas in rollup['ubicaciones'].items()},
+        'detalles_resolucion': rollup['detalles_resolucion'],
+    }, base_uri=base)
+
+
+def _resultado_vacio():
+    resultado = {
+        'total': 0,
+        'por_dia_semana': Counter(),
+        'por_hora': Counter(),
+        'por_dia': Counter(),
+        'resolucion': {'total': 0, 'suma_min': 0.0, 'min': None, 'max': None},
+    }
+    for dimension in DIMENSIONES:
+        resultado[f"por_{dimension}"] = Counter()
+    return resultado
+
+
+def _claves_rango(desde, hasta):
+    return desde.strftime(FORMATO_HORA) if desde else None, hasta.strftime(FORMATO_HORA) if hasta else None
+
+
+def _en_rango(clave, desde_clave, hasta_clave):
+    return not ((desde_clave and clave < desde_clave) or (hasta_clave and clave >= hasta_clave))
+
+
+def _sketches_vacios():
+    return {'total': DDSketch(), 'por_tipo': {}, 'por_urgencia': {}}
+
+
+def _mezclar_sketches_hora(sketches, sketches_hora):
+    for clave, sketch in sorted(sketches_hora.items()):
+        tipo, urgencia = clave.split(SEPARADOR)
+        sketches['total'].mezclar(sketch)
+        sketches['por_tipo'].setdefault(tipo, DDSketch()).mezclar(sketch)
+        sketches['por_urgencia'].setdefault(urgencia, DDSketch()).mezclar(sketch)
+
+
+def consultar_ventanas(rollup, rangos):
+    """
+    Como `consultar`, para varias ventanas {nombre: (desde, hasta)} en una
+    sola pasada por los buckets: cada hora se suma a los acumuladores de las
+    ventanas que la contienen. Devuelve {nombre: resultado}.
+    """
+    claves = {nombre: _claves_rango(desde, hasta) for nombre, (desde, hasta) in rangos.items()}
+    resultados = {nombre: _resultado_vacio() for nombre in rangos}
+    sketches = {nombre: _sketches_vacios() for nombre in rangos}
+    # TopK horarios de cada ventana, mezclados de una vez al final
+    resumenes_top = {nombre: {campo: [] for campo in DIMENSIONES_TOP} for nombre in rangos}
+    ubicaciones = {nombre: HyperLogLog() for nombre in rangos}
+
+    # Orden canónico (hora y dimensiones ordenadas): los Counter del resultado
+    # no dependen del orden en que se insertaron los buckets
+    for hora, buckets_hora in sorted(rollup['buckets'].items()):
+        nombres = [nombre for nombre, (d, h) in claves.items() if _en_rango(hora, d, h)]
+        if not nombres:
+            continue
+        destinos = [resultados[nombre] for nombre in nombres]
+
+        fecha_hora = datetime.strptime(hora, FORMATO_HORA)
+        total_hora = 0
+
+        for dimensiones, bucket in sorted(buckets_hora.items()):
+            cantidad = bucket[CANTIDAD]
+            total_hora += cantidad
+            valores = dimensiones.split(SEPARADOR)
+            for resultado in destinos:
+                for dimension, valor in zip(DIMENSIONES, valores):
+                    resultado[f"por_{dimension}"][valor] += cantidad
+
+                if bucket[RESUELTOS]:
+                    res = resultado['resolucion']
+                    res['total'] += bucket[RESUELTOS]
+                    res['suma_min'] += bucket[SUMA_MIN]
+                    res['min'] = bucket[MIN_MIN] if res['min'] is None else min(res['min'], bucket[MIN_MIN])
+                    res['max'] = bucket[MAX_MIN] if res['max'] is None else max(res['max'], bucket[MAX_MIN])
+
+        for resultado in destinos:
+            resultado['total'] += total_hora
+            resultado['por_dia_semana'][fecha_hora.strftime('%A')] += total_hora
+            resultado['por_hora'][fecha_hora.hour] += total_hora
+            resultado['por_dia'][fecha_hora.strftime('%Y-%m-%d')] += total_hora
+
+        # Sketches, TopK y ubicaciones de la misma hora: cada ventana resume lo que cuenta
+        sketches_hora = rollup['sketches'].get(hora, {})
+        top_hora = rollup['top'].get(hora, {})
+        distintas_hora = rollup['ubicaciones'].get(hora)
+        for nombre in nombres:
+            _mezclar_sketches_hora(sketches[nombre], sketches_hora)
+            for campo, resumen in top_hora.items():
+                resumenes_top[nombre][campo].append(resumen)
+            if distintas_hora is not None:
+                ubicaciones[nombre].mezclar(distintas_hora)
+
+    for nombre, resultado in resultados.items():
+        top = {campo: mezclar_top(resumenes_top[nombre][campo], REPORTES_TOP_K) for campo in DIMENSIONES_TOP}
+        resultado['resolucion']['sketches'] = sketches[nombre]
+        resultado['top'] = top
+        resultado['por_ubicacion'] = Counter(top['ubicacion'].conteos())
+        # Sin desalojos el TopK tiene todas las ubicaciones; si no, se estima
+        exacto = top['ubicacion'].error_maximo() == 0 and len(top['ubicacion']) < REPORTES_TOP_K
+        resultado['ubicaciones_distintas'] = len(top['ubicacion']) if exacto else ubicaciones[nombre].estimar()
+        resultado['ubicaciones_estimadas'] = not exacto
+    return resultados
+
+
+def consultar(rollup, desde=None, hasta=None):
+    """
+    Mezcla los buckets con hora en [desde, hasta) y devuelve conteos por
+    dimensión, por día de la semana, por hora del día, por día y los
+    acumuladores de resolución. Los sketches de resolución (total, por tipo
+    y por urgencia) y los TopK de tipo/ubicación/área (en 'top'; de ahí sale
+    'por_ubicacion') se mezclan de las mismas horas. 'ubicaciones_distintas'
+    es exacta mientras el TopK no desalojó y estimada (HyperLogLog,
+    'ubicaciones_estimadas') si desalojó.
+    """
+    return consultar_ventanas(rollup, {None: (desde, hasta)})[None]
+
+
+def reconstruir(table, uri=None):
+    """Reconstruye el rollup con un scan completo de la tabla y lo persiste"""
+    from utils.dynamo import scan_paginado
+
+    rollup = construir_rollup(scan_paginado(table))
+    guardar_rollup(rollup, uri)
+    return rollup
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from utils.aws import get_dynamodb_table
+
+    parser = argparse.ArgumentParser(description='Mantenimiento del rollup horario de incidentes')
+    parser.add_argument('--reconstruir', action='store_true', help='Reconstruye el rollup desde DynamoDB')
+    parser.add_argument('--tabla', default=os.getenv('DYNAMODB_TABLE_INCIDENTES', 'Incidentes'))
+    parser.add_argument('--uri', default=None, help='Destino del rollup (por defecto REPORTES_ROLLUP_URI)')
+    args = parser.parse_args()
+
+    if not args.reconstruir:
+        parser.error('Indica --reconstruir')
+
+    rollup = reconstruir(get_dynamodb_table(args.tabla), args.uri)
+    total_buckets = sum(len(b) for b in rollup['buckets'].values())
+    print(f"✅ Rollup reconstruido: {len(rollup['contribuciones'])} incidentes en {total_buckets} buckets")
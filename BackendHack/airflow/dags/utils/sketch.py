@@ -0,0 +1,360 @@
+"""
+Sketches de streaming mezclables para el rollup de reportes
+
+DDSketch, cuantiles de tiempos de resolución: histograma con buckets
+logarítmicos; cualquier cuantil se estima con error relativo <= ALFA (1% por
+defecto) en memoria acotada (MAX_BINS buckets), dos sketches se mezclan
+sumando buckets y, como son conteos, un valor se puede quitar (necesario
+para el rollup, que mueve incidentes de bucket).
+
+TopK (Space-Saving), valores más frecuentes de campos de texto libre
+(ubicación, tipo, área): a lo sumo `capacidad` contadores; cada conteo
+sobreestima el real en a lo sumo su `error` (<= n / capacidad) y es exacto
+mientras haya menos valores distintos que capacidad. Con capacidad None
+cuenta exacto hasta `recortar`, que lo deja en sus `capacidad` valores más
+frecuentes sin depender del orden en que llegaron.
+
+HyperLogLog, cantidad de valores distintos (ubicaciones de una ventana, que
+el TopK no puede dar una vez que desaloja): error relativo ~1.04/sqrt(2^p)
+(1.6% con p=12). Cada registro guarda cuántas veces se vio cada rango en vez
+del rango máximo, así un valor se puede quitar y dos resúmenes se mezclan
+sumando; en forma dispersa ocupa a lo sumo una entrada por valor distinto.
+
+Los tres se persisten como listas dentro de los artefactos msgpack del rollup.
+"""
+
+import hashlib
+import math
+
+from utils.perezoso import modulo
+
+np = modulo('numpy')
+
+ALFA = 0.01
+MAX_BINS = 2048
+# Valores por debajo de esto (0 minutos, o negativos por datos malos) van al bucket cero
+MIN_INDEXABLE = 1e-6
+
+PUNTOS = (0.5, 0.9, 0.99)
+
+CAPACIDAD_TOP = 256
+
+PRECISION_HLL = 12
+
+
+class DDSketch:
+    """Sketch de cuantiles con error relativo acotado, mezclable y con borrado"""
+
+    def __init__(self, alfa=ALFA):
+        self.alfa = alfa
+        self.gamma = (1 + alfa) / (1 - alfa)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.ceros = 0
+        self.suma = 0.0
+        # Índice en el que se acumularon los buckets más bajos al superar MAX_BINS
+        self.colapso = None
+
+    @property
+    def n(self):
+        return self.ceros + sum(self.bins.values())
+
+    def __len__(self):
+        return self.n
+
+    def _indice(self, valor):
+        indice = math.ceil(math.log(valor) / self._log_gamma)
+        if self.colapso is not None and indice < self.colapso:
+            return self.colapso
+        return indice
+
+    def _valor(self, indice):
+        # Punto medio (en error relativo) del bucket (gamma^(i-1), gamma^i]
+        return 2 * self.gamma ** indice / (self.gamma + 1)
+
+    def _colapsar(self):
+        if len(self.bins) <= MAX_BINS:
+            return
+        indices = sorted(self.bins)
+        sobrantes = indices[:len(indices) - MAX_BINS + 1]
+        destino = sobrantes[-1]
+        self.bins[destino] = sum(self.bins.pop(i) for i in sobrantes[:-1]) + self.bins[destino]
+        self.colapso = destino
+
+    def agregar(self, valor, peso=1):
+        self.suma += valor * peso
+        if valor <= MIN_INDEXABLE:
+            self.ceros += peso
+            return
+        indice = self._indice(valor)
+        self.bins[indice] = self.bins.get(indice, 0) + peso
+        self._colapsar()
+
+    def quitar(self, valor, peso=1):
+        """Descuenta un valor agregado antes"""
+        self.suma -= valor * peso
+        if valor <= MIN_INDEXABLE:
+            self.ceros = max(0, self.ceros - peso)
+            return
+        indice = self._indice(valor)
+        restante = self.bins.get(indice, 0) - peso
+        if restante > 0:
+            self.bins[indice] = restante
+        else:
+            self.bins.pop(indice, None)
+        if not self.bins and not self.ceros:
+            self.suma = 0.0
+
+    def mezclar(self, otro):
+        """Suma `otro` a este sketch (deben tener el mismo alfa)"""
+        if otro.alfa != self.alfa:
+            raise ValueError(f"Sketches con distinto alfa: {self.alfa} y {otro.alfa}")
+        self.ceros += otro.ceros
+        self.suma += otro.suma
+        if otro.colapso is not None:
+            self.colapso = otro.colapso if self.colapso is None else max(self.colapso, otro.colapso)
+        for indice, conteo in otro.bins.items():
+            indice = max(indice, self.colapso) if self.colapso is not None else indice
+            self.bins[indice] = self.bins.get(indice, 0) + conteo
+        if self.colapso is not None:
+            for indice in [i for i in self.bins if i < self.colapso]:
+                self.bins[self.colapso] = self.bins.get(self.colapso, 0) + self.bins.pop(indice)
+        self._colapsar()
+        return self
+
+    def cuantil(self, q):
+        """Valor estimado del cuantil q (0..1), o None si está vacío"""
+        n = self.n
+        if n == 0:
+            return None
+        rango = q * (n - 1)
+        acumulado = self.ceros
+        if acumulado > rango:
+            return 0.0
+        for indice in sorted(self.bins):
+            acumulado += self.bins[indice]
+            if acumulado > rango:
+                return self._valor(indice)
+        return self._valor(max(self.bins))
+
+    def resumen(self, puntos=PUNTOS, decimales=2):
+        """{'n', 'promedio', 'p50', 'p90', 'p99'} (minutos)"""
+        n = self.n
+        resultado = {'n': n, 'promedio': round(self.suma / n, decimales) if n else 0}
+        for q in puntos:
+            valor = self.cuantil(q)
+            resultado[f"p{q * 100:g}"] = round(valor, decimales) if valor is not None else 0
+        return resultado
+
+    def a_lista(self):
+        return [self.alfa, self.ceros, self.colapso, self.suma, self.bins]
+
+    @classmethod
+    def desde_lista(cls, datos):
+        alfa, ceros, colapso, suma, bins = datos
+        sketch = cls(alfa)
+        sketch.ceros, sketch.colapso, sketch.suma = ceros, colapso, suma
+        sketch.bins = {int(i): c for i, c in bins.items()}
+        return sketch
+
+    @classmethod
+    def desde_valores(cls, valores, alfa=ALFA):
+        """Construye el sketch de un array de valores de una vez (NumPy)"""
+        sketch = cls(alfa)
+        valores = np.asarray(valores, dtype=np.float64)
+        if not len(valores):
+            return sketch
+        positivos = valores[valores > MIN_INDEXABLE]
+        sketch.ceros = int(len(valores) - len(positivos))
+        sketch.suma = float(valores.sum())
+        if len(positivos):
+            indices, conteos = np.unique(np.ceil(np.log(positivos) / sketch._log_gamma).astype(np.int64), return_counts=True)
+            sketch.bins = dict(zip(indices.tolist(), conteos.tolist()))
+            sketch._colapsar()
+        return sketch
+
+
+class TopK:
+    """Resumen Space-Saving de los valores más frecuentes, mezclable"""
+
+    def __init__(self, capacidad=CAPACIDAD_TOP):
+        # None: conteo exacto, sin desalojar (ver `recortar`)
+        self.capacidad = capacidad
+        self.n = 0
+        # valor -> [conteo, error]; conteo - error <= real <= conteo
+        self.contadores = {}
+
+    def __len__(self):
+        return len(self.contadores)
+
+    def _minimo(self):
+        """Conteo mínimo monitoreado si el resumen está lleno (cota de lo no monitoreado)"""
+        if self.capacidad is None or len(self.contadores) < self.capacidad:
+            return 0
+        return min(conteo for conteo, _ in self.contadores.values())
+
+    def agregar(self, valor, peso=1):
+        self.n += peso
+        contador = self.contadores.get(valor)
+        if contador is not None:
+            contador[0] += peso
+            return
+        if self.capacidad is None or len(self.contadores) < self.capacidad:
+            self.contadores[valor] = [peso, 0]
+            return
+        # Reemplaza al de menor conteo, heredando su conteo como error
+        desalojado = min(self.contadores, key=lambda v: self.contadores[v][0])
+        minimo = self.contadores.pop(desalojado)[0]
+        self.contadores[valor] = [minimo + peso, minimo]
+
+    def quitar(self, valor, peso=1):
+        """Descuenta un valor monitoreado (si ya fue desalojado no hay nada que quitar)"""
+        self.n = max(0, self.n - peso)
+        contador = self.contadores.get(valor)
+        if contador is None:
+            return
+        contador[0] -= peso
+        if contador[0] <= 0:
+            del self.contadores[valor]
+        else:
+            contador[1] = min(contador[1], contador[0])
+
+    def mezclar(self, otro):
+        """Suma `otro` a este resumen (ver `mezclar_top`); exacto si alguno lo es"""
+        capacidades = (self.capacidad, otro.capacidad)
+        capacidad = None if None in capacidades else max(capacidades)
+        mezcla = mezclar_top([self, otro], capacidad)
+        self.n, self.capacidad, self.contadores = mezcla.n, mezcla.capacidad, mezcla.contadores
+        return self
+
+    def recortar(self, capacidad=CAPACIDAD_TOP):
+        """
+        Deja el resumen en `capacidad` contadores: los de mayor conteo, con
+        empates por valor. Sobre un conteo exacto el resultado depende solo
+        de los conteos, no del orden de llegada.
+        """
+        recortado = mezclar_top([self], capacidad)
+        self.capacidad, self.contadores = recortado.capacidad, recortado.contadores
+        return self
+
+    def top(self, n=None):
+        """[(valor, conteo, error)] de mayor a menor conteo"""
+        ordenados = sorted(self.contadores.items(), key=lambda par: (-par[1][0], par[1][1], par[0]))
+        return [(valor, conteo, error) for valor, (conteo, error) in ordenados[:n]]
+
+    def conteos(self):
+        """{valor: conteo} de los valores monitoreados"""
+        return {valor: conteo for valor, (conteo, _) in self.contadores.items()}
+
+    def errores(self):
+        """{valor: error} de los valores monitoreados (cota del sobreconteo de cada uno)"""
+        return {valor: error for valor, (_, error) in self.contadores.items()}
+
+    def error_maximo(self):
+        """Cota del error de cualquier conteo (0 si es exacto)"""
+        return max((error for _, error in self.contadores.values()), default=0)
+
+    def a_lista(self):
+        return [self.capacidad, self.n, self.contadores]
+
+    @classmethod
+    def desde_lista(cls, datos):
+        capacidad, n, contadores = datos
+        resumen = cls(capacidad)
+        resumen.n = n
+        resumen.contadores = {valor: list(contador) for valor, contador in contadores.items()}
+        return resumen
+
+
+class HyperLogLog:
+    """Estimador de valores distintos, mezclable y con borrado"""
+
+    def __init__(self, precision=PRECISION_HLL):
+        self.precision = precision
+        # registro -> {rango: veces}; el valor del registro es su mayor rango presente
+        self.registros = {}
+
+    def _posicion(self, valor):
+        # Hash estable entre procesos (hash() de str cambia con PYTHONHASHSEED)
+        h = int.from_bytes(hashlib.blake2b(str(valor).encode(), digest_size=8).digest(), 'big')
+        bits = 64 - self.precision
+        resto = h & ((1 << bits) - 1)
+        return h >> bits, bits - resto.bit_length() + 1
+
+    def agregar(self, valor, peso=1):
+        registro, rango = self._posicion(valor)
+        rangos = self.registros.setdefault(registro, {})
+        rangos[rango] = rangos.get(rango, 0) + peso
+
+    def quitar(self, valor, peso=1):
+        registro, rango = self._posicion(valor)
+        rangos = self.registros.get(registro)
+        if rangos is None or rango not in rangos:
+            return
+        rangos[rango] -= peso
+        if rangos[rango] <= 0:
+            del rangos[rango]
+            if not rangos:
+                del self.registros[registro]
+
+    def mezclar(self, otro):
+        """Suma `otro` a este resumen (misma precisión)"""
+        for registro, rangos in otro.registros.items():
+            destino = self.registros.setdefault(registro, {})
+            for rango, veces in rangos.items():
+                destino[rango] = destino.get(rango, 0) + veces
+        return self
+
+    def estimar(self):
+        """Cantidad estimada de valores distintos"""
+        m = 1 << self.precision
+        vacios = m - len(self.registros)
+        suma = vacios + sum(2.0 ** -max(rangos) for rangos in self.registros.values())
+        estimado = 0.7213 / (1 + 1.079 / m) * m * m / suma
+        if estimado <= 2.5 * m and vacios:
+            # Cardinalidades chicas: conteo lineal de registros vacíos
+            estimado = m * math.log(m / vacios)
+        return int(round(estimado))
+
+    def a_lista(self):
+        return [self.precision, self.registros]
+
+    @classmethod
+    def desde_lista(cls, datos):
+        precision, registros = datos
+        resumen = cls(precision)
+        resumen.registros = {
+            int(registro): {int(rango): veces for rango, veces in rangos.items()}
+            for registro, rangos in registros.items()
+        }
+        return resumen
+
+
+def mezclar_top(resumenes, capacidad=CAPACIDAD_TOP):
+    """
+    Un TopK con la mezcla de varios resúmenes de una vez. A un valor ausente
+    en un resumen lleno se le suma el mínimo de ese resumen como conteo y
+    como error, así los conteos siguen acotando al real por arriba. El
+    resultado no depende del orden de los resúmenes. Con capacidad None no
+    se recorta (conteo exacto si los resúmenes lo son).
+    """
+    total = TopK(capacidad)
+    # Suma de los mínimos de todos los resúmenes: lo que aporta cada uno a un valor ausente
+    base = 0
+    excedentes = {}
+    for resumen in resumenes:
+        minimo = resumen._minimo()
+        base += minimo
+        total.n += resumen.n
+        for valor, (conteo, error) in resumen.contadores.items():
+            excedente = excedentes.setdefault(valor, [0, 0])
+            excedente[0] += conteo - minimo
+            excedente[1] += error - minimo
+
+    # Orden canónico: el resultado no depende del orden de mezcla ni del hash
+    combinados = {valor: [base + excedentes[valor][0], base + excedentes[valor][1]] for valor in sorted(excedentes)}
+    if capacidad is not None and len(combinados) > capacidad:
+        conservados = set(sorted(combinados, key=lambda v: (-combinados[v][0], v))[:capacidad])
+        combinados = {valor: c for valor, c in combinados.items() if valor in conservados}
+    total.contadores = combinados
+    return total
@@ -0,0 +1,167 @@
+"""
+Agenda de escalaciones SLA
+Para cada incidente abierto guarda el instante exacto en que cruza el
+umbral de su urgencia actual, en una cola de prioridad (heap). El DAG de
+monitoreo duerme (sensor diferible) hasta el vencimiento más próximo y
+solo entonces lee de DynamoDB los incidentes vencidos.
+
+La agenda se persiste como artefacto y se sincroniza con DynamoDB cada
+SLA_SINCRONIZACION_MINUTES (debe ser menor que el umbral más corto para
+no perder el primer vencimiento de un incidente nuevo). Con el consumidor
+de cambios (utils.cambios) se sincroniza desde el snapshot en cada
+despertar, cada CAMBIOS_INTERVALO_SECONDS.
+"""
+
+import heapq
+import os
+from datetime import timedelta
+
+from utils.artefactos import ARTEFACTOS_URI, existe, guardar_artefacto, leer_artefacto
+from utils.fechas import fecha_iso, parse_fecha
+
+# Thresholds de escalación (en minutos desde la creación)
+THRESHOLD_BAJA_A_MEDIA = 240      # 4 horas
+THRESHOLD_MEDIA_A_ALTA = 120      # 2 horas
+THRESHOLD_ALTA_A_CRITICA = 60     # 1 hora
+
+# urgencia actual -> (nueva urgencia, umbral en minutos, razón)
+ESCALACIONES = {
+    'baja': ('media', THRESHOLD_BAJA_A_MEDIA, 'Escalado: >4 horas sin resolver'),
+    'media': ('alta', THRESHOLD_MEDIA_A_ALTA, 'Escalado: >2 horas sin resolver'),
+    'alta': ('critica', THRESHOLD_ALTA_A_CRITICA, 'Escalado a CRÍTICO: >1 hora sin resolver'),
+}
+
+SLA_AGENDA_URI = os.getenv(
+    'SLA_AGENDA_URI',
+    f"{ARTEFACTOS_URI.rstrip('/')}/sla/agenda.msgpack.z"
+)
+SLA_SINCRONIZACION = timedelta(minutes=int(os.getenv('SLA_SINCRONIZACION_MINUTES', '30')))
+
+VERSION_AGENDA = 1
+
+
+def evaluar_escalacion(urgencia_actual, tiempo_minutos):
+    """(nueva_urgencia, razon) si corresponde escalar, o (None, None)"""
+    escalacion = ESCALACIONES.get(urgencia_actual)
+    if escalacion is None:
+        return None, None
+    nueva_urgencia, umbral, razon = escalacion
+    if tiempo_minutos < umbral:
+        return None, None
+    return nueva_urgencia, f"{razon} (tiempo: {tiempo_minutos:.0f} min)"
+
+
+def vencimiento(fecha_creacion, urgencia):
+    """Instante en que un incidente con esa urgencia cruza su umbral (None si no escala más)"""
+    escalacion = ESCALACIONES.get(urgencia)
+    if escalacion is None:
+        return None
+    return parse_fecha(fecha_creacion) + timedelta(minutes=escalacion[1])
+
+
+class AgendaSLA:
+    """
+    Cola de prioridad de vencimientos por incidente.
+
+    `entradas` es la fuente de verdad ({incidenteId: [vencimiento_iso,
+    urgencia, fechaCreacion]}); el heap admite entradas obsoletas que se
+    descartan al extraerlas (invalidación perezosa).
+    """
+
+    def __init__(self, entradas=None, ultima_sincronizacion=None):
+        self.entradas = entradas or {}
+        self.ultima_sincronizacion = ultima_sincronizacion
+        self._heap = [(entrada[0], iid) for iid, entrada in self.entradas.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def programar(self, incidente_id, fecha_creacion, urgencia):
+        """Agenda (o reprograma) el próximo vencimiento del incidente"""
+        fecha = vencimiento(fecha_creacion, urgencia)
+        if fecha is None:
+            self.quitar(incidente_id)
+            return None
+        vence = fecha_iso(fecha)
+        self.entradas[incidente_id] = [vence, urgencia, fecha_creacion]
+        heapq.heappush(self._heap, (vence, incidente_id))
+        return vence
+
+    def quitar(self, incidente_id):
+        self.entradas.pop(incidente_id, None)
+
+    def _limpiar_tope(self):
+        while self._heap:
+            vence, iid = self._heap[0]
+            entrada = self.entradas.get(iid)
+            if entrada is not None and entrada[0] == vence:
+                return
+            heapq.heappop(self._heap)
+
+    def proximo(self):
+        """Vencimiento más próximo (ISO) o None si la agenda está vacía"""
+        self._limpiar_tope()
+        return self._heap[0][0] if self._heap else None
+
+    def extraer_vencidos(self, ahora):
+        """Quita y devuelve los incidenteId vencidos a `ahora`"""
+        limite = fecha_iso(ahora)
+        vencidos = []
+        while True:
+            self._limpiar_tope()
+            if not self._heap or self._heap[0][0] > limite:
+                return vencidos
+            _, iid = heapq.heappop(self._heap)
+            del self.entradas[iid]
+            vencidos.append(iid)
+
+    def sincronizar(self, incidentes_abiertos, ahora):
+        """Reemplaza la agenda con el estado actual de los incidentes abiertos"""
+        self.entradas = {}
+        self._heap = []
+        for inc in incidentes_abiertos:
+            self.programar(inc['incidenteId'], inc['fechaCreacion'], inc.get('urgencia', 'baja'))
+        self.ultima_sincronizacion = fecha_iso(ahora)
+
+    def proxima_sincronizacion(self, intervalo=None):
+        if self.ultima_sincronizacion is None:
+            return None
+        return parse_fecha(self.ultima_sincronizacion) + (intervalo or SLA_SINCRONIZACION)
+
+    def requiere_sincronizacion(self, ahora, intervalo=None):
+        proxima = self.proxima_sincronizacion(intervalo)
+        return proxima is None or proxima <= ahora
+
+    def proximo_despertar(self, ahora, intervalo=None):
+        """
+        Cuándo debe despertar el DAG: vencimiento más próximo o próxima
+        sincronización (cada `intervalo`, por defecto SLA_SINCRONIZACION)
+        """
+        candidatos = [self.proxima_sincronizacion(intervalo) or ahora]
+        if self.proximo():
+            candidatos.append(parse_fecha(self.proximo()))
+        return max(ahora, min(candidatos))
+
+
+def cargar_agenda(uri=None):
+    """Lee la agenda persistida o devuelve una vacía (fuerza sincronización)"""
+    uri = uri or SLA_AGENDA_URI
+    if not existe(uri):
+        return AgendaSLA()
+
+    datos = leer_artefacto(uri)
+    if datos.get('version') != VERSION_AGENDA:
+        print(f"⚠️ Agenda SLA con versión {datos.get('version')}, se reconstruye")
+        return AgendaSLA()
+    return AgendaSLA(datos['entradas'], datos['ultima_sincronizacion'])
+
+
+def guardar_agenda(agenda, uri=None):
+    """Persiste la agenda"""
+    base, _, nombre = (uri or SLA_AGENDA_URI).rpartition('/')
+    return guardar_artefacto(nombre, {
+        'version': VERSION_AGENDA,
+        'ultima_sincronizacion': agenda.ultima_sincronizacion,
+        'entradas': agenda.entradas,
+    }, base_uri=base)
@@ -0,0 +1,222 @@
+"""
+Envío SMTP con pool de conexiones
+Cada worker mantiene su propia conexión autenticada y envía en paralelo
+bajo un límite global de mensajes por segundo. Los errores transitorios
+reconectan y reintentan solo ese mensaje; una caída no aborta el lote.
+"""
+
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metricas import observar_llamada
+from utils.perezoso import modulo
+
+smtplib = modulo('smtplib')
+
+SMTP_POOL_CONEXIONES = int(os.getenv('SMTP_POOL_CONNECTIONS', '4'))
+# Mensajes por segundo en total (0 = sin límite)
+SMTP_MENSAJES_POR_SEGUNDO = float(os.getenv('SMTP_RATE_LIMIT_PER_SECOND', '10'))
+SMTP_REINTENTOS = int(os.getenv('SMTP_MAX_RETRIES', '3'))
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT_SECONDS', '30'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+
+
+class LimitadorTasa:
+    """Token bucket compartido entre hilos (capacidad de 1 segundo de ráfaga)"""
+
+    def __init__(self, por_segundo):
+        self.por_segundo = por_segundo
+        self.capacidad = max(1.0, por_segundo)
+        self.tokens = self.capacidad
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        if not self.por_segundo:
+            return
+        while True:
+            with self.lock:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.por_segundo)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.por_segundo
+            time.sleep(espera)
+
+
+def percentiles(valores, puntos=(50, 95, 99)):
+    """Percentiles (nearest-rank) de una lista de números"""
+    if not valores:
+        return {f"p{p}": 0 for p in puntos}
+    ordenados = sorted(valores)
+    return {
+        f"p{p}": ordenados[min(len(ordenados) - 1, max(0, -(-p * len(ordenados) // 100) - 1))]
+        for p in puntos
+    }
+
+
+class EnviadorSMTP:
+    """
+    Pool de conexiones SMTP con límite de tasa y reintentos por mensaje.
+
+    Uso:
+        enviador = EnviadorSMTP(host, puerto, usuario, password)
+        resumen = enviador.enviar(items, construir_mensaje)
+
+    `construir_mensaje(item)` devuelve el email.message.Message del item;
+    se llama en el momento del envío (los MIME se construyen bajo demanda).
+    """
+
+    def __init__(self, host, puerto, usuario=None, password=None, starttls=None,
+                 conexiones=None, mensajes_por_segundo=None, reintentos=None, timeout=None):
+        self.host = host
+        self.puerto = puerto
+        self.usuario = usuario
+        self.password = password
+        self.starttls = SMTP_STARTTLS if starttls is None else starttls
+        self.conexiones = max(1, int(conexiones or SMTP_POOL_CONEXIONES))
+        self.limitador = LimitadorTasa(SMTP_MENSAJES_POR_SEGUNDO if mensajes_por_segundo is None else mensajes_por_segundo)
+        self.reintentos = SMTP_REINTENTOS if reintentos is None else reintentos
+        self.timeout = timeout or SMTP_TIMEOUT
+
+        self._local = threading.local()
+        self._abiertas = []
+        self._lock = threading.Lock()
+        self._abortado = None
+        self._contadores = {'reintentos': 0, 'reconexiones': 0}
+
+    def _conectar(self):
+        server = smtplib.SMTP(self.host, self.puerto, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.usuario:
+                server.login(self.usuario, self.password)
+        except BaseException:
+            # Todavía no está en _abiertas: si no se cierra acá, el socket queda abierto
+            server.close()
+            raise
+        with self._lock:
+            self._abiertas.append(server)
+        return server
+
+    def _conexion(self):
+        server = getattr(self._local, 'server', None)
+        if server is None:
+            if getattr(self._local, 'conectada', False):
+                with self._lock:
+                    self._contadores['reconexiones'] += 1
+            server = self._local.server = self._conectar()
+            self._local.conectada = True
+        return server
+
+    def _descartar_conexion(self):
+        server = getattr(self._local, 'server', None)
+        self._local.server = None
+        if server is not None:
+            with self._lock:
+                if server in self._abiertas:
+                    self._abiertas.remove(server)
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _enviar_uno(self, item, construir_mensaje):
+        inicio = time.perf_counter()
+        ultimo_error = None
+
+        for intento in range(self.reintentos + 1):
+            if self._abortado:
+                return item, False, self._abortado, time.perf_counter() - inicio
+            if intento:
+                with self._lock:
+                    self._contadores['reintentos'] += 1
+                time.sleep(min(0.5 * 2 ** (intento - 1), 5))
+
+            self.limitador.esperar()
+            try:
+                server = self._conexion()
+                mensaje = construir_mensaje(item)
+                envio = time.perf_counter()
+                server.send_message(mensaje)
+                observar_llamada('smtp', 'send_message', time.perf_counter() - envio)
+                return item, True, None, time.perf_counter() - inicio
+            except smtplib.SMTPAuthenticationError as e:
+                # Credenciales inválidas: ningún otro mensaje va a salir
+                self._abortado = f"Autenticación SMTP fallida: {e}"
+                self._descartar_conexion()
+                return item, False, self._abortado, time.perf_counter() - inicio
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.error) as e:
+                # Transitorios: vale la pena reconectar y reintentar
+                ultimo_error = e
+                self._descartar_conexion()
+            except smtplib.SMTPResponseException as e:
+                ultimo_error = e
+                if e.smtp_code >= 500:
+                    # Rechazo permanente (destinatario inválido, etc.): no se reintenta
+                    break
+                self._descartar_conexion()
+            except smtplib.SMTPRecipientsRefused as e:
+                ultimo_error = e
+                break
+            except smtplib.SMTPException as e:
+                ultimo_error = e
+                self._descartar_conexion()
+            except Exception as e:
+                # Error armando el mensaje: reintentar no lo arregla
+                ultimo_error = e
+                break
+
+        return item, False, str(ultimo_error), time.perf_counter() - inicio
+
+    def enviar(self, items, construir_mensaje):
+        """
+        Envía todos los items y devuelve un resumen con los enviados, los
+        fallidos, throughput y percentiles de latencia (ms por mensaje).
+        """
+        items = list(items)
+        self._abortado = None
+        self._contadores = {'reintentos': 0, 'reconexiones': 0}
+        inicio = time.perf_counter()
+        workers = max(1, min(self.conexiones, len(items)))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                resultados = list(executor.map(lambda item: self._enviar_uno(item, construir_mensaje), items))
+        finally:
+            self.cerrar()
+
+        duracion = time.perf_counter() - inicio
+        enviados = [item for item, ok, _, _ in resultados if ok]
+        fallidos = [{'item': item, 'error': error} for item, ok, error, _ in resultados if not ok]
+        latencias = [round(latencia * 1000, 2) for _, ok, _, latencia in resultados if ok]
+
+        return {
+            'enviados': enviados,
+            'fallidos': fallidos,
+            'total': len(items),
+            'duracion_s': round(duracion, 3),
+            'por_segundo': round(len(enviados) / duracion, 1) if duracion > 0 else len(enviados),
+            'latencia_ms': {**percentiles(latencias), 'max': max(latencias, default=0)},
+            'conexiones': workers,
+            **self._contadores,
+        }
+
+    def cerrar(self):
+        """Cierra todas las conexiones abiertas del pool"""
+        with self._lock:
+            abiertas, self._abiertas = self._abiertas, []
+        for server in abiertas:
+            try:
+                server.quit()
+            except Exception:
+                try:
+                    server.close()
+                except Exception:
+                    pass
@@ -0,0 +1,275 @@
+"""
+Snapshots columnares de los reportes
+Cada corrida de generar_reportes deja, además del JSON del reporte, dos
+tablas particionadas por fecha (UTC) del reporte:
+
+    <REPORTES_SNAPSHOT_URI>/incidentes/year=YYYY/month=MM/day=DD/<corrida>.parquet
+    <REPORTES_SNAPSHOT_URI>/metricas/year=YYYY/month=MM/day=DD/<corrida>.parquet
+
+- incidentes: los incidentes analizados (sin descripción ni usuario) con su
+  tiempo de resolución ya calculado.
+- metricas: formato largo (ventana, metrica, dimension, valor) con conteos
+  por tipo, estado y zona, tasa de resolución y percentiles por
+  tipo/urgencia, para el reporte principal y cada ventana.
+
+Se escriben en Parquet (zstd) si pyarrow está instalado y si no en NDJSON
+con gzip; la lectura entiende ambos. Los análisis de mes contra mes leen
+unos pocos MB de estas particiones en lugar de escanear DynamoDB.
+
+Con un S3 local (MinIO, LocalStack, moto) basta apuntar
+AWS_ENDPOINT_URL_S3 al endpoint. Desde airflow/dags:
+    python -m utils.snapshots incidentes --desde 2026-09-01 --hasta 2026-10-01
+"""
+
+import gzip
+import io
+import json
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from utils.artefactos import guardar_bytes, leer_bytes, listar
+from utils.fechas import ahora_utc, parse_fecha
+from utils.rollup import fecha_resolucion
+
+REPORTES_SNAPSHOT_URI = os.getenv(
+    'REPORTES_SNAPSHOT_URI',
+    f"s3://{os.getenv('S3_BUCKET_REPORTES', 'alerta-utec-reportes')}/snapshots"
+)
+# 'parquet' (requiere pyarrow; si falta se usa NDJSON) o 'ndjson'
+REPORTES_SNAPSHOT_FORMATO = os.getenv('REPORTES_SNAPSHOT_FORMATO', 'parquet').lower()
+
+EXTENSIONES = {'parquet': '.parquet', 'ndjson': '.ndjson.gz'}
+
+# Columnas por tabla: (nombre, tipo) con tipo en string/int/float/fecha
+ESQUEMAS = {
+    'incidentes': (
+        ('incidenteId', 'string'),
+        ('tipo', 'string'),
+        ('ubicacion', 'string'),
+        ('area', 'string'),
+        ('urgencia', 'string'),
+        ('estado', 'string'),
+        ('fechaCreacion', 'fecha'),
+        ('fechaActualizacion', 'fecha'),
+        ('fechaResolucion', 'fecha'),
+        ('minutosResolucion', 'float'),
+        ('totalEventos', 'int'),
+        ('fechaSnapshot', 'fecha'),
+    ),
+    'metricas': (
+        ('ventana', 'string'),
+        ('metrica', 'string'),
+        ('dimension', 'string'),
+        ('valor', 'float'),
+        ('fechaSnapshot', 'fecha'),
+    ),
+}
+
+
+def _fecha(valor):
+    return parse_fecha(valor) if valor else None
+
+
+def _numero(valor, tipo):
+    if valor is None:
+        return None
+    return int(valor) if tipo is int else float(valor)
+
+
+def filas_incidentes(incidentes, fecha_snapshot):
+    """Filas planas de la tabla `incidentes`"""
+    filas = []
+    for inc in incidentes:
+        creacion = parse_fecha(inc['fechaCreacion'])
+        resolucion = fecha_resolucion(inc) if inc.get('estado') == 'resuelto' else None
+        filas.append({
+            'incidenteId': inc['incidenteId'],
+            'tipo': inc.get('tipo'),
+            'ubicacion': inc.get('ubicacion'),
+            'area': inc.get('area'),
+            'urgencia': inc.get('urgencia'),
+            'estado': inc.get('estado'),
+            'fechaCreacion': creacion,
+            'fechaActualizacion': _fecha(inc.get('fechaActualizacion')),
+            'fechaResolucion': resolucion,
+            'minutosResolucion': (resolucion - creacion).total_seconds() / 60 if resolucion else None,
+            'totalEventos': _numero(inc.get('totalEventos'), int),
+            'fechaSnapshot': fecha_snapshot,
+        })
+    return filas
+
+
+def filas_metricas(reporte, fecha_snapshot, ventana='reporte'):
+    """
+    Métricas del reporte en formato largo (ventana, metrica, dimension,
+    valor), incluidas las de `reporte['ventanas']`
+    """
+    detalle = reporte['analisis_detallado']
+    filas = []
+
+    def agregar(metrica, valor, dimension=''):
+        if valor is not None:
+            filas.append({
+                'ventana': ventana,
+                'metrica': metrica,
+                'dimension': dimension,
+                'valor': float(valor),
+                'fechaSnapshot': fecha_snapshot
+            })
+
+    agregar('incidentes', detalle['por_tipo']['total'])
+    for tipo, cantidad in detalle['por_tipo']['por_tipo'].items():
+        agregar('incidentes', cantidad, f"tipo={tipo}")
+    for estado, cantidad in detalle['estados']['por_estado'].items():
+        agregar('incidentes', cantidad, f"estado={estado}")
+    for zona in detalle['por_ubicacion']['zonas_criticas']:
+        agregar('incidentes', zona['incidentes'], f"ubicacion={zona['ubicacion']}")
+        # Solo si el conteo viene de un TopK desbordado (el real es incidentes - error o más)
+        agregar('sobreconteo_max', zona.get('error') or None, f"ubicacion={zona['ubicacion']}")
+    agregar('tasa_resolucion', detalle['estados']['tasa_resolucion'])
+
+    tiempos = detalle['tiempos']
+    agregar('resueltos', tiempos['total_resueltos'])
+    agregar('tiempo_promedio_min', tiempos['tiempo_promedio_min'])
+    for percentil, valor in (tiempos.get('percentiles_min') or {}).items():
+        agregar(f"tiempo_{percentil}_min", valor)
+    for campo in ('tipo', 'urgencia'):
+        for valor_dimension, resumen in (tiempos.get(f"por_{campo}") or {}).items():
+            for clave in ('n', 'p50', 'p90', 'p99'):
+                metrica = 'resueltos' if clave == 'n' else f"tiempo_{clave}_min"
+                agregar(metrica, resumen[clave], f"{campo}={valor_dimension}")
+
+    for nombre, reporte_ventana in (reporte.get('ventanas') or {}).items():
+        filas.extend(filas_metricas(reporte_ventana, fecha_snapshot, ventana=nombre))
+    return filas
+
+
+def _serializar_parquet(filas, esquema):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64(), 'fecha': pa.timestamp('ms')}
+    schema = pa.schema([(nombre, tipos[tipo]) for nombre, tipo in esquema])
+    tabla = pa.Table.from_pylist(filas, schema=schema)
+    buffer = io.BytesIO()
+    pq.write_table(tabla, buffer, compression='zstd', use_dictionary=True)
+    return buffer.getvalue()
+
+
+def _serializar_ndjson(filas):
+    def convertir(valor):
+        if isinstance(valor, datetime):
+            return valor.isoformat()
+        if isinstance(valor, Decimal):
+            return float(valor)
+        return valor
+
+    lineas = (
+        json.dumps({k: convertir(v) for k, v in fila.items()}, ensure_ascii=False, separators=(',', ':'))
+        for fila in filas
+    )
+    return gzip.compress('\n'.join(lineas).encode('utf-8'), 6)
+
+
+def formato_efectivo(formato=None):
+    """El formato pedido, o NDJSON si se pidió Parquet y pyarrow no está instalado"""
+    formato = formato or REPORTES_SNAPSHOT_FORMATO
+    if formato == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            print("⚠️ pyarrow no está instalado, snapshots en NDJSON (gzip)")
+            return 'ndjson'
+    if formato not in EXTENSIONES:
+        raise ValueError(f"Formato de snapshot desconocido: {formato}")
+    return formato
+
+
+def particion(fecha):
+    """Ruta de la partición diaria de una fecha"""
+    return f"year={fecha:%Y}/month={fecha:%m}/day={fecha:%d}"
+
+
+def guardar_tabla(tabla, filas, fecha, nombre, base_uri=None, formato=None):
+    """Escribe las filas de `tabla` en la partición de `fecha`; devuelve la URI"""
+    formato = formato_efectivo(formato)
+    if formato == 'parquet':
+        data = _serializar_parquet(filas, ESQUEMAS[tabla])
+    else:
+        data = _serializar_ndjson(filas)
+    ruta = f"{tabla}/{particion(fecha)}/{nombre}{EXTENSIONES[formato]}"
+    return guardar_bytes(ruta, data, base_uri or REPORTES_SNAPSHOT_URI)
+
+
+def guardar_snapshot(reporte, incidentes, fecha=None, base_uri=None, formato=None):
+    """Escribe las tablas `incidentes` y `metricas` de una corrida del reporte"""
+    # En UTC, como fechaCreacion: la partición del día no depende de la zona del servidor
+    fecha = fecha or ahora_utc()
+    formato = formato_efectivo(formato)
+    nombre = f"reporte-{fecha:%Y%m%dT%H%M%S}"
+    return {
+        'incidentes': guardar_tabla('incidentes', filas_incidentes(incidentes, fecha), fecha, nombre, base_uri, formato),
+        'metricas': guardar_tabla('metricas', filas_metricas(reporte, fecha), fecha, nombre, base_uri, formato),
+    }
+
+
+def _leer_archivo(uri, esquema):
+    data = leer_bytes(uri)
+    if uri.endswith(EXTENSIONES['parquet']):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(io.BytesIO(data)).to_pylist()
+
+    fechas = [nombre for nombre, tipo in esquema if tipo == 'fecha']
+    filas = []
+    for linea in gzip.decompress(data).decode('utf-8').splitlines():
+        fila = json.loads(linea)
+        for nombre in fechas:
+            if fila.get(nombre):
+                fila[nombre] = datetime.fromisoformat(fila[nombre])
+        filas.append(fila)
+    return filas
+
+
+def leer_tabla(tabla, desde, hasta, base_uri=None, ultimo_por=None):
+    """
+    Filas de `tabla` en las particiones de los días [desde, hasta). Con
+    `ultimo_por` (p. ej. 'incidenteId') se queda con la versión del snapshot
+    más reciente de cada clave, ya que las ventanas de corridas sucesivas se
+    solapan.
+    """
+    base = (base_uri or REPORTES_SNAPSHOT_URI).rstrip('/')
+    filas = []
+    dia = datetime(desde.year, desde.month, desde.day)
+    while dia < hasta:
+        for uri in listar(f"{base}/{tabla}/{particion(dia)}/"):
+            if uri.endswith(tuple(EXTENSIONES.values())):
+                filas.extend(_leer_archivo(uri, ESQUEMAS[tabla]))
+        dia += timedelta(days=1)
+
+    if ultimo_por is None:
+        return filas
+    ultimas = {}
+    for fila in sorted(filas, key=lambda f: f['fechaSnapshot']):
+        ultimas[fila[ultimo_por]] = fila
+    return list(ultimas.values())
+
+
+if __name__ == '__main__':
+    import argparse
+    from collections import Counter
+
+    parser = argparse.ArgumentParser(description='Lectura de los snapshots de reportes')
+    parser.add_argument('tabla', choices=sorted(ESQUEMAS))
+    parser.add_argument('--desde', required=True, type=datetime.fromisoformat)
+    parser.add_argument('--hasta', required=True, type=datetime.fromisoformat)
+    parser.add_argument('--uri', default=None, help='Base de los snapshots (por defecto REPORTES_SNAPSHOT_URI)')
+    args = parser.parse_args()
+
+    filas = leer_tabla(args.tabla, args.desde, args.hasta, args.uri,
+                       ultimo_por='incidenteId' if args.tabla == 'incidentes' else None)
+    print(f"📦 {len(filas)} filas de {args.tabla} entre {args.desde:%Y-%m-%d} y {args.hasta:%Y-%m-%d}")
+    if args.tabla == 'incidentes':
+        for tipo, cantidad in Counter(f['tipo'] for f in filas).most_common(10):
+            print(f"  {tipo}: {cantidad}")
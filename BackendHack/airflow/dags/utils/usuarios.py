@@ -0,0 +1,172 @@
+"""
+Usuarios autoridad por área
+Consulta el GSI AreaIndex de la tabla Usuarios (un query por área, en
+paralelo) en lugar de escanear la tabla completa, y cachea el resultado
+(área → usuarios autoridad) en memoria del proceso y en un artefacto con TTL.
+
+Las entradas guardan el sello de versión vigente al consultarlas; al
+cambiar el sello (p. ej. tras dar de alta autoridades) se descartan todas.
+Invalidar la caché, desde airflow/dags:
+    python -m utils.usuarios --invalidar
+
+El sello solo cambia con `--invalidar`: las altas de la API (Lambda
+register; no hay Lambda que cambie rol o área) no lo tocan, así que un
+usuario nuevo o cambiado en la tabla se ve recién cuando vence la entrada
+de su área, hasta USUARIOS_CACHE_TTL_SECONDS después.
+"""
+
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from utils.artefactos import ARTEFACTOS_URI, existe, guardar_artefacto, leer_artefacto
+from utils.dynamo import WRITE_WORKERS, query_paginado
+from utils.fechas import ahora_utc, fecha_iso, parse_fecha
+
+DYNAMODB_TABLE_USUARIOS = os.getenv('DYNAMODB_TABLE_USUARIOS', 'Usuarios')
+AREA_INDEX = 'AreaIndex'
+
+USUARIOS_CACHE_URI = os.getenv(
+    'USUARIOS_CACHE_URI',
+    f"{ARTEFACTOS_URI.rstrip('/')}/usuarios"
+)
+# Segundos de validez de cada área en caché (0 = sin caché)
+USUARIOS_CACHE_TTL = int(os.getenv('USUARIOS_CACHE_TTL_SECONDS', '600'))
+
+VERSION_CACHE = 1
+
+# Caché del proceso: {area: {'sello', 'fecha', 'usuarios'}}
+_memoria = {}
+
+
+def _uris(uri):
+    base = (uri or USUARIOS_CACHE_URI).rstrip('/')
+    return f"{base}/sello.msgpack.z", f"{base}/autoridades.msgpack.z"
+
+
+def _guardar(destino, valor):
+    base, _, nombre = destino.rpartition('/')
+    guardar_artefacto(nombre, valor, base_uri=base)
+
+
+def sello_actual(uri=None):
+    """Sello de versión vigente de la caché (None si nunca se invalidó)"""
+    uri_sello, _ = _uris(uri)
+    return leer_artefacto(uri_sello) if existe(uri_sello) else None
+
+
+def invalidar(uri=None):
+    """Cambia el sello de versión: todas las entradas cacheadas quedan obsoletas"""
+    uri_sello, _ = _uris(uri)
+    sello = uuid.uuid4().hex
+    _guardar(uri_sello, sello)
+    _memoria.clear()
+    return sello
+
+
+def _cargar_cache(uri):
+    _, uri_cache = _uris(uri)
+    if not existe(uri_cache):
+        return {}
+    cache = leer_artefacto(uri_cache)
+    if cache.get('version') != VERSION_CACHE:
+        return {}
+    return cache['areas']
+
+
+def _vigente(entrada, sello, limite):
+    return (
+        entrada is not None
+        and entrada['sello'] == sello
+        and parse_fecha(entrada['fecha']) > limite
+    )
+
+
+def consultar_autoridades(table, area):
+    """Usuarios con rol 'autoridad' de un área vía AreaIndex (todas las páginas)"""
+    return list(query_paginado(
+        table,
+        IndexName=AREA_INDEX,
+        KeyConditionExpression='area = :area',
+        FilterExpression='rol = :rol',
+        ExpressionAttributeValues={':area': area, ':rol': 'autoridad'}
+    ))
+
+
+def autoridades_por_area(table, areas, ttl=None, uri=None):
+    """
+    Devuelve ({area: usuarios autoridad}, errores) para las áreas pedidas.
+
+    Las áreas vigentes en caché (mismo sello y dentro del TTL) no se
+    consultan; el resto se consulta en paralelo sobre AreaIndex. Un área que
+    falla queda en `errores` ({area: mensaje}) y no se cachea.
+    """
+    ttl = USUARIOS_CACHE_TTL if ttl is None else ttl
+    ahora = ahora_utc()
+    limite = ahora - timedelta(seconds=ttl)
+    areas = list(dict.fromkeys(areas))
+
+    sello = sello_actual(uri) if ttl > 0 else None
+    cache = {}
+    if ttl > 0:
+        cache = _cargar_cache(uri)
+        for area, entrada in _memoria.items():
+            if _vigente(entrada, sello, limite):
+                cache[area] = entrada
+
+    resultado = {}
+    faltantes = []
+    for area in areas:
+        entrada = cache.get(area)
+        if ttl > 0 and _vigente(entrada, sello, limite):
+            resultado[area] = entrada['usuarios']
+        else:
+            faltantes.append(area)
+
+    errores = {}
+    if faltantes:
+        def consultar(area):
+            try:
+                return area, consultar_autoridades(table, area), None
+            except Exception as e:
+                return area, None, str(e)
+
+        workers = max(1, min(WRITE_WORKERS, len(faltantes)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            consultas = list(executor.map(consultar, faltantes))
+
+        fecha = fecha_iso(ahora)
+        for area, usuarios, error in consultas:
+            if error is not None:
+                errores[area] = error
+                continue
+            resultado[area] = usuarios
+            cache[area] = {'sello': sello, 'fecha': fecha, 'usuarios': usuarios}
+
+        if ttl > 0:
+            # Solo se persisten entradas vigentes
+            cache = {area: entrada for area, entrada in cache.items() if _vigente(entrada, sello, limite)}
+            _, uri_cache = _uris(uri)
+            _guardar(uri_cache, {'version': VERSION_CACHE, 'areas': cache})
+
+    if ttl > 0:
+        _memoria.update(cache)
+
+    print(f"👥 Autoridades: {len(areas) - len(faltantes)} áreas desde caché, "
+          f"{len(faltantes)} consultadas en {AREA_INDEX}")
+    return resultado, errores
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Caché de usuarios autoridad por área')
+    parser.add_argument('--invalidar', action='store_true', help='Descarta todas las entradas cacheadas')
+    parser.add_argument('--uri', default=None, help='Ubicación de la caché (por defecto USUARIOS_CACHE_URI)')
+    args = parser.parse_args()
+
+    if not args.invalidar:
+        parser.error('Indica --invalidar')
+
+    print(f"✅ Caché de autoridades invalidada (sello {invalidar(args.uri)})")
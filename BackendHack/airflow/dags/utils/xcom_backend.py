@@ -0,0 +1,139 @@
+"""
+Backend de XCom con artefactos externos
+Los valores que superan el umbral se guardan como msgpack comprimido en disco
+o S3 bajo {utils.artefactos.ARTEFACTOS_URI}/xcom/ (XCOM_ARTEFACTOS_URI) y en
+la base de metadatos solo queda la referencia. Los valores chicos, o con tipos que
+msgpack no representa, se guardan como siempre (BaseXCom).
+
+Los artefactos se borran cuando Airflow borra el XCom (limpiar o reintentar
+la tarea, `purge`) y, como `airflow db clean` borra filas sin avisar al
+backend, el DAG purgar_artefactos_xcom elimina además los de más de
+XCOM_RETENCION_DIAS días.
+
+Activar con:
+    AIRFLOW__CORE__XCOM_BACKEND=utils.xcom_backend.XComArtefactos
+"""
+
+import os
+import zlib
+from datetime import timedelta
+
+from airflow.models.xcom import BaseXCom
+
+from utils.artefactos import ARTEFACTOS_URI, borrar, guardar_bytes, leer_artefacto, listar_vencidos, serializar
+from utils.fechas import ahora_utc
+from utils.metricas import registrar_xcom
+
+# Tamaño (bytes msgpack) a partir del cual el valor sale de la base de metadatos
+XCOM_UMBRAL_BYTES = int(os.getenv('XCOM_UMBRAL_BYTES', str(64 * 1024)))
+# Días que se conservan los artefactos de XCom (0 = no se purgan por antigüedad)
+XCOM_RETENCION_DIAS = int(os.getenv('XCOM_RETENCION_DIAS', '7'))
+
+CLAVE_REFERENCIA = '__xcom_artefacto__'
+PREFIJO_XCOM = 'xcom'
+
+# (valor, msgpack, serializado) del return_value medido por @instrumentar,
+# que serialize_value reutiliza en el push de PythonOperator (ver `medir_retorno`)
+_retorno = None
+
+
+def _referencia(value):
+    if isinstance(value, dict) and CLAVE_REFERENCIA in value:
+        return value[CLAVE_REFERENCIA]
+    return None
+
+
+def _msgpack(value):
+    try:
+        return serializar(value)
+    except (TypeError, ValueError, OverflowError):
+        # Tipos que msgpack no representa: los serializa BaseXCom, como sin este backend
+        return None
+
+
+def medir_retorno(value):
+    """
+    Bytes que registrará serialize_value para el return_value `value`.
+    PythonOperator lo sube después de @instrumentar, cuando las métricas ya
+    se publicaron: la serialización queda guardada y el push la reutiliza,
+    así el valor se serializa una sola vez.
+    """
+    global _retorno
+    data = _msgpack(value)
+    if data is not None and len(data) > XCOM_UMBRAL_BYTES:
+        _retorno = (value, data, None)
+        return len(data)
+    serializado = BaseXCom.serialize_value(value)
+    _retorno = (value, data, serializado)
+    return len(serializado)
+
+
+class XComArtefactos(BaseXCom):
+    """XCom que desvía los payloads grandes a artefactos externos"""
+
+    @staticmethod
+    def serialize_value(value, *, key=None, task_id=None, dag_id=None, run_id=None, map_index=None, **kwargs):
+        global _retorno
+        if _retorno is not None and _retorno[0] is value:
+            # Ya serializado (y contado) por `medir_retorno`
+            _, data, serializado = _retorno
+            _retorno = None
+        else:
+            data, serializado = _msgpack(value), None
+
+        desviado = data is not None and len(data) > XCOM_UMBRAL_BYTES and dag_id and run_id
+        if desviado:
+            sufijo = f"_{map_index}" if map_index is not None and map_index >= 0 else ''
+            ruta = f"{PREFIJO_XCOM}/{dag_id}/{run_id}/{task_id}{sufijo}/{key}.msgpack.z"
+            uri = guardar_bytes(ruta, zlib.compress(data, 6))
+            value = {CLAVE_REFERENCIA: uri, 'bytes': len(data)}
+            serializado = None
+
+        if serializado is None:
+            serializado = BaseXCom.serialize_value(
+                value, key=key, task_id=task_id, dag_id=dag_id, run_id=run_id, map_index=map_index
+            )
+        registrar_xcom(len(data) if desviado else len(serializado))
+        return serializado
+
+    @staticmethod
+    def deserialize_value(result):
+        value = BaseXCom.deserialize_value(result)
+
+        uri = _referencia(value)
+        if uri is not None:
+            return leer_artefacto(uri)
+        return value
+
+    def orm_deserialize_value(self):
+        # La UI muestra solo la referencia, sin descargar el artefacto
+        value = BaseXCom._deserialize_value(self, True)
+        if _referencia(value) is not None:
+            return f"{value[CLAVE_REFERENCIA]} ({value['bytes']} bytes)"
+        return value
+
+    @staticmethod
+    def purge(xcom, session=None):
+        """Borra el artefacto de un XCom que Airflow está por eliminar"""
+        uri = _referencia(BaseXCom._deserialize_value(xcom, True))
+        if uri is not None:
+            borrar(uri)
+
+
+def purgar_vencidos(dias=None, base_uri=None):
+    """Borra los artefactos de XCom de más de `dias` días; devuelve cuántos"""
+    dias = XCOM_RETENCION_DIAS if dias is None else dias
+    if dias <= 0:
+        return 0
+
+    prefijo = f"{(base_uri or ARTEFACTOS_URI).rstrip('/')}/{PREFIJO_XCOM}/"
+    vencidos = listar_vencidos(prefijo, ahora_utc() - timedelta(days=dias))
+    for uri in vencidos:
+        borrar(uri)
+
+    if not prefijo.startswith('s3://') and os.path.isdir(prefijo):
+        # Directorios de corridas que quedaron vacíos
+        for directorio, _, _ in os.walk(prefijo, topdown=False):
+            if directorio.rstrip('/') != prefijo.rstrip('/') and not os.listdir(directorio):
+                os.rmdir(directorio)
+    return len(vencidos)
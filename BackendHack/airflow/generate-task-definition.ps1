@@ -101,6 +101,14 @@ foreach ($key in $envVars.Keys) {
     $templateContent = $templateContent -replace [regex]::Escape($placeholder), $value
 }
 
+# Verificar que no quedaron placeholders sin valor (variables nuevas que faltan en .env)
+$pendientes = [regex]::Matches($templateContent, '\$\{([A-Za-z0-9_]+)\}') | ForEach-Object { $_.Groups[1].Value } | Sort-Object -Unique
+if ($pendientes) {
+    Write-Host "Error: Faltan las siguientes variables en .env (ver .env.example):" -ForegroundColor Red
+    $pendientes | ForEach-Object { Write-Host "   - $_" -ForegroundColor Red }
+    exit 1
+}
+
 # Guardar el resultado
 $templateContent | Set-Content $OutputFile -Encoding UTF8
 
@@ -0,0 +1,83 @@
+"""
+Configuración común de los tests
+Los módulos de dags/ se importan como los importa Airflow (dags/ en
+sys.path) y los datos sintéticos salen de benchmarks/datos_sinteticos.py.
+
+Los tests con DynamoDB, Streams o S3 usan moto (fixture `aws`), sin red.
+
+Desde airflow/:
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DAGS = os.path.join(RAIZ, 'dags')
+BENCHMARKS = os.path.join(RAIZ, 'benchmarks')
+sys.path.insert(0, DAGS)
+sys.path.insert(0, BENCHMARKS)
+
+AHORA = datetime(2025, 11, 20, 12)
+
+
+@pytest.fixture(scope='session')
+def incidentes():
+    """20k incidentes sintéticos de los últimos 90 días hasta AHORA"""
+    from datos_sinteticos import generar_incidentes
+
+    return generar_incidentes(20_000, AHORA)[0]
+
+
+@pytest.fixture
+def artefactos(monkeypatch, tmp_path):
+    """ARTEFACTOS_URI en un directorio temporal"""
+    monkeypatch.setattr('utils.artefactos.ARTEFACTOS_URI', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """AWS simulado con moto; los clientes de utils.aws se crean dentro del mock"""
+    from moto import mock_aws
+
+    from utils import aws as utils_aws
+
+    for variable in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN'):
+        monkeypatch.setenv(variable, 'pruebas')
+    monkeypatch.delenv('AWS_ENDPOINT_URL_S3', raising=False)
+    with mock_aws():
+        utils_aws.reset_clientes()
+        yield utils_aws.get_dynamodb_resource()
+    utils_aws.reset_clientes()
+
+
+def crear_tabla(resource, nombre, clave, orden=None, stream=False, abiertos=False):
+    """
+    Tabla on-demand con clave de partición `clave` (y de orden `orden`); con
+    `abiertos`, el índice disperso AbiertosIndex de serverless.yml
+    """
+    esquema = [{'AttributeName': clave, 'KeyType': 'HASH'}]
+    if orden:
+        esquema.append({'AttributeName': orden, 'KeyType': 'RANGE'})
+    atributos = {a['AttributeName'] for a in esquema}
+    kwargs = {}
+    if stream:
+        kwargs['StreamSpecification'] = {'StreamEnabled': True, 'StreamViewType': 'NEW_IMAGE'}
+    if abiertos:
+        indice = [{'AttributeName': 'colaAbierta', 'KeyType': 'HASH'},
+                  {'AttributeName': 'fechaCreacion', 'KeyType': 'RANGE'}]
+        atributos.update(a['AttributeName'] for a in indice)
+        kwargs['GlobalSecondaryIndexes'] = [
+            {'IndexName': 'AbiertosIndex', 'KeySchema': indice, 'Projection': {'ProjectionType': 'ALL'}}
+        ]
+    return resource.create_table(
+        TableName=nombre,
+        KeySchema=esquema,
+        AttributeDefinitions=[{'AttributeName': a, 'AttributeType': 'S'} for a in sorted(atributos)],
+        BillingMode='PAY_PER_REQUEST',
+        **kwargs,
+    )
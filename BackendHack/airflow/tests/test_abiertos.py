@@ -0,0 +1,87 @@
+"""Incidentes abiertos: query por AbiertosIndex y scan de respaldo sin índice (moto)"""
+
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import crear_tabla
+from utils.abiertos import backfill, incidentes_abiertos
+
+# incidenteId -> (estado, urgencia)
+INCIDENTES = {
+    'a': ('pendiente', 'alta'),
+    'b': ('en_atencion', 'critica'),
+    'c': ('pendiente', 'baja'),
+    'd': ('resuelto', 'alta'),
+    'e': ('cancelado', 'critica'),
+}
+
+
+class TablaSinIndice:
+    """
+    Tabla de moto cuyo query responde como DynamoDB cuando el índice no
+    existe (moto responde ResourceNotFoundException en su lugar)
+    """
+
+    def __init__(self, table, error='ValidationException',
+                 mensaje='The table does not have the specified index: AbiertosIndex'):
+        self._table = table
+        self._error = {'Error': {'Code': error, 'Message': mensaje}}
+        self.queries = 0
+
+    def query(self, **kwargs):
+        self.queries += 1
+        raise ClientError(self._error, 'Query')
+
+    def __getattr__(self, nombre):
+        return getattr(self._table, nombre)
+
+
+def _tabla(aws, abiertos, marcar=True):
+    tabla = crear_tabla(aws, 'Incidentes', 'incidenteId', abiertos=abiertos)
+    for iid, (estado, urgencia) in INCIDENTES.items():
+        item = {'incidenteId': iid, 'estado': estado, 'urgencia': urgencia, 'fechaCreacion': '2025-11-20T12:00:00.000Z'}
+        if marcar and estado not in ('resuelto', 'cancelado'):
+            item['colaAbierta'] = urgencia
+        tabla.put_item(Item=item)
+    return tabla
+
+
+def _ids(incidentes):
+    return sorted(inc['incidenteId'] for inc in incidentes)
+
+
+def test_query_por_indice(aws):
+    tabla = _tabla(aws, abiertos=True)
+
+    assert _ids(incidentes_abiertos(tabla)) == ['a', 'b', 'c']
+    assert _ids(incidentes_abiertos(tabla, ('alta', 'critica'))) == ['a', 'b']
+
+
+def test_sin_indice_usa_scan_con_el_mismo_resultado(aws):
+    tabla = TablaSinIndice(_tabla(aws, abiertos=False, marcar=False))
+
+    assert _ids(incidentes_abiertos(tabla)) == ['a', 'b', 'c']
+    assert _ids(incidentes_abiertos(tabla, ('alta', 'critica'))) == ['a', 'b']
+    assert tabla.queries > 0
+
+
+@pytest.mark.parametrize('error, mensaje', [
+    ('ProvisionedThroughputExceededException', 'Rate exceeded'),
+    ('ValidationException', 'Invalid KeyConditionExpression'),
+])
+def test_otros_errores_no_caen_al_scan(aws, error, mensaje):
+    tabla = TablaSinIndice(_tabla(aws, abiertos=False), error, mensaje)
+
+    with pytest.raises(ClientError):
+        incidentes_abiertos(tabla)
+
+
+def test_backfill_marca_y_desmarca(aws):
+    tabla = _tabla(aws, abiertos=True, marcar=False)
+    tabla.put_item(Item={'incidenteId': 'f', 'estado': 'resuelto', 'urgencia': 'media', 'colaAbierta': 'media',
+                         'fechaCreacion': '2025-11-20T12:00:00.000Z'})
+
+    assert backfill(tabla) == (3, 1)
+    assert _ids(incidentes_abiertos(tabla)) == ['a', 'b', 'c']
+    # Idempotente
+    assert backfill(tabla) == (0, 0)
@@ -0,0 +1,133 @@
+"""Consumo de DynamoDB Streams: páginas de un shard y snapshot de abiertos (moto)"""
+
+import pytest
+
+import utils.cambios
+from conftest import crear_tabla
+from utils.cambios import FuenteDynamoStreams, actualizar_snapshot, cargar_snapshot
+
+
+def _registro(secuencia, incidente_id):
+    return {
+        'eventName': 'MODIFY',
+        'dynamodb': {
+            'SequenceNumber': secuencia,
+            'Keys': {'incidenteId': incidente_id},
+            'NewImage': {'incidenteId': incidente_id},
+        },
+    }
+
+
+class ClienteGuionado:
+    """GetRecords que devuelve las páginas dadas; None como página = shard cerrado"""
+
+    def __init__(self, paginas, extra=None):
+        self.paginas = paginas
+        self.extra = extra or {}
+        self.llamadas = 0
+
+    def get_shard_iterator(self, **kwargs):
+        return {'ShardIterator': 0}
+
+    def get_records(self, ShardIterator, Limit):
+        self.llamadas += 1
+        if ShardIterator >= len(self.paginas):
+            return {'Records': [], 'NextShardIterator': ShardIterator + 1, **self.extra}
+        pagina = self.paginas[ShardIterator]
+        if pagina is None:
+            return {'Records': []}
+        return {'Records': pagina, 'NextShardIterator': ShardIterator + 1, **self.extra}
+
+
+def _leer(cliente):
+    entrada = {'secuencia': None, 'cerrado': False}
+    fuente = FuenteDynamoStreams(stream_arn='arn:stream')
+    cambios = fuente._leer_shard(cliente, 'shard-1', entrada, lambda valor: valor)
+    return [cambio['incidenteId'] for cambio in cambios], entrada
+
+
+def test_sigue_despues_de_paginas_vacias():
+    cliente = ClienteGuionado([[], [_registro('1', 'a')], [], [], [_registro('2', 'b')]])
+
+    ids, entrada = _leer(cliente)
+
+    assert ids == ['a', 'b']
+    assert entrada == {'secuencia': '2', 'cerrado': False}
+    # Tras el último registro, MAX_PAGINAS_VACIAS páginas vacías seguidas
+    assert cliente.llamadas == 5 + utils.cambios.MAX_PAGINAS_VACIAS
+
+
+def test_shard_cerrado():
+    ids, entrada = _leer(ClienteGuionado([[_registro('1', 'a')], [], None]))
+
+    assert ids == ['a']
+    assert entrada == {'secuencia': '1', 'cerrado': True}
+
+
+def test_para_al_dia_si_informa_millis_behind_latest():
+    cliente = ClienteGuionado([[_registro('1', 'a')]], extra={'MillisBehindLatest': 0})
+
+    assert _leer(cliente)[0] == ['a']
+    assert cliente.llamadas == 1
+
+
+def test_limite_de_paginas(monkeypatch):
+    monkeypatch.setattr(utils.cambios, 'MAX_LLAMADAS_SHARD', 3)
+    cliente = ClienteGuionado([[_registro(str(i), f"i{i}")] for i in range(10)])
+
+    ids, entrada = _leer(cliente)
+
+    # La próxima lectura sigue desde la secuencia guardada
+    assert ids == ['i0', 'i1', 'i2']
+    assert entrada['secuencia'] == '2'
+    assert cliente.llamadas == 3
+
+
+@pytest.mark.parametrize('vacias', (1, 3))
+def test_max_paginas_vacias(monkeypatch, vacias):
+    monkeypatch.setattr(utils.cambios, 'MAX_PAGINAS_VACIAS', vacias)
+    cliente = ClienteGuionado([[_registro('1', 'a')], [], [], [_registro('2', 'b')]])
+
+    ids, _ = _leer(cliente)
+
+    assert ids == (['a', 'b'] if vacias > 2 else ['a'])
+
+
+def test_snapshot_sigue_el_stream(aws, artefactos):
+    tabla = crear_tabla(aws, 'Incidentes', 'incidenteId', stream=True, abiertos=True)
+    for incidente_id, estado in (('a', 'pendiente'), ('b', 'en_atencion'), ('c', 'resuelto')):
+        # Como las Lambdas: solo los abiertos llevan colaAbierta (AbiertosIndex)
+        abierto = {'colaAbierta': 'baja'} if estado != 'resuelto' else {}
+        tabla.put_item(Item={
+            'incidenteId': incidente_id, 'estado': estado, 'urgencia': 'baja',
+            'fechaCreacion': '2025-11-20T06:00:00.000Z', 'notas': 'fuera del snapshot', **abierto,
+        })
+    fuente = FuenteDynamoStreams(tabla='Incidentes')
+    uri = str(artefactos / 'cambios' / 'abiertos.msgpack.z')
+
+    # Primera vez: abiertos de la tabla + stream desde TRIM_HORIZON
+    snapshot = actualizar_snapshot(tabla, fuente, uri)
+    assert sorted(snapshot.incidentes) == ['a', 'b']
+    assert 'notas' not in snapshot.incidentes['a']
+
+    tabla.update_item(Key={'incidenteId': 'a'}, UpdateExpression='SET urgencia = :u, colaAbierta = :u',
+                      ExpressionAttributeValues={':u': 'alta'})
+    tabla.update_item(Key={'incidenteId': 'b'}, UpdateExpression='SET estado = :e REMOVE colaAbierta',
+                      ExpressionAttributeValues={':e': 'resuelto'})
+    tabla.put_item(Item={'incidenteId': 'd', 'estado': 'pendiente', 'urgencia': 'media', 'colaAbierta': 'media',
+                         'fechaCreacion': '2025-11-20T07:00:00.000Z'})
+    tabla.delete_item(Key={'incidenteId': 'c'})
+
+    # Desde el checkpoint persistido: solo los eventos nuevos
+    posicion = cargar_snapshot(uri).posicion
+    cambios, _ = fuente.leer(posicion)
+    assert [(c['evento'], c['incidenteId']) for c in cambios] == [
+        ('MODIFY', 'a'), ('MODIFY', 'b'), ('INSERT', 'd'), ('REMOVE', 'c'),
+    ]
+
+    snapshot = actualizar_snapshot(tabla, fuente, uri)
+    assert {iid: inc['urgencia'] for iid, inc in snapshot.incidentes.items()} == {'a': 'alta', 'd': 'media'}
+    assert snapshot.abiertos(urgencias=('alta',)) == [snapshot.incidentes['a']]
+
+    # Sin cambios nuevos el checkpoint no se mueve
+    assert fuente.leer(cargar_snapshot(uri).posicion) == ([], cargar_snapshot(uri).posicion)
@@ -0,0 +1,132 @@
+"""scan_paginado por segmentos y páginas; batch_get con UnprocessedKeys: backoff y máximo de intentos"""
+
+import threading
+
+import pytest
+
+import utils.dynamo
+from utils.dynamo import batch_get, scan_paginado
+
+
+class TablaPaginada:
+    """Scan con Segment/TotalSegments y páginas de `por_pagina` items (LastEvaluatedKey)"""
+
+    def __init__(self, n, por_pagina, falla_segmento=None):
+        self.items = [{'id': i} for i in range(n)]
+        self.por_pagina = por_pagina
+        self.falla_segmento = falla_segmento
+        self.llamadas = []
+        self.lock = threading.Lock()
+
+    def scan(self, **kwargs):
+        with self.lock:
+            self.llamadas.append(kwargs)
+        segmento, total = kwargs.get('Segment', 0), kwargs.get('TotalSegments', 1)
+        if segmento == self.falla_segmento:
+            raise RuntimeError(f"segmento {segmento}")
+        desde = kwargs.get('ExclusiveStartKey', {'id': -1})['id']
+        propios = [item for item in self.items if item['id'] % total == segmento and item['id'] > desde]
+        pagina = propios[:self.por_pagina]
+        respuesta = {'Items': [dict(item) for item in pagina]}
+        if len(propios) > self.por_pagina:
+            respuesta['LastEvaluatedKey'] = {'id': pagina[-1]['id']}
+        return respuesta
+
+
+def _ids(items):
+    return sorted(item['id'] for item in items)
+
+
+def test_scan_sigue_las_paginas_de_cada_segmento():
+    tabla = TablaPaginada(100, por_pagina=7)
+
+    items = list(scan_paginado(tabla, segmentos=4, FilterExpression='estado = :e'))
+
+    assert _ids(items) == list(range(100))
+    # 25 items por segmento: 4 páginas cada uno, la última sin LastEvaluatedKey
+    assert len(tabla.llamadas) == 16
+    assert {(ll['Segment'], ll['TotalSegments']) for ll in tabla.llamadas} == {(s, 4) for s in range(4)}
+    assert all(ll['FilterExpression'] == 'estado = :e' for ll in tabla.llamadas)
+    continuaciones = sorted(ll['ExclusiveStartKey']['id'] for ll in tabla.llamadas if 'ExclusiveStartKey' in ll)
+    assert continuaciones == sorted(s + 4 * (7 * p - 1) for s in range(4) for p in (1, 2, 3))
+
+
+def test_un_segmento_no_divide_el_scan():
+    tabla = TablaPaginada(10, por_pagina=4)
+
+    assert _ids(scan_paginado(tabla, segmentos=1)) == list(range(10))
+    assert [ll.get('ExclusiveStartKey') for ll in tabla.llamadas] == [None, {'id': 3}, {'id': 7}]
+    assert not any('Segment' in ll for ll in tabla.llamadas)
+
+
+def test_shards_reparten_la_tabla_sin_solaparse():
+    tabla = TablaPaginada(90, por_pagina=5)
+
+    por_shard = [_ids(scan_paginado(tabla, segmentos=2, shard=(indice, 3))) for indice in range(3)]
+
+    assert sorted(sum(por_shard, [])) == list(range(90))
+    assert all(len(ids) == 30 for ids in por_shard)
+    assert {ll['TotalSegments'] for ll in tabla.llamadas} == {6}
+
+
+def test_error_de_un_segmento_se_propaga():
+    tabla = TablaPaginada(100, por_pagina=3, falla_segmento=2)
+
+    with pytest.raises(RuntimeError, match='segmento 2'):
+        list(scan_paginado(tabla, segmentos=4))
+
+
+class ResourceLimitado:
+    """BatchGetItem que procesa `por_llamada` claves por llamada y devuelve el resto"""
+
+    def __init__(self, por_llamada):
+        self.por_llamada = por_llamada
+        self.llamadas = 0
+
+    def batch_get_item(self, RequestItems):
+        self.llamadas += 1
+        respuesta = {'Responses': {}, 'UnprocessedKeys': {}}
+        for tabla, pedido in RequestItems.items():
+            claves = pedido['Keys']
+            respuesta['Responses'][tabla] = [dict(clave, leido=True) for clave in claves[:self.por_llamada]]
+            if claves[self.por_llamada:]:
+                respuesta['UnprocessedKeys'][tabla] = dict(pedido, Keys=claves[self.por_llamada:])
+        return respuesta
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    registradas = []
+    monkeypatch.setattr(utils.dynamo.time, 'sleep', registradas.append)
+    return registradas
+
+
+def test_reintenta_con_backoff(esperas):
+    claves = [{'id': str(i)} for i in range(150)]
+    resource = ResourceLimitado(por_llamada=30)
+
+    items = batch_get(resource, 'T', claves)
+
+    assert sorted(item['id'] for item in items) == sorted(clave['id'] for clave in claves)
+    # Lote de 100: 4 llamadas con 3 esperas; lote de 50: 2 llamadas con 1 espera
+    assert resource.llamadas == 6
+    assert len(esperas) == 4
+    assert all(0 <= espera <= utils.dynamo.BATCH_GET_ESPERA_MAX for espera in esperas)
+
+
+def test_techo_exponencial(monkeypatch):
+    monkeypatch.setattr(utils.dynamo.random, 'uniform', lambda inicio, fin: fin)
+    techos = [utils.dynamo._espera_backoff(intento) for intento in range(1, 10)]
+
+    assert techos == sorted(techos)
+    assert techos[0] == 2 * utils.dynamo.BATCH_GET_ESPERA_BASE
+    assert techos[-1] == utils.dynamo.BATCH_GET_ESPERA_MAX
+
+
+def test_abandona_tras_max_intentos(esperas):
+    resource = ResourceLimitado(por_llamada=1)
+
+    with pytest.raises(RuntimeError, match='7 claves sin procesar tras 3 intentos'):
+        batch_get(resource, 'T', [{'id': str(i)} for i in range(10)], intentos=3)
+    assert resource.llamadas == 3
+    assert len(esperas) == 2
@@ -0,0 +1,116 @@
+"""Escalación condicional del DAG de SLA contra DynamoDB (moto)"""
+
+from datetime import timedelta
+
+import pytest
+
+import utils.dynamo
+import utils.sla
+from conftest import crear_tabla
+from utils.dynamo import RESULTADO_CONDICION, RESULTADO_ERROR, RESULTADO_OK
+from utils.fechas import fecha_iso, parse_fecha
+from utils.sla import THRESHOLD_MEDIA_A_ALTA, cargar_agenda
+
+CREACION = '2025-11-20T06:00:00.000Z'
+
+# incidenteId -> (item en DynamoDB, resultado esperado al escalar baja → media)
+INCIDENTES = {
+    'baja': ({'urgencia': 'baja', 'estado': 'pendiente'}, RESULTADO_OK),
+    'sin-urgencia': ({'estado': 'pendiente'}, RESULTADO_OK),
+    'cambiada': ({'urgencia': 'alta', 'estado': 'pendiente'}, RESULTADO_CONDICION),
+    'resuelta': ({'urgencia': 'baja', 'estado': 'resuelto'}, RESULTADO_CONDICION),
+}
+
+
+class TI:
+    def __init__(self, **xcoms):
+        self.xcoms = xcoms
+
+    def xcom_pull(self, key):
+        return self.xcoms.get(key)
+
+    def xcom_push(self, key, value):
+        self.xcoms[key] = value
+
+
+@pytest.fixture
+def tablas(aws, artefactos, monkeypatch):
+    # Una escritura a la vez: moto deshace una transacción cancelada
+    # restaurando una copia de toda la tabla, lo que pisa las concurrentes
+    monkeypatch.setattr(utils.dynamo, 'WRITE_WORKERS', 1)
+    monkeypatch.setattr(utils.sla, 'SLA_AGENDA_URI', str(artefactos / 'sla' / 'agenda.msgpack.z'))
+
+    incidentes = crear_tabla(aws, 'Incidentes', 'incidenteId')
+    for incidente_id, (item, _) in INCIDENTES.items():
+        incidentes.put_item(Item={'incidenteId': incidente_id, 'fechaCreacion': CREACION, **item})
+    return aws, incidentes
+
+
+def _escalar(monkeypatch):
+    import monitorear_incidentes_antiguos as dag
+
+    monkeypatch.setattr(dag, 'DYNAMODB_TABLE', 'Incidentes')
+    monkeypatch.setattr(dag, 'DYNAMODB_TABLE_HISTORIAL', 'IncidentesHistorial')
+    ti = TI(incidentes_a_escalar=[{
+        'incidenteId': incidente_id,
+        'fechaCreacion': CREACION,
+        'urgencia_actual': 'baja',
+        'nueva_urgencia': 'media',
+        'tiempo_transcurrido': 300.0,
+        'razon': 'Escalado: >4 horas sin resolver (tiempo: 300 min)',
+        'tipo': 'seguridad',
+        'ubicacion': 'Pabellón A',
+        'area': 'seguridad',
+    } for incidente_id in INCIDENTES])
+    # Sin @instrumentar: las métricas no son parte de lo que se prueba
+    escalados = dag.escalar_urgencia_en_dynamodb.__wrapped__(ti=ti)
+    resultados = {r['incidenteId']: r['resultado'] for r in ti.xcoms['resultados_escalacion']}
+    return escalados, resultados
+
+
+def _items(tabla):
+    return {item['incidenteId']: item for item in tabla.scan()['Items']}
+
+
+def test_escala_solo_si_la_condicion_se_cumple(tablas, monkeypatch):
+    resource, incidentes = tablas
+    historial = crear_tabla(resource, 'IncidentesHistorial', 'incidenteId', orden='eventoId')
+
+    escalados, resultados = _escalar(monkeypatch)
+
+    assert resultados == {incidente_id: esperado for incidente_id, (_, esperado) in INCIDENTES.items()}
+    assert escalados == 2
+
+    items = _items(incidentes)
+    for incidente_id in ('baja', 'sin-urgencia'):
+        item = items[incidente_id]
+        assert (item['urgencia'], item['colaAbierta'], item['totalEventos']) == ('media', 'media', 1)
+        assert item['ultimoEvento']['accion'] == 'escalacion_automatica'
+    assert items['cambiada']['urgencia'] == 'alta'
+    assert items['resuelta'] == {'incidenteId': 'resuelta', 'fechaCreacion': CREACION, **INCIDENTES['resuelta'][0]}
+
+    # El evento de historial existe solo para los que se escalaron
+    eventos = historial.scan()['Items']
+    assert sorted(evento['incidenteId'] for evento in eventos) == ['baja', 'sin-urgencia']
+    assert all(evento['urgencia_nueva'] == 'media' for evento in eventos)
+
+    # Solo los escalados se reprograman, con el umbral de la urgencia nueva
+    vence = fecha_iso(parse_fecha(CREACION) + timedelta(minutes=THRESHOLD_MEDIA_A_ALTA))
+    assert cargar_agenda().entradas == {
+        'baja': [vence, 'media', CREACION],
+        'sin-urgencia': [vence, 'media', CREACION],
+    }
+
+
+def test_sin_historial_no_escala(tablas, monkeypatch):
+    # Falla la escritura del evento: la transacción no deja la urgencia a medias
+    _, incidentes = tablas
+    antes = _items(incidentes)
+
+    escalados, resultados = _escalar(monkeypatch)
+
+    assert escalados == 0
+    assert set(resultados.values()) <= {RESULTADO_ERROR, RESULTADO_CONDICION}
+    assert resultados['baja'] == RESULTADO_ERROR
+    assert _items(incidentes) == antes
+    assert cargar_agenda().entradas == {}
@@ -0,0 +1,119 @@
+"""Recolección incremental del DAG de reportes: marca de agua, fuente de cambios y particiones (moto)"""
+
+from datetime import timedelta
+
+import pytest
+
+import utils.incremental
+import utils.rollup
+from conftest import AHORA, crear_tabla
+from utils.cambios import FuenteArchivo, registrar_cambio
+from utils.fechas import fecha_iso
+from utils.incremental import MARGEN_MARCA_AGUA, actualizar_incremental, cargar_estado
+from utils.rollup import cargar_rollup, construir_rollup, consultar
+
+
+def _incidente(incidente_id, creado, **campos):
+    return {
+        'incidenteId': incidente_id, 'tipo': 'seguridad', 'area': 'seguridad', 'urgencia': 'alta',
+        'estado': 'pendiente', 'ubicacion': 'Pabellón A',
+        'fechaCreacion': fecha_iso(creado), 'fechaActualizacion': fecha_iso(creado), **campos,
+    }
+
+
+def _resolver(inc, fecha):
+    return dict(inc, estado='resuelto', fechaResolucion=fecha_iso(fecha), fechaActualizacion=fecha_iso(fecha))
+
+
+INICIALES = [
+    _incidente('a', AHORA - timedelta(days=45)),
+    _incidente('b', AHORA - timedelta(hours=2)),
+    _incidente('c', AHORA - timedelta(hours=1)),
+]
+
+
+@pytest.fixture
+def entorno(aws, artefactos, monkeypatch):
+    monkeypatch.setattr(utils.rollup, 'REPORTES_ROLLUP_URI', str(artefactos / 'reportes' / 'rollup'))
+    tabla = crear_tabla(aws, 'Incidentes', 'incidenteId')
+    for inc in INICIALES:
+        tabla.put_item(Item=inc)
+    return tabla, str(artefactos / 'reportes' / 'estado.msgpack.z')
+
+
+def _actualizar(monkeypatch, tabla, uri, ahora, fuente=None):
+    monkeypatch.setattr(utils.incremental, 'ahora_utc', lambda: ahora)
+    # Como la tarea del DAG: el rollup sin contribuciones
+    rollup = cargar_rollup(con_contribuciones=False)
+    recientes, leidos = actualizar_incremental(tabla, rollup, uri=uri, fuente=fuente)
+    return rollup, sorted(inc['incidenteId'] for inc in recientes), leidos
+
+
+def _igual_a_construir_desde_cero(incidentes):
+    persistido = cargar_rollup()
+    esperado = construir_rollup(incidentes)
+    assert persistido['contribuciones'] == esperado['contribuciones']
+    assert persistido['buckets'] == esperado['buckets']
+
+
+def test_marca_de_agua_avanza_y_solo_lee_lo_nuevo(entorno, monkeypatch):
+    tabla, uri = entorno
+    _, recientes, leidos = _actualizar(monkeypatch, tabla, uri, AHORA)
+
+    assert (recientes, leidos) == (['b', 'c'], 3)
+    assert cargar_estado(uri)['marca_agua'] == fecha_iso(AHORA - MARGEN_MARCA_AGUA)
+
+    resuelto = _resolver(INICIALES[1], AHORA + timedelta(hours=1))
+    nuevo = _incidente('d', AHORA + timedelta(hours=1))
+    for inc in (resuelto, nuevo):
+        tabla.put_item(Item=inc)
+
+    rollup, recientes, leidos = _actualizar(monkeypatch, tabla, uri, AHORA + timedelta(hours=2))
+
+    assert (recientes, leidos) == (['b', 'c', 'd'], 2)
+    assert cargar_estado(uri)['marca_agua'] == fecha_iso(AHORA + timedelta(hours=2) - MARGEN_MARCA_AGUA)
+    # Solo se cargó la partición del mes de los cambios, no la del incidente de hace 45 días
+    assert rollup['meses_cargados'] == {AHORA.strftime('%Y-%m')}
+    datos = consultar(rollup)
+    assert (datos['total'], dict(datos['por_estado'])) == (4, {'pendiente': 3, 'resuelto': 1})
+    _igual_a_construir_desde_cero([INICIALES[0], resuelto, INICIALES[2], nuevo])
+
+    # Sin cambios no se lee nada
+    assert _actualizar(monkeypatch, tabla, uri, AHORA + timedelta(hours=3))[2] == 0
+
+
+def test_con_fuente_de_cambios_no_recorre_la_tabla(entorno, monkeypatch, tmp_path):
+    tabla, uri = entorno
+    archivo = str(tmp_path / 'cambios.ndjson')
+    for inc in INICIALES:
+        registrar_cambio(archivo, 'INSERT', inc)
+    fuente = FuenteArchivo(archivo)
+
+    # Primera vez: carga completa (tabla + fuente desde el principio)
+    _actualizar(monkeypatch, tabla, uri, AHORA, fuente)
+    assert cargar_estado(uri)['posicion'] == {'offset': len(open(archivo, 'rb').read())}
+
+    resuelto = _resolver(INICIALES[1], AHORA + timedelta(hours=1))
+    nuevo = _incidente('d', AHORA + timedelta(hours=1))
+    for evento, inc in (('MODIFY', resuelto), ('INSERT', nuevo)):
+        tabla.put_item(Item=inc)
+        registrar_cambio(archivo, evento, inc)
+
+    def sin_scan(*args, **kwargs):
+        raise AssertionError('no debe recorrer la tabla')
+
+    with monkeypatch.context() as m:
+        m.setattr(utils.incremental, 'scan_paginado', sin_scan)
+        rollup, recientes, leidos = _actualizar(monkeypatch, tabla, uri, AHORA + timedelta(hours=2), fuente)
+
+    assert (recientes, leidos) == (['b', 'c', 'd'], 2)
+    assert rollup['meses_cargados'] == {AHORA.strftime('%Y-%m')}
+    _igual_a_construir_desde_cero([INICIALES[0], resuelto, INICIALES[2], nuevo])
+
+    # Checkpoint perdido (la fuente se acortó): carga completa, sin contar dos veces
+    open(archivo, 'w').close()
+    rollup, recientes, _ = _actualizar(monkeypatch, tabla, uri, AHORA + timedelta(hours=3), fuente)
+
+    assert recientes == ['b', 'c', 'd']
+    assert consultar(rollup)['total'] == 4
+    _igual_a_construir_desde_cero([INICIALES[0], resuelto, INICIALES[2], nuevo])
@@ -0,0 +1,73 @@
+"""Bytes de XCom que registra @instrumentar, incluido el return_value"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import utils.metricas
+import utils.xcom_backend
+from utils.artefactos import serializar
+from utils.metricas import instrumentar
+from utils.xcom_backend import XComArtefactos
+
+
+def _bytes(value):
+    """Lo que registra serialize_value: msgpack si va a artefacto, si no lo de BaseXCom"""
+    data = serializar(value)
+    if len(data) > utils.xcom_backend.XCOM_UMBRAL_BYTES:
+        return len(data)
+    return len(XComArtefactos.serialize_value(value))
+
+
+class TI:
+    dag_id, task_id, run_id = 'dag', 'tarea', 'corrida'
+
+    def __init__(self):
+        self.xcoms = {}
+
+    def xcom_push(self, key, value):
+        if key != 'metricas':
+            XComArtefactos.serialize_value(value, key=key, task_id=self.task_id, dag_id=self.dag_id, run_id=self.run_id)
+        self.xcoms[key] = value
+
+
+@pytest.fixture
+def ti(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils.metricas, 'METRICAS_ACTIVAS', True)
+    monkeypatch.setattr(utils.metricas, 'emitir_stats', lambda resumen: None)
+    monkeypatch.setattr(utils.metricas, 'guardar_resumen', lambda resumen: None)
+    monkeypatch.setattr('utils.artefactos.ARTEFACTOS_URI', str(tmp_path))
+    return TI()
+
+
+@pytest.mark.parametrize('retorno', ([{'id': i} for i in range(20_000)], 'corto', {1, 2}))
+def test_cuenta_el_return_value(ti, monkeypatch, retorno):
+    empujado = {'lista': list(range(100))}
+    esperado = _bytes(empujado) + _bytes(retorno)
+    serializados = []
+    msgpack = utils.xcom_backend._msgpack
+    monkeypatch.setattr(utils.xcom_backend, '_msgpack', lambda value: serializados.append(value) or msgpack(value))
+
+    @instrumentar
+    def tarea(**context):
+        context['ti'].xcom_push(key='datos', value=empujado)
+        return retorno
+
+    resultado = tarea(ti=ti, task=SimpleNamespace(do_xcom_push=True))
+    # Como PythonOperator: el return_value se sube después de la envoltura
+    ti.xcom_push(key='return_value', value=resultado)
+
+    assert resultado == retorno
+    assert ti.xcoms['metricas']['xcom_bytes'] == esperado
+    # Medirlo no lo serializa otra vez: el push reutiliza lo medido
+    assert sum(valor is retorno for valor in serializados) == 1
+    assert utils.xcom_backend._retorno is None
+
+
+def test_sin_push_del_return_value(ti):
+    @instrumentar
+    def tarea(**context):
+        return [0] * 1000
+
+    tarea(ti=ti, task=SimpleNamespace(do_xcom_push=False))
+    assert ti.xcoms['metricas']['xcom_bytes'] == 0
@@ -0,0 +1,115 @@
+"""Registro de notificaciones (ledger): deduplicación, recordatorios y modo simulado"""
+
+from datetime import timedelta
+
+import pytest
+
+import utils.notificaciones
+from conftest import AHORA
+from utils.notificaciones import (
+    cargar_registro, marcar_enviados, pendientes_de_envio, podar, registro_vacio, version_incidente,
+)
+
+INCIDENTES = [
+    {'incidenteId': 'a', 'urgencia': 'alta', 'estado': 'pendiente', 'tipo': 'seguridad'},
+    {'incidenteId': 'b', 'urgencia': 'alta', 'estado': 'en_atencion', 'tipo': 'seguridad'},
+]
+
+
+class TI:
+    def __init__(self, **xcoms):
+        self.xcoms = xcoms
+
+    def xcom_pull(self, key):
+        return self.xcoms.get(key)
+
+    def xcom_push(self, key, value):
+        self.xcoms[key] = value
+
+
+class EnviadorFalso:
+    """EnviadorSMTP sin red: `fallan` son los destinatarios que no se envían"""
+
+    fallan = set()
+
+    def __init__(self, *args):
+        pass
+
+    def enviar(self, emails, armar):
+        return {
+            'enviados': [e for e in emails if e['destinatario'] not in self.fallan],
+            'fallidos': [{'item': e, 'error': 'rechazado'} for e in emails if e['destinatario'] in self.fallan],
+            'duracion_s': 0.1, 'por_segundo': len(emails), 'conexiones': 1, 'reintentos': 0,
+            'latencia_ms': {'p50': 1, 'p95': 1, 'p99': 1},
+        }
+
+
+def _ids(incidentes):
+    return [inc['incidenteId'] for inc in incidentes]
+
+
+def test_solo_nuevos_con_cambios_o_recordatorio_vencido():
+    registro = registro_vacio()
+    marcar_enviados(registro, 'u1', {inc['incidenteId']: version_incidente(inc) for inc in INCIDENTES}, AHORA)
+    cambiado = dict(INCIDENTES[1], urgencia='media')
+
+    # Mismas versiones: nada que reenviar; otro usuario los recibe todos
+    assert pendientes_de_envio(registro, 'u1', INCIDENTES, AHORA + timedelta(minutes=10), 120) == []
+    assert _ids(pendientes_de_envio(registro, 'u2', INCIDENTES, AHORA, 120)) == ['a', 'b']
+    assert _ids(pendientes_de_envio(registro, 'u1', [INCIDENTES[0], cambiado], AHORA, 120)) == ['b']
+    # Recordatorio vencido (o desactivado con 0)
+    assert _ids(pendientes_de_envio(registro, 'u1', INCIDENTES, AHORA + timedelta(minutes=120), 120)) == ['a', 'b']
+    assert pendientes_de_envio(registro, 'u1', INCIDENTES, AHORA + timedelta(days=30), 0) == []
+
+
+def test_podar_descarta_incidentes_inactivos():
+    registro = registro_vacio()
+    marcar_enviados(registro, 'u1', {'a': 'v', 'b': 'v'}, AHORA)
+    marcar_enviados(registro, 'u2', {'b': 'v'}, AHORA)
+
+    podar(registro, ['a'])
+
+    assert registro['enviados'] == {'u1': {'a': ['v', '2025-11-20T12:00:00.000Z']}}
+
+
+@pytest.fixture
+def dag(artefactos, monkeypatch):
+    import enviar_notificaciones as dag
+
+    monkeypatch.setattr(utils.notificaciones, 'REGISTRO_NOTIFICACIONES_URI',
+                        str(artefactos / 'notificaciones' / 'registro.msgpack.z'))
+    monkeypatch.setattr(dag, 'EnviadorSMTP', EnviadorFalso)
+    monkeypatch.setattr(dag, 'ahora_utc', lambda: AHORA)
+    return dag
+
+
+def _preparar(dag):
+    usuarios = [{'userId': f"u{i}", 'email': f"u{i}@utec.edu.pe", 'nombre': f"Usuario {i}"} for i in (1, 2)]
+    ti = TI(usuarios_offline_por_area={'seguridad': {'usuarios': usuarios, 'incidentes': INCIDENTES}},
+            incidentes_para_notificar=INCIDENTES)
+    # Sin @instrumentar: las métricas no son parte de lo que se prueba
+    dag.preparar_notificaciones_email.__wrapped__(ti=ti)
+    return ti
+
+
+@pytest.mark.parametrize('simulado', (False, True))
+def test_solo_lo_enviado_se_anota(dag, monkeypatch, simulado):
+    monkeypatch.setattr(dag, 'SMTP_EMAIL', '' if simulado else 'alertas@utec.edu.pe')
+    monkeypatch.setattr(dag, 'SMTP_PASSWORD', 'clave')
+    monkeypatch.setattr(EnviadorFalso, 'fallan', {'u2@utec.edu.pe'})
+
+    ti = _preparar(dag)
+    assert len(ti.xcoms['emails']) == 2
+    dag.enviar_emails_via_smtp.__wrapped__(ti=ti)
+
+    enviados = cargar_registro()['enviados']
+    if simulado:
+        assert enviados == {}
+        assert 'incidentes_notificados' not in ti.xcoms
+    else:
+        assert sorted(enviados) == ['u1']
+        assert ti.xcoms['incidentes_notificados'] == ['a', 'b']
+
+    # La corrida siguiente solo prepara lo que no se envió
+    destinatarios = sorted(email['destinatario'] for email in _preparar(dag).xcoms['emails'])
+    assert destinatarios == (['u1@utec.edu.pe', 'u2@utec.edu.pe'] if simulado else ['u2@utec.edu.pe'])
@@ -0,0 +1,90 @@
+"""Rollup y reportes repartidos en procesos contra el camino serie"""
+
+import json
+import logging
+import multiprocessing
+from datetime import timedelta
+
+import pytest
+
+from conftest import AHORA
+from utils.analisis import analizar, analizar_ventana
+from utils.fechas import parse_duracion
+import utils.paralelo
+from utils.paralelo import orden_recientes, procesar, procesar_particionado
+from utils.rollup import consultar_ventanas
+
+VENTANAS = ('1h', '24h', '7d', '30d')
+DESDE = AHORA - timedelta(hours=24)
+
+
+def _reporte(rollup, recientes):
+    """Todo lo que calcula analizar_incidentes, serializado como en el XCom"""
+    rangos = {'historico': (None, None)}
+    rangos.update({ventana: (AHORA - parse_duracion(ventana), None) for ventana in VENTANAS})
+    datos = consultar_ventanas(rollup, rangos)
+    resultado = analizar(recientes, rollup=rollup, datos_rollup=datos['historico'])
+    resultado['ventanas'] = {ventana: analizar_ventana(datos[ventana]) for ventana in VENTANAS}
+    resultado['top'] = {
+        nombre: {campo: resumen.top() for campo, resumen in datos[nombre]['top'].items()}
+        for nombre in rangos
+    }
+    return json.dumps(resultado, sort_keys=True, default=str)
+
+
+# 16: menos que las ubicaciones distintas de muchas horas, los TopK desbordan
+@pytest.mark.parametrize('capacidad', (256, 16))
+@pytest.mark.parametrize('shards', (2, 4))
+def test_shards_igual_que_serie(incidentes, monkeypatch, capacidad, shards):
+    import utils.rollup
+
+    monkeypatch.setattr(utils.rollup, 'REPORTES_TOP_K', capacidad)
+    rollup, recientes, leidos = procesar(incidentes, DESDE)
+    esperado = _reporte(rollup, orden_recientes(recientes))
+
+    rollup_p, recientes_p, leidos_p = procesar_particionado(incidentes, DESDE, shards=shards)
+
+    assert leidos == leidos_p == len(incidentes)
+    assert _reporte(rollup_p, recientes_p) == esperado
+
+
+def test_top_desbordado_no_depende_del_orden_del_scan(incidentes, monkeypatch):
+    import utils.rollup
+
+    monkeypatch.setattr(utils.rollup, 'REPORTES_TOP_K', 16)
+    rollup, _, _ = procesar(incidentes, DESDE)
+    rollup_invertido, _, _ = procesar(list(reversed(incidentes)), DESDE)
+
+    assert any(len(resumen) == 16 for resumenes in rollup['top'].values() for resumen in resumenes.values())
+    assert {hora: {c: r.a_lista() for c, r in resumenes.items()} for hora, resumenes in rollup['top'].items()} == \
+        {hora: {c: r.a_lista() for c, r in resumenes.items()} for hora, resumenes in rollup_invertido['top'].items()}
+
+
+def _en_daemon(cola, incidentes):
+    """Como una tarea del LocalExecutor: fork desde un LocalWorker daemon"""
+    avisos = []
+    manejador = logging.Handler()
+    manejador.emit = lambda registro: avisos.append(registro.getMessage())
+    utils.paralelo.log.addHandler(manejador)
+    try:
+        rollup, recientes, leidos = procesar_particionado(incidentes, DESDE, shards=2)
+        cola.put(('ok', _reporte(rollup, recientes), leidos, avisos))
+    except BaseException as e:
+        cola.put(('error', repr(e), None, avisos))
+
+
+def test_shards_en_proceso_daemon(incidentes):
+    muestra = incidentes[:2000]
+    rollup, recientes, _ = procesar(muestra, DESDE)
+    contexto = multiprocessing.get_context('fork')
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_en_daemon, args=(cola, muestra), daemon=True)
+    proceso.start()
+    estado, reporte, leidos, avisos = cola.get(timeout=120)
+    proceso.join()
+
+    # Un daemon no puede tener hijos: en serie, con el mismo resultado y avisando
+    assert estado == 'ok', reporte
+    assert leidos == len(muestra)
+    assert reporte == _reporte(rollup, orden_recientes(recientes))
+    assert any('EXECUTE_TASKS_NEW_PYTHON_INTERPRETER' in aviso for aviso in avisos)
@@ -0,0 +1,58 @@
+"""Plantillas de email: escape del contenido y digests compartidos por área"""
+
+from utils.plantillas_email import CacheDigests, clave_digest, construir_html, construir_mensaje
+
+DASHBOARD = 'https://alerta-utec.com/dashboard'
+
+INCIDENTES = [
+    {'incidenteId': 'INC_1', 'tipo': 'robo', 'ubicacion': 'Pabellón <A>', 'urgencia': 'alta',
+     'descripcion': '<script>alert("x")</script> & más', 'estado': 'pendiente',
+     'fechaCreacion': '2025-11-20T12:00:00.000Z'},
+    {'incidenteId': 'INC_2', 'tipo': 'derrame', 'ubicacion': 'Cafetería', 'urgencia': 'alta'},
+]
+
+
+def _email(digest, nombre='Ana <admin>', area='seguridad'):
+    return {'destinatario': 'ana@utec.edu.pe', 'nombre': nombre, 'area': area,
+            'asunto': '🚨 Incidentes', 'digest': digest}
+
+
+def test_escapa_el_contenido_de_usuarios():
+    digests = CacheDigests(DASHBOARD)
+    html = construir_html(_email(digests.obtener('seguridad', INCIDENTES)), digests.digests)
+
+    assert '<script>' not in html
+    assert '&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt; &amp; más' in html
+    assert 'Pabellón &lt;A&gt;' in html
+    assert 'Hola Ana &lt;admin&gt;,' in html
+    # Campos ausentes: N/A
+    assert '<strong>Descripción:</strong> N/A' in html
+
+
+def test_un_digest_por_area_y_conjunto_de_incidentes():
+    digests = CacheDigests(DASHBOARD)
+
+    clave = digests.obtener('seguridad', INCIDENTES)
+    assert digests.obtener('seguridad', list(INCIDENTES)) == clave
+    assert len(digests.digests) == 1
+    # Otro conjunto u otra área: otro digest
+    assert digests.obtener('seguridad', INCIDENTES[:1]) != clave
+    assert digests.obtener('limpieza', INCIDENTES) != clave
+    assert len(digests.digests) == 3
+    assert clave == clave_digest('seguridad', INCIDENTES)
+
+
+def test_destinatarios_comparten_el_digest():
+    digests = CacheDigests(DASHBOARD)
+    clave = digests.obtener('seguridad', INCIDENTES)
+
+    ana = construir_html(_email(clave, nombre='Ana'), digests.digests)
+    luis = construir_html(_email(clave, nombre='Luis'), digests.digests)
+
+    assert ana.endswith(digests.digests[clave]) and luis.endswith(digests.digests[clave])
+    assert 'Hola Ana,' in ana and 'Hola Luis,' in luis
+
+    mensaje = construir_mensaje(_email(clave), digests.digests, 'Alertas UTEC <alertas@utec.edu.pe>')
+    assert (mensaje['To'], mensaje['From']) == ('ana@utec.edu.pe', 'Alertas UTEC <alertas@utec.edu.pe>')
+    cuerpo = mensaje.get_payload()[0].get_payload(decode=True).decode('utf-8')
+    assert cuerpo == construir_html(_email(clave), digests.digests)
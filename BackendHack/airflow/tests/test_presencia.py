@@ -0,0 +1,32 @@
+"""Presencia de usuarios: conexiones vigentes vs contadores de $disconnect perdidos (moto)"""
+
+from datetime import timedelta
+
+from conftest import AHORA, crear_tabla
+from utils.fechas import fecha_iso
+from utils.presencia import DURACION_MAX_CONEXION, filtrar_online
+
+# userId -> (conexiones, antigüedad de ultimaConexion)
+PRESENCIA = {
+    'online': (1, timedelta(minutes=5)),
+    'dos-pestanas': (2, DURACION_MAX_CONEXION - timedelta(seconds=1)),
+    'desconectado': (0, timedelta(minutes=5)),
+    'disconnect-perdido': (1, DURACION_MAX_CONEXION + timedelta(seconds=1)),
+    'justo-al-limite': (1, DURACION_MAX_CONEXION),
+}
+
+
+def test_solo_conexiones_vigentes(aws):
+    tabla = crear_tabla(aws, 'PresenciaUsuarios', 'userId')
+    for user_id, (conexiones, antiguedad) in PRESENCIA.items():
+        tabla.put_item(Item={'userId': user_id, 'conexiones': conexiones, 'ultimaConexion': fecha_iso(AHORA - antiguedad)})
+    tabla.put_item(Item={'userId': 'sin-fecha', 'conexiones': 1})
+
+    candidatos = list(PRESENCIA) + ['sin-fecha', 'sin-registro', '', None]
+
+    assert filtrar_online(aws, candidatos, ahora=AHORA) == {'online', 'dos-pestanas'}
+
+
+def test_sin_candidatos_no_consulta():
+    # Sin resource: si consultara, fallaría
+    assert filtrar_online(None, ['', None]) == set()
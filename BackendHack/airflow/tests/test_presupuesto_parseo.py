@@ -0,0 +1,26 @@
+"""Presupuesto de parseo de cada DAG (ver benchmarks/presupuesto_parseo.py)"""
+
+import os
+
+import pytest
+
+from presupuesto_parseo import MAX_MODULOS, MAX_SEGUNDOS, medir_dag, prohibidos, rutas_dags
+
+
+@pytest.fixture(scope='module', params=rutas_dags(), ids=lambda ruta: os.path.splitext(os.path.basename(ruta))[0])
+def medicion(request):
+    medicion, error = medir_dag(request.param)
+    assert error is None, f"falla al importar: {error}"
+    return medicion
+
+
+def test_sin_prohibidos(medicion):
+    assert prohibidos(medicion['modulos']) == []
+
+
+def test_modulos(medicion):
+    assert len(medicion['modulos']) <= MAX_MODULOS
+
+
+def test_segundos(medicion):
+    assert medicion['segundos'] <= MAX_SEGUNDOS
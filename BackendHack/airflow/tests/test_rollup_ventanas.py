@@ -0,0 +1,143 @@
+"""Ventanas del rollup contra el análisis exacto de los mismos incidentes"""
+
+from datetime import timedelta
+
+import pytest
+
+from conftest import AHORA
+from utils.analisis import analizar, analizar_ventana
+from utils.fechas import parse_duracion, parse_fecha
+from utils.rollup import aplicar_incidente, construir_rollup, consultar_ventanas
+
+VENTANAS = ('1h', '24h', '7d', '30d')
+
+
+def _inicio_hora(fecha):
+    return fecha.replace(minute=0, second=0, microsecond=0)
+
+
+def _rebanada(incidentes, desde):
+    """Los incidentes que cuenta una ventana: creados desde el inicio de la hora de `desde`"""
+    if desde is None:
+        return list(incidentes)
+    inicio = _inicio_hora(desde)
+    return [inc for inc in incidentes if parse_fecha(inc['fechaCreacion']) >= inicio]
+
+
+@pytest.fixture(scope='module')
+def ventanas(incidentes):
+    rollup = construir_rollup(incidentes)
+    rangos = {'historico': (None, None)}
+    rangos.update({ventana: (AHORA - parse_duracion(ventana), None) for ventana in VENTANAS})
+    datos = consultar_ventanas(rollup, rangos)
+    return {
+        nombre: (datos[nombre], analizar_ventana(datos[nombre]), _rebanada(incidentes, desde))
+        for nombre, (desde, _) in rangos.items()
+    }
+
+
+@pytest.mark.parametrize('nombre', ('historico',) + VENTANAS)
+def test_conteos_iguales_al_analisis_exacto(ventanas, nombre):
+    datos, reporte, rebanada = ventanas[nombre]
+    exacto = analizar(rebanada, historico=rebanada)
+
+    assert datos['total'] == len(rebanada)
+    assert reporte['analisis_tipo']['total'] == exacto['analisis_tipo']['total']
+    assert reporte['analisis_tipo']['por_tipo'] == exacto['analisis_tipo']['por_tipo']
+    assert reporte['analisis_estados'] == exacto['analisis_estados']
+
+    tendencias, tendencias_exactas = reporte['tendencias'], exacto['tendencias']
+    assert tendencias['dia_mas_incidentes']['cantidad'] == tendencias_exactas['dia_mas_incidentes']['cantidad']
+    assert tendencias['hora_pico']['cantidad'] == tendencias_exactas['hora_pico']['cantidad']
+
+
+@pytest.mark.parametrize('nombre', ('historico',) + VENTANAS)
+def test_top_de_la_ventana_cuenta_lo_mismo_que_total(ventanas, nombre):
+    datos, reporte, rebanada = ventanas[nombre]
+    exacto = analizar(rebanada, historico=rebanada)
+    reales = {}
+    for inc in rebanada:
+        reales[inc['ubicacion']] = reales.get(inc['ubicacion'], 0) + 1
+
+    assert sum(datos['por_ubicacion'].values()) == datos['total']
+    for campo in ('tipo', 'ubicacion', 'area'):
+        assert datos['top'][campo].n == datos['total']
+
+    ubicacion = reporte['analisis_ubicacion']
+    assert ubicacion['total_ubicaciones'] == exacto['analisis_ubicacion']['total_ubicaciones']
+    for zona in ubicacion['zonas_criticas']:
+        assert zona['incidentes'] == reales[zona['ubicacion']]
+    assert [z['incidentes'] for z in ubicacion['zonas_criticas']] == \
+        [z['incidentes'] for z in exacto['analisis_ubicacion']['zonas_criticas']]
+
+
+@pytest.mark.parametrize('nombre', ('historico',) + VENTANAS)
+def test_tiempos_de_resolucion_de_la_ventana(ventanas, nombre):
+    _, reporte, rebanada = ventanas[nombre]
+    tiempos = reporte['analisis_tiempos']
+    exactos = analizar(rebanada, historico=rebanada)['analisis_tiempos']
+
+    assert tiempos['total_resueltos'] == exactos['total_resueltos']
+    # Sumas en otro orden: pueden caer a ambos lados del redondeo a 2 decimales
+    assert tiempos['tiempo_promedio_min'] == pytest.approx(exactos['tiempo_promedio_min'], abs=0.02)
+    assert tiempos['tiempo_minimo_min'] == pytest.approx(exactos['tiempo_minimo_min'], abs=0.02)
+    assert tiempos['tiempo_maximo_min'] == pytest.approx(exactos['tiempo_maximo_min'], abs=0.02)
+
+    # Mismos valores en los sketches: mismos n por grupo y cuantiles dentro del error del sketch
+    for grupo in ('por_tipo', 'por_urgencia'):
+        assert {k: v['n'] for k, v in tiempos[grupo].items()} == {k: v['n'] for k, v in exactos[grupo].items()}
+    for percentil, valor in exactos['percentiles_min'].items():
+        assert tiempos['percentiles_min'][percentil] == pytest.approx(valor, rel=0.02, abs=0.01)
+
+
+def test_ventana_cerrada_excluye_las_horas_posteriores(incidentes):
+    rollup = construir_rollup(incidentes)
+    desde, hasta = AHORA - timedelta(hours=30), AHORA - timedelta(hours=6)
+    datos = consultar_ventanas(rollup, {'rango': (desde, hasta)})['rango']
+    esperados = [inc for inc in _rebanada(incidentes, desde) if parse_fecha(inc['fechaCreacion']) < hasta]
+
+    assert datos['total'] == len(esperados)
+    assert datos['resolucion']['sketches']['total'].n == datos['resolucion']['total']
+    assert sum(datos['por_ubicacion'].values()) == len(esperados)
+
+
+@pytest.mark.parametrize('nombre', ('historico', '24h', '7d'))
+def test_zonas_de_un_top_desbordado_acotan_el_conteo_real(incidentes, monkeypatch, nombre):
+    import utils.rollup
+
+    # Capacidad menor que las ubicaciones distintas de una hora: Space-Saving desaloja
+    monkeypatch.setattr(utils.rollup, 'REPORTES_TOP_K', 3)
+    rollup = construir_rollup(incidentes)
+    desde = None if nombre == 'historico' else AHORA - parse_duracion(nombre)
+    datos = consultar_ventanas(rollup, {nombre: (desde, None)})[nombre]
+    ubicacion = analizar_ventana(datos)['analisis_ubicacion']
+
+    reales = {}
+    for inc in _rebanada(incidentes, desde):
+        reales[inc['ubicacion']] = reales.get(inc['ubicacion'], 0) + 1
+
+    assert ubicacion['error_max_conteo'] > 0
+    for zona in ubicacion['zonas_criticas']:
+        assert zona['incidentes'] - zona['error'] <= reales.get(zona['ubicacion'], 0) <= zona['incidentes']
+    # El TopK tiene 3 zonas; las distintas salen del HyperLogLog
+    assert ubicacion['total_ubicaciones_estimado']
+    assert ubicacion['total_ubicaciones'] == pytest.approx(len(reales), rel=0.05)
+
+
+def test_ubicaciones_distintas_siguen_los_cambios(incidentes, monkeypatch):
+    import utils.rollup
+
+    monkeypatch.setattr(utils.rollup, 'REPORTES_TOP_K', 3)
+    muestra = incidentes[:2000]
+    rollup = construir_rollup(muestra)
+    antes = consultar_ventanas(rollup, {None: (None, None)})[None]['ubicaciones_distintas']
+
+    # Todos a la misma ubicación: el HyperLogLog descuenta las anteriores
+    for inc in muestra:
+        aplicar_incidente(rollup, dict(inc, ubicacion='Pabellón A'))
+    datos = consultar_ventanas(rollup, {None: (None, None)})[None]
+
+    assert antes == pytest.approx(len({inc['ubicacion'] for inc in muestra}), rel=0.05)
+    assert datos['ubicaciones_distintas'] == 1
+    for distintas in rollup['ubicaciones'].values():
+        assert distintas.estimar() == 1
@@ -0,0 +1,78 @@
+"""Agenda SLA: heap con invalidación perezosa, persistencia y próximo despertar"""
+
+from datetime import timedelta
+
+from conftest import AHORA
+from utils.fechas import fecha_iso
+from utils.sla import (
+    SLA_SINCRONIZACION, THRESHOLD_ALTA_A_CRITICA, THRESHOLD_BAJA_A_MEDIA, THRESHOLD_MEDIA_A_ALTA,
+    AgendaSLA, cargar_agenda, guardar_agenda,
+)
+
+CREACION = AHORA - timedelta(hours=3)
+
+
+def _creado(minutos_antes):
+    return fecha_iso(AHORA - timedelta(minutes=minutos_antes))
+
+
+def test_reprogramar_deja_obsoleta_la_entrada_anterior():
+    agenda = AgendaSLA()
+    agenda.programar('a', fecha_iso(CREACION), 'baja')     # vence en 1 h
+    agenda.programar('b', fecha_iso(CREACION), 'alta')     # venció hace 2 h
+
+    # 'a' escaló a alta: su vencimiento pasa a ser anterior a AHORA; 'b' ya no escala
+    agenda.programar('a', fecha_iso(CREACION), 'alta')
+    agenda.programar('b', fecha_iso(CREACION), 'critica')
+
+    assert agenda.entradas == {'a': [fecha_iso(CREACION + timedelta(minutes=THRESHOLD_ALTA_A_CRITICA)), 'alta',
+                                     fecha_iso(CREACION)]}
+    # Las entradas obsoletas siguen en el heap, pero no se extraen
+    assert len(agenda._heap) == 3
+    assert agenda.extraer_vencidos(AHORA) == ['a']
+    assert agenda.extraer_vencidos(AHORA + timedelta(days=1)) == []
+    assert agenda.proximo() is None and agenda._heap == []
+
+
+def test_extrae_en_orden_de_vencimiento_una_vez_cada_uno():
+    agenda = AgendaSLA()
+    for iid, minutos_antes, urgencia in (('tarde', 10, 'baja'), ('pronto', 200, 'baja'), ('medio', 100, 'media')):
+        agenda.programar(iid, _creado(minutos_antes), urgencia)
+    agenda.programar('quitado', _creado(300), 'baja')
+    agenda.quitar('quitado')
+    # Reprogramado con la misma urgencia: duplicado en el heap, una sola entrada
+    agenda.programar('pronto', _creado(200), 'baja')
+
+    assert agenda.proximo() == fecha_iso(AHORA + timedelta(minutes=THRESHOLD_MEDIA_A_ALTA - 100))
+    assert agenda.extraer_vencidos(AHORA) == []
+    assert agenda.extraer_vencidos(AHORA + timedelta(minutes=THRESHOLD_BAJA_A_MEDIA)) == ['medio', 'pronto', 'tarde']
+    assert len(agenda) == 0
+
+
+def test_persistencia_reconstruye_el_heap(artefactos):
+    uri = str(artefactos / 'sla' / 'agenda.msgpack.z')
+    agenda = AgendaSLA()
+    agenda.programar('a', _creado(230), 'baja')
+    agenda.programar('b', _creado(55), 'alta')
+    agenda.programar('a', _creado(230), 'media')
+    agenda.sincronizar([{'incidenteId': 'a', 'fechaCreacion': _creado(230), 'urgencia': 'baja'},
+                        {'incidenteId': 'b', 'fechaCreacion': _creado(55), 'urgencia': 'alta'}], AHORA)
+    guardar_agenda(agenda, uri)
+
+    cargada = cargar_agenda(uri)
+
+    assert cargada.entradas == agenda.entradas
+    assert cargada.ultima_sincronizacion == fecha_iso(AHORA)
+    assert cargada.extraer_vencidos(AHORA + timedelta(minutes=10)) == ['b', 'a']
+
+
+def test_proximo_despertar():
+    agenda = AgendaSLA(ultima_sincronizacion=fecha_iso(AHORA))
+    assert agenda.proximo_despertar(AHORA) == AHORA + SLA_SINCRONIZACION
+
+    agenda.programar('a', _creado(THRESHOLD_ALTA_A_CRITICA - 5), 'alta')
+    assert agenda.proximo_despertar(AHORA) == AHORA + timedelta(minutes=5)
+
+    # Vencido o sin sincronizar nunca: ahora mismo
+    assert agenda.proximo_despertar(AHORA + timedelta(hours=1)) == AHORA + timedelta(hours=1)
+    assert AgendaSLA().requiere_sincronizacion(AHORA)
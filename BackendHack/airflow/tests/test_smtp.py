@@ -0,0 +1,70 @@
+"""Conexiones del EnviadorSMTP que fallan al autenticarse o negociar TLS"""
+
+import smtplib
+
+import pytest
+
+from utils.smtp import EnviadorSMTP
+
+
+class SMTPFalso:
+    """smtplib.SMTP sin red; falla en `falla` ('starttls' o 'login')"""
+
+    creados = []
+
+    def __init__(self, host, puerto, timeout=None, falla=None):
+        self.falla = falla
+        self.cerrado = False
+        self.enviados = []
+        SMTPFalso.creados.append(self)
+
+    def starttls(self):
+        if self.falla == 'starttls':
+            raise smtplib.SMTPNotSupportedError('STARTTLS no soportado')
+
+    def login(self, usuario, password):
+        if self.falla == 'login':
+            raise smtplib.SMTPAuthenticationError(535, b'credenciales')
+
+    def send_message(self, mensaje):
+        self.enviados.append(mensaje)
+
+    def close(self):
+        self.cerrado = True
+
+    def quit(self):
+        self.close()
+
+
+@pytest.fixture
+def smtp_falso(monkeypatch):
+    SMTPFalso.creados = []
+
+    def usar(falla=None):
+        monkeypatch.setattr(smtplib, 'SMTP', lambda host, puerto, timeout=None: SMTPFalso(host, puerto, timeout, falla))
+        return SMTPFalso.creados
+
+    return usar
+
+
+@pytest.mark.parametrize('falla', ('starttls', 'login'))
+def test_cierra_la_conexion_si_falla_al_conectar(smtp_falso, falla):
+    creados = smtp_falso(falla)
+    enviador = EnviadorSMTP('smtp', 587, 'usuario', 'clave', starttls=True,
+                            conexiones=2, mensajes_por_segundo=0, reintentos=1)
+
+    resumen = enviador.enviar(range(4), lambda item: f"mensaje {item}")
+
+    assert not resumen['enviados']
+    assert creados and all(server.cerrado for server in creados)
+
+
+def test_envia_y_cierra(smtp_falso):
+    creados = smtp_falso()
+    enviador = EnviadorSMTP('smtp', 587, 'usuario', 'clave', conexiones=2, mensajes_por_segundo=0)
+
+    resumen = enviador.enviar(range(4), lambda item: f"mensaje {item}")
+
+    assert sorted(resumen['enviados']) == [0, 1, 2, 3]
+    assert sum(len(server.enviados) for server in creados) == 4
+    assert all(server.cerrado for server in creados)
@@ -0,0 +1,70 @@
+"""Snapshots de reportes: particiones por día UTC, formatos y lectura por rango"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import utils.snapshots
+from conftest import AHORA
+from utils.analisis import analizar
+from utils.snapshots import guardar_snapshot, leer_tabla
+
+
+@pytest.fixture(scope='module')
+def reporte_e_incidentes(incidentes):
+    from generar_reportes import armar_reporte
+
+    recientes = [inc for inc in incidentes if inc['fechaCreacion'] >= (AHORA - timedelta(hours=24)).isoformat()]
+    resultado = analizar(recientes)
+    reporte = armar_reporte('últimas 24 horas', resultado['analisis_tipo'], resultado['analisis_ubicacion'],
+                            resultado['analisis_tiempos'], resultado['analisis_estados'], resultado['tendencias'])
+    return reporte, recientes
+
+
+def _relativas(uris, base):
+    return {tabla: os.path.relpath(uri, base) for tabla, uri in uris.items()}
+
+
+@pytest.mark.parametrize('formato, extension', (('parquet', '.parquet'), ('ndjson', '.ndjson.gz')))
+def test_particion_y_lectura(reporte_e_incidentes, tmp_path, formato, extension):
+    if formato == 'parquet':
+        pytest.importorskip('pyarrow')
+    reporte, recientes = reporte_e_incidentes
+    fecha = datetime(2025, 11, 20, 23, 59, 59)
+
+    uris = guardar_snapshot(reporte, recientes, fecha=fecha, base_uri=str(tmp_path), formato=formato)
+
+    assert _relativas(uris, tmp_path) == {
+        tabla: f"{tabla}/year=2025/month=11/day=20/reporte-20251120T235959{extension}"
+        for tabla in ('incidentes', 'metricas')
+    }
+    filas = leer_tabla('incidentes', datetime(2025, 11, 20), datetime(2025, 11, 21), str(tmp_path))
+    assert sorted(f['incidenteId'] for f in filas) == sorted(inc['incidenteId'] for inc in recientes)
+    metricas = leer_tabla('metricas', datetime(2025, 11, 20), datetime(2025, 11, 21), str(tmp_path))
+    total = [f['valor'] for f in metricas if (f['ventana'], f['metrica'], f['dimension']) == ('reporte', 'incidentes', '')]
+    assert total == [len(recientes)]
+    # Fuera del rango de días no se lee nada
+    assert leer_tabla('incidentes', datetime(2025, 11, 21), datetime(2025, 11, 22), str(tmp_path)) == []
+
+
+def test_fecha_por_defecto_en_utc(reporte_e_incidentes, tmp_path, monkeypatch):
+    # 23:30 UTC: en un servidor UTC-5 la hora local ya sería del mismo día, en UTC+3 del siguiente
+    monkeypatch.setattr(utils.snapshots, 'ahora_utc', lambda: datetime(2025, 11, 20, 23, 30))
+    reporte, recientes = reporte_e_incidentes
+
+    uris = guardar_snapshot(reporte, recientes[:10], base_uri=str(tmp_path), formato='ndjson')
+
+    assert _relativas(uris, tmp_path)['incidentes'] == 'incidentes/year=2025/month=11/day=20/reporte-20251120T233000.ndjson.gz'
+
+
+def test_ultima_version_por_incidente(reporte_e_incidentes, tmp_path):
+    reporte, recientes = reporte_e_incidentes
+    primero = dict(recientes[0], estado='pendiente')
+    segundo = dict(recientes[0], estado='resuelto')
+    guardar_snapshot(reporte, [primero], fecha=datetime(2025, 11, 20, 10), base_uri=str(tmp_path), formato='ndjson')
+    guardar_snapshot(reporte, [segundo], fecha=datetime(2025, 11, 21, 10), base_uri=str(tmp_path), formato='ndjson')
+
+    filas = leer_tabla('incidentes', datetime(2025, 11, 20), datetime(2025, 11, 22), str(tmp_path), ultimo_por='incidenteId')
+
+    assert [(f['incidenteId'], f['estado']) for f in filas] == [(recientes[0]['incidenteId'], 'resuelto')]
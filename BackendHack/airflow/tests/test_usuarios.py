@@ -0,0 +1,91 @@
+"""Caché de autoridades por área: TTL, sello de versión y errores (moto)"""
+
+from datetime import timedelta
+
+import pytest
+
+import utils.usuarios
+from conftest import AHORA
+from utils.usuarios import autoridades_por_area, invalidar
+
+TTL = 600
+
+
+@pytest.fixture
+def usuarios(aws, artefactos, monkeypatch):
+    monkeypatch.setattr(utils.usuarios, '_memoria', {})
+    monkeypatch.setattr(utils.usuarios, 'ahora_utc', lambda: AHORA)
+    # Como serverless.yml: AreaIndex sobre `area`
+    tabla = aws.create_table(
+        TableName='Usuarios',
+        KeySchema=[{'AttributeName': 'userId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': a, 'AttributeType': 'S'} for a in ('area', 'userId')],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'AreaIndex',
+            'KeySchema': [{'AttributeName': 'area', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    for user_id, area, rol in (('u1', 'seguridad', 'autoridad'), ('u2', 'seguridad', 'estudiante'),
+                               ('u3', 'limpieza', 'autoridad')):
+        tabla.put_item(Item={'userId': user_id, 'area': area, 'rol': rol, 'email': f"{user_id}@utec.edu.pe"})
+    return tabla, str(artefactos / 'usuarios')
+
+
+def _ids(tabla, uri, areas=('seguridad', 'limpieza'), ttl=TTL):
+    resultado, errores = autoridades_por_area(tabla, areas, ttl=ttl, uri=uri)
+    return {area: sorted(u['userId'] for u in lista) for area, lista in resultado.items()}, errores
+
+
+def _nueva_autoridad(tabla):
+    tabla.put_item(Item={'userId': 'u4', 'area': 'seguridad', 'rol': 'autoridad', 'email': 'u4@utec.edu.pe'})
+
+
+def test_cache_hasta_que_vence_el_ttl(usuarios, monkeypatch):
+    tabla, uri = usuarios
+    assert _ids(tabla, uri) == ({'seguridad': ['u1'], 'limpieza': ['u3']}, {})
+
+    # Un alta dentro del TTL no se ve (ni desde otro proceso: caché en artefacto)
+    _nueva_autoridad(tabla)
+    monkeypatch.setattr(utils.usuarios, '_memoria', {})
+    monkeypatch.setattr(utils.usuarios, 'ahora_utc', lambda: AHORA + timedelta(seconds=TTL - 1))
+    assert _ids(tabla, uri)[0]['seguridad'] == ['u1']
+
+    monkeypatch.setattr(utils.usuarios, 'ahora_utc', lambda: AHORA + timedelta(seconds=TTL + 1))
+    assert _ids(tabla, uri)[0]['seguridad'] == ['u1', 'u4']
+
+
+def test_invalidar_descarta_la_cache(usuarios):
+    tabla, uri = usuarios
+    _ids(tabla, uri)
+    _nueva_autoridad(tabla)
+
+    invalidar(uri)
+
+    assert _ids(tabla, uri)[0]['seguridad'] == ['u1', 'u4']
+
+
+def test_sin_ttl_siempre_consulta(usuarios):
+    tabla, uri = usuarios
+    _ids(tabla, uri, ttl=0)
+    _nueva_autoridad(tabla)
+
+    assert _ids(tabla, uri, ttl=0)[0]['seguridad'] == ['u1', 'u4']
+
+
+def test_area_con_error_no_se_cachea(usuarios, monkeypatch):
+    tabla, uri = usuarios
+    consultar = utils.usuarios.consultar_autoridades
+
+    def falla_seguridad(table, area):
+        if area == 'seguridad':
+            raise RuntimeError('ProvisionedThroughputExceededException')
+        return consultar(table, area)
+
+    monkeypatch.setattr(utils.usuarios, 'consultar_autoridades', falla_seguridad)
+    resultado, errores = _ids(tabla, uri)
+    assert (resultado, list(errores)) == ({'limpieza': ['u3']}, ['seguridad'])
+
+    monkeypatch.setattr(utils.usuarios, 'consultar_autoridades', consultar)
+    assert _ids(tabla, uri) == ({'seguridad': ['u1'], 'limpieza': ['u3']}, {})
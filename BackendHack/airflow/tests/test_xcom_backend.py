@@ -0,0 +1,94 @@
+"""Ida y vuelta por XComArtefactos: inline, artefacto, purga y retención"""
+
+import os
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import utils.xcom_backend
+from utils.xcom_backend import CLAVE_REFERENCIA, XComArtefactos, purgar_vencidos
+
+UMBRAL = 1024
+CLAVES = {'key': 'datos', 'task_id': 'tarea', 'dag_id': 'dag', 'run_id': 'corrida'}
+
+
+@pytest.fixture
+def backend(artefactos, monkeypatch):
+    monkeypatch.setattr(utils.xcom_backend, 'XCOM_UMBRAL_BYTES', UMBRAL)
+    monkeypatch.setattr(utils.xcom_backend, 'ARTEFACTOS_URI', str(artefactos))
+    return artefactos
+
+
+def _fila(value, **claves):
+    """Lo que queda en la tabla xcom (lo que lee deserialize_value)"""
+    return SimpleNamespace(value=XComArtefactos.serialize_value(value, **{**CLAVES, **claves}))
+
+
+def _archivos(raiz):
+    return sorted(os.path.relpath(os.path.join(d, f), raiz) for d, _, fs in os.walk(raiz) for f in fs)
+
+
+def test_valor_chico_queda_en_la_base(backend):
+    valor = {'total': 3, 'ids': ['a', 'b', 'c']}
+    fila = _fila(valor)
+
+    assert CLAVE_REFERENCIA.encode() not in fila.value
+    assert XComArtefactos.deserialize_value(fila) == valor
+    assert _archivos(backend) == []
+
+
+def test_valor_grande_va_a_artefacto(backend):
+    valor = [{'incidenteId': f"inc-{i}", 'urgencia': 'alta', 'minutos': i * 1.5} for i in range(500)]
+    fila = _fila(valor)
+
+    assert len(fila.value) < UMBRAL
+    assert XComArtefactos.deserialize_value(fila) == valor
+    assert _archivos(backend) == [os.path.join('xcom', 'dag', 'corrida', 'tarea', 'datos.msgpack.z')]
+    # La UI muestra la referencia sin descargar el artefacto
+    assert XComArtefactos.orm_deserialize_value(fila).endswith(' bytes)')
+
+    XComArtefactos.purge(fila)
+    assert _archivos(backend) == []
+
+
+def test_tareas_mapeadas_no_se_pisan(backend):
+    valores = {indice: [f"valor-{indice}"] * 1000 for indice in range(3)}
+    filas = {indice: _fila(valor, map_index=indice) for indice, valor in valores.items()}
+
+    assert {indice: XComArtefactos.deserialize_value(fila) for indice, fila in filas.items()} == valores
+    assert len(_archivos(backend)) == 3
+
+
+def test_tipos_sin_msgpack_usan_base_xcom(backend):
+    # msgpack no representa timedelta: se guarda como sin el backend, aunque supere el umbral
+    valor = {'esperas': [timedelta(minutes=i) for i in range(200)]}
+    fila = _fila(valor)
+
+    assert XComArtefactos.deserialize_value(fila) == valor
+    assert _archivos(backend) == []
+
+
+def test_purgar_vencidos(backend):
+    viejo = _fila(list(range(1000)), run_id='vieja')
+    nuevo = _fila(list(range(1000)), run_id='nueva')
+    otro = backend / 'rollup' / 'rollup.msgpack.z'
+    otro.parent.mkdir()
+    otro.write_bytes(b'no es de xcom')
+
+    hace_10_dias = time.time() - 10 * 86400
+    ruta_vieja = backend / 'xcom' / 'dag' / 'vieja' / 'tarea' / 'datos.msgpack.z'
+    for ruta in (ruta_vieja, otro):
+        os.utime(ruta, (hace_10_dias, hace_10_dias))
+
+    assert purgar_vencidos(dias=7) == 1
+    assert _archivos(backend) == [
+        os.path.join('rollup', 'rollup.msgpack.z'),
+        os.path.join('xcom', 'dag', 'nueva', 'tarea', 'datos.msgpack.z'),
+    ]
+    assert not (backend / 'xcom' / 'dag' / 'vieja').exists()
+    assert XComArtefactos.deserialize_value(nuevo) == list(range(1000))
+    # Purgar el XCom cuyo artefacto ya venció no falla
+    XComArtefactos.purge(viejo)
+    assert purgar_vencidos(dias=0) == 0
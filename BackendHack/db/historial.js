@@ -0,0 +1,97 @@
+const AWS = require("aws-sdk");
+const { v4 } = require("uuid");
+const dynamo = new AWS.DynamoDB.DocumentClient();
+
+const HISTORIAL_TABLE = process.env.HISTORIAL_TABLE || "IncidentesHistorial";
+
+/**
+ * History item for an event (eventoId sorts by date)
+ * @param {string} incidenteId - Incident ID
+ * @param {object} evento - Event ({ accion, fecha, ... })
+ */
+function itemEvento(incidenteId, evento) {
+  const fecha = evento.fecha || new Date().toISOString();
+  return {
+    incidenteId,
+    eventoId: `${fecha}#${v4().slice(0, 8)}`,
+    ...evento,
+    fecha
+  };
+}
+
+/**
+ * Append an event to the incident history table (append-only)
+ * @param {string} incidenteId - Incident ID
+ * @param {object} evento - Event ({ accion, fecha, ... })
+ */
+async function registrarEvento(incidenteId, evento) {
+  const item = itemEvento(incidenteId, evento);
+
+  await dynamo.put({
+    TableName: HISTORIAL_TABLE,
+    Item: item
+  }).promise();
+
+  return item;
+}
+
+/**
+ * Write an incident change and its history event in one transaction, so the
+ * summary in the item (ultimoEvento, totalEventos, colaAbierta) never
+ * disagrees with IncidentesHistorial
+ * @param {object} operacion - Transaction item for Incidentes ({ Put } or { Update })
+ * @param {string} incidenteId - Incident ID
+ * @param {object} evento - Event ({ accion, fecha, ... })
+ */
+async function escribirConEvento(operacion, incidenteId, evento) {
+  const item = itemEvento(incidenteId, evento);
+
+  await dynamo.transactWrite({
+    TransactItems: [
+      operacion,
+      { Put: { TableName: HISTORIAL_TABLE, Item: item } }
+    ]
+  }).promise();
+
+  return item;
+}
+
+/**
+ * Small summary kept in the incident item instead of the full history
+ * @param {object} evento - Event ({ accion, fecha, ... })
+ */
+function resumenEvento(evento) {
+  return {
+    accion: evento.accion,
+    fecha: evento.fecha
+  };
+}
+
+/**
+ * Read one page of an incident history, oldest first
+ * @param {string} incidenteId - Incident ID
+ * @param {object} options - { limit, cursor } (cursor from a previous page)
+ */
+async function listarEventos(incidenteId, { limit = 50, cursor = null } = {}) {
+  const params = {
+    TableName: HISTORIAL_TABLE,
+    KeyConditionExpression: "incidenteId = :id",
+    ExpressionAttributeValues: { ":id": incidenteId },
+    Limit: limit
+  };
+
+  if (cursor) {
+    params.ExclusiveStartKey = JSON.parse(Buffer.from(cursor, "base64").toString("utf8"));
+  }
+
+  const result = await dynamo.query(params).promise();
+
+  return {
+    items: result.Items,
+    cursor: result.LastEvaluatedKey
+      ? Buffer.from(JSON.stringify(result.LastEvaluatedKey)).toString("base64")
+      : null
+  };
+}
+
+module.exports = { registrarEvento, escribirConEvento, resumenEvento, listarEventos, HISTORIAL_TABLE };
@@ -0,0 +1,67 @@
+const AWS = require("aws-sdk");
+const dynamo = new AWS.DynamoDB.DocumentClient();
+
+const CONNECTIONS_TABLE = "WebSocketConnections";
+const PRESENCIA_TABLE = process.env.PRESENCIA_TABLE || "PresenciaUsuarios";
+
+/**
+ * Store a WebSocket connection and, if authenticated, count it in the user's presence
+ * @param {string} connectionId - API Gateway connection ID
+ * @param {string|null} userId - Authenticated user ID (null for anonymous connections)
+ */
+async function registrarConexion(connectionId, userId) {
+  const ahora = new Date().toISOString();
+  const item = { connectionId, conectadoEn: ahora };
+  if (userId) {
+    item.userId = userId;
+  }
+
+  await dynamo.put({
+    TableName: CONNECTIONS_TABLE,
+    Item: item
+  }).promise();
+
+  if (userId) {
+    await dynamo.update({
+      TableName: PRESENCIA_TABLE,
+      Key: { userId },
+      UpdateExpression: "set ultimaConexion = :f add conexiones :uno",
+      ExpressionAttributeValues: { ":f": ahora, ":uno": 1 }
+    }).promise();
+  }
+}
+
+/**
+ * Remove a WebSocket connection and decrement the owner's presence counter
+ * Used by $disconnect and by the stale connection (410) cleanup
+ * @param {string} connectionId - API Gateway connection ID
+ */
+async function eliminarConexion(connectionId) {
+  const result = await dynamo.delete({
+    TableName: CONNECTIONS_TABLE,
+    Key: { connectionId },
+    ReturnValues: "ALL_OLD"
+  }).promise();
+
+  // Only the call that actually deleted the connection decrements
+  const userId = result.Attributes && result.Attributes.userId;
+  if (!userId) {
+    return;
+  }
+
+  try {
+    await dynamo.update({
+      TableName: PRESENCIA_TABLE,
+      Key: { userId },
+      UpdateExpression: "add conexiones :menos",
+      ConditionExpression: "conexiones > :cero",
+      ExpressionAttributeValues: { ":menos": -1, ":cero": 0 }
+    }).promise();
+  } catch (error) {
+    if (error.code !== "ConditionalCheckFailedException") {
+      throw error;
+    }
+  }
+}
+
+module.exports = { registrarConexion, eliminarConexion, PRESENCIA_TABLE };
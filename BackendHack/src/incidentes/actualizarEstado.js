@@ -1,9 +1,10 @@
 const AWS = require("aws-sdk");
 const { get } = require("../../db/get");
-const { update } = require("../../db/update");
+const { escribirConEvento, resumenEvento } = require("../../db/historial");
 const { successResponse, errorResponse } = require("../utils/responses");
 const { withCors } = require("../utils/withCors");
 const { requireAuth } = require("../utils/auth");
+const { eliminarConexion } = require("../../db/presencia");
 
 const dynamo = new AWS.DynamoDB.DocumentClient();
 
@@ -56,23 +57,41 @@ exports.handler = withCors(async (event) => {
       return errorResponse(404, "Incidente no encontrado");
     }
 
-    // Add to history
-    const nuevoHistorial = incidente.historial || [];
-    nuevoHistorial.push({
+    // History event (append-only, stored in IncidentesHistorial)
+    const ahora = new Date().toISOString();
+    const evento = {
       accion: `estado cambiado a ${nuevoEstado}`,
-      fecha: new Date().toISOString()
-    });
+      fecha: ahora
+    };
 
-    // Update incident
-    await update(
-      "Incidentes",
-      { incidenteId },
-      "set estado = :e, historial = :h",
-      {
-        ":e": nuevoEstado,
-        ":h": nuevoHistorial
+    // Update incident summary (fechaActualizacion alimenta la recolección incremental de reportes)
+    let updateExpression = "set estado = :e, fechaActualizacion = :f, ultimoEvento = :u";
+    if (nuevoEstado === "resuelto") {
+      updateExpression += ", fechaResolucion = if_not_exists(fechaResolucion, :f)";
+    }
+    // colaAbierta is the key of the sparse AbiertosIndex: only open incidents carry it
+    if (nuevoEstado === "resuelto" || nuevoEstado === "cancelado") {
+      updateExpression += " remove colaAbierta";
+    } else {
+      updateExpression += ", colaAbierta = urgencia";
+    }
+    updateExpression += " add totalEventos :uno";
+
+    // Summary and history event in one transaction: either both are written or neither
+    await escribirConEvento({
+      Update: {
+        TableName: "Incidentes",
+        Key: { incidenteId },
+        UpdateExpression: updateExpression,
+        ConditionExpression: "attribute_exists(incidenteId)",
+        ExpressionAttributeValues: {
+          ":e": nuevoEstado,
+          ":f": ahora,
+          ":u": resumenEvento(evento),
+          ":uno": 1
+        }
       }
-    );
+    }, incidenteId, evento);
 
     // Notify WebSocket connections
     await notifyWebSocketClients(incidenteId, nuevoEstado);
@@ -194,10 +213,7 @@ async function notifyWebSocketClients(incidenteId, nuevoEstado) {
       } catch (error) {
         // If connection is stale, delete it
         if (error.statusCode === 410) {
-          await dynamo.delete({
-            TableName: "WebSocketConnections",
-            Key: { connectionId }
-          }).promise();
+          await eliminarConexion(connectionId);
         }
       }
     });
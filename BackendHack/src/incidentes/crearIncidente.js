@@ -1,10 +1,11 @@
 const AWS = require("aws-sdk");
 const { v4 } = require("uuid");
-const { put } = require("../../db/put");
 const { query } = require("../../db/query");
+const { escribirConEvento, resumenEvento } = require("../../db/historial");
 const { successResponse, errorResponse } = require("../utils/responses");
 const { withCors } = require("../utils/withCors");
 const { requireAuth } = require("../utils/auth");
+const { eliminarConexion } = require("../../db/presencia");
 
 const dynamo = new AWS.DynamoDB.DocumentClient();
 
@@ -34,6 +35,14 @@ exports.handler = withCors(async (event) => {
 
     // Create incident
     const incidenteId = "INC_" + v4().slice(0, 6);
+    const fechaCreacion = new Date().toISOString();
+
+    // Full history lives in IncidentesHistorial; the item only keeps a summary
+    const eventoCreacion = {
+      accion: "creado",
+      fecha: fechaCreacion,
+      usuario: email
+    };
 
     const item = {
       incidenteId,
@@ -45,17 +54,14 @@ exports.handler = withCors(async (event) => {
       userId,
       emailReportante: email,
       estado: "pendiente",
-      fechaCreacion: new Date().toISOString(),
-      historial: [
-        {
-          accion: "creado",
-          fecha: new Date().toISOString(),
-          usuario: email
-        }
-      ]
+      colaAbierta: urgencia, // Sparse AbiertosIndex key, removed when resolved/cancelled
+      fechaCreacion,
+      ultimoEvento: resumenEvento(eventoCreacion),
+      totalEventos: 1
     };
 
-    await put("Incidentes", item);
+    // Incident and its "creado" event are written together (TransactWriteItems)
+    await escribirConEvento({ Put: { TableName: "Incidentes", Item: item } }, incidenteId, eventoCreacion);
 
     // Notify WebSocket connections and SNS (don't block on errors)
     notifyWebSocketClients(item).catch(err => 
@@ -229,10 +235,7 @@ async function notifyWebSocketClients(incidente) {
         // If connection is stale, delete it
         if (error.statusCode === 410) {
           console.log(`Eliminando conexión obsoleta: ${connectionId}`);
-          await dynamo.delete({
-            TableName: "WebSocketConnections",
-            Key: { connectionId }
-          }).promise();
+          await eliminarConexion(connectionId);
         }
       }
     });
@@ -0,0 +1,52 @@
+const { get } = require("../../db/get");
+const { listarEventos } = require("../../db/historial");
+const { successResponse, errorResponse } = require("../utils/responses");
+const { withCors } = require("../utils/withCors");
+const { requireAuth } = require("../utils/auth");
+
+/**
+ * Get the history of an incident, paginated (requires authentication)
+ * GET /incidentes/{id}/historial?limit=50&cursor=<cursor>
+ * Headers: { Authorization: "Bearer <token>" }
+ */
+exports.handler = withCors(async (event) => {
+  try {
+    // Require authentication
+    const auth = requireAuth(event);
+    if (!auth.authenticated) {
+      return auth.error;
+    }
+
+    const incidenteId = event.pathParameters.id;
+
+    if (!incidenteId) {
+      return errorResponse(400, "ID de incidente requerido");
+    }
+
+    const incidente = await get("Incidentes", { incidenteId });
+
+    if (!incidente) {
+      return errorResponse(404, "Incidente no encontrado");
+    }
+
+    const queryParams = event.queryStringParameters || {};
+    const limit = Math.min(parseInt(queryParams.limit, 10) || 50, 200);
+
+    const { items, cursor } = await listarEventos(incidenteId, {
+      limit,
+      cursor: queryParams.cursor || null
+    });
+
+    return successResponse(200, {
+      ok: true,
+      incidenteId,
+      totalEventos: incidente.totalEventos,
+      items,
+      cursor
+    });
+
+  } catch (error) {
+    console.error("Error en obtenerHistorial:", error);
+    return errorResponse(500, "Error al obtener historial", error);
+  }
+});
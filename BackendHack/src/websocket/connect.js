@@ -1,20 +1,30 @@
-const { put } = require("../../db/put");
+const { registrarConexion } = require("../../db/presencia");
+const { verifyToken } = require("../utils/auth");
 
 /**
  * Handle WebSocket connection
  * Route: $connect
+ * Query: ?token=<JWT> (optional, identifies the user for presence)
  */
 exports.handler = async (event) => {
   try {
     const connectionId = event.requestContext.connectionId;
 
-    // Store connection in DynamoDB
-    await put("WebSocketConnections", {
-      connectionId,
-      conectadoEn: new Date().toISOString()
-    });
+    // Anonymous connections are still accepted, just not counted as presence
+    let userId = null;
+    const token = event.queryStringParameters?.token;
+    if (token) {
+      try {
+        userId = verifyToken(token).userId || null;
+      } catch (error) {
+        console.warn(`Token inválido en conexión ${connectionId}: ${error.message}`);
+      }
+    }
 
-    console.log(`Conexión establecida: ${connectionId}`);
+    // Store connection (and user presence) in DynamoDB
+    await registrarConexion(connectionId, userId);
+
+    console.log(`Conexión establecida: ${connectionId}${userId ? ` (usuario ${userId})` : ""}`);
 
     return {
       statusCode: 200,
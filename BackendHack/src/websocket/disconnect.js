@@ -1,5 +1,4 @@
-const AWS = require("aws-sdk");
-const dynamo = new AWS.DynamoDB.DocumentClient();
+const { eliminarConexion } = require("../../db/presencia");
 
 /**
  * Handle WebSocket disconnection
@@ -9,11 +8,8 @@ exports.handler = async (event) => {
   try {
     const connectionId = event.requestContext.connectionId;
 
-    // Remove connection from DynamoDB
-    await dynamo.delete({
-      TableName: "WebSocketConnections",
-      Key: { connectionId }
-    }).promise();
+    // Remove connection (and decrement user presence) from DynamoDB
+    await eliminarConexion(connectionId);
 
     console.log(`Conexión cerrada: ${connectionId}`);
 
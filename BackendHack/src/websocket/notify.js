@@ -1,4 +1,5 @@
 const AWS = require("aws-sdk");
+const { eliminarConexion } = require("../../db/presencia");
 const dynamo = new AWS.DynamoDB.DocumentClient();
 
 /**
@@ -38,10 +39,7 @@ exports.handler = async (event) => {
 
         // If connection is stale (410), remove it
         if (error.statusCode === 410) {
-          await dynamo.delete({
-            TableName: "WebSocketConnections",
-            Key: { connectionId: connId }
-          }).promise();
+          await eliminarConexion(connId);
         }
       }
     });
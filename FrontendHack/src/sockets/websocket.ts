@@ -12,7 +12,9 @@ export function connectWebSocket(onMessageCallback: (data: unknown) => void): vo
     return;
   }
 
-  socket = new WebSocket(WS_URL);
+  // El token identifica al usuario para el registro de presencia (online/offline)
+  const token = localStorage.getItem("token");
+  socket = new WebSocket(token ? `${WS_URL}?token=${encodeURIComponent(token)}` : WS_URL);
 
   socket.onopen = () => {
     console.log("✅ WebSocket conectado exitosamente");